@@ -1,18 +1,137 @@
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Dict, Optional, Literal
 
 class Settings(BaseSettings):
     DATABASE_URL: str
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
-    ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
-    
+    ACCESS_TOKEN_EXPIRE_MINUTES: int = 60
+
+    # Base de données : moteur asynchrone (asyncpg/aiosqlite) ou synchrone (threadpool)
+    DB_ASYNC: bool = True
+    ASYNC_DATABASE_URL: Optional[str] = None  # déduit de DATABASE_URL si absent
+
+    # Pool de connexions (par moteur et par processus)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800  # secondes, -1 pour désactiver
+    DB_POOL_PRE_PING: Literal["always", "idle", "never"] = "idle"
+    DB_POOL_PRE_PING_IDLE_SECONDS: float = 30.0
+    DB_POOL_PREFILL: int = 2  # connexions ouvertes au démarrage (plafonné à DB_POOL_SIZE)
+    DB_MAX_CONNECTIONS: Optional[int] = None  # budget du serveur, réparti entre les workers
+
+    # Réplique en lecture (optionnelle) : routes GET servies par la réplique si elle est à jour
+    DATABASE_REPLICA_URL: Optional[str] = None
+    ASYNC_DATABASE_REPLICA_URL: Optional[str] = None  # déduit de DATABASE_REPLICA_URL si absent
+    REPLICA_MAX_LAG_SECONDS: float = 5.0  # au-delà : lectures sur le primaire
+    REPLICA_LAG_CHECK_INTERVAL: float = 2.0
+    REPLICA_RETRY_SECONDS: float = 30.0  # réplique injoignable : primaire pendant ce délai
+    REPLICA_STICKY_SECONDS: float = 10.0  # après un commit, l'utilisateur lit sur le primaire
+    REPLICA_STICKY_BACKEND: Literal["memory", "redis"] = "memory"  # redis : partagé entre workers
+    REPLICA_STICKY_REDIS_URL: Optional[str] = None
+
+    # Serveur de production (python -m app.server)
+    WEB_HOST: str = "0.0.0.0"
+    WEB_PORT: int = 8000
+    WEB_WORKERS: Optional[int] = None  # défaut : CPU disponibles si aucun état ne reste en mémoire (app/server.py), sinon 1
+    WEB_WS: str = "websockets-sansio"  # moitié moins de mémoire par WebSocket que « websockets »
+    GRACEFUL_SHUTDOWN_TIMEOUT: float = 30.0  # SIGTERM : délai laissé aux requêtes en cours
+    READINESS_DB_TIMEOUT: float = 2.0  # /status/ready : délai du ping de la base
+
+    # Démarrage du worker (lifespan) : vérification du schéma, préchauffage (pool, ORM, bcrypt)
+    STARTUP_SCHEMA_CHECK: bool = True  # tables manquantes : le worker refuse de démarrer
+    STARTUP_WARMUP: bool = True
+
+    # Authentification : cache des utilisateurs courants (par processus)
+    AUTH_USER_CACHE_SIZE: int = 10000  # 0 pour désactiver
+    AUTH_USER_CACHE_TTL: float = 60.0
+    # Faire confiance au rôle signé dans le token (aucune requête SQL, révocation à l'expiration du token)
+    AUTH_TRUST_TOKEN_ROLE: bool = False
+
+    # Pagination : durée de cache des totaux (X-Total-Count)
+    PAGINATION_COUNT_TTL: float = 30.0
+
+    # Tableau de bord admin : âge maximal des compteurs en mémoire (0 = toujours recalculer)
+    DASHBOARD_STATS_MAX_AGE: float = 10.0
+
+    # Cache des réponses publiques GET /offres (0 = désactivé)
+    RESPONSE_CACHE_SIZE: int = 1024
+    RESPONSE_CACHE_TTL: float = 30.0
+    RESPONSE_CACHE_BACKEND: Literal["memory", "redis"] = "memory"  # redis : partagé entre workers
+    RESPONSE_CACHE_REDIS_URL: Optional[str] = None
+
+    # Listes sérialisées directement depuis les colonnes SQL (orjson), sans objets ORM ni pydantic
+    FAST_SERIALIZATION: bool = False
+
+    # Exports admin en flux (NDJSON/CSV) : lignes lues par lots sur un curseur côté serveur
+    EXPORT_BATCH_SIZE: int = 1000
+
+    # POST /offres/bulk : nombre maximal d'offres et taille du corps par lot (au-delà : 413)
+    OFFRES_BULK_MAX_ITEMS: int = 5000
+    OFFRES_BULK_MAX_BYTES: int = 10 * 1024 * 1024
+
+    # Flux temps réel des offres (WebSocket /offres/ws, SSE /offres/flux)
+    EVENTS_BACKEND: Literal["memory", "postgres"] = "memory"  # postgres : LISTEN/NOTIFY entre workers
+    EVENTS_QUEUE_SIZE: int = 100  # messages en attente par abonné ; au-delà l'abonné est déconnecté
+    EVENTS_MAX_SUBSCRIBERS: int = 20000  # par worker
+    EVENTS_KEEPALIVE: float = 15.0  # secondes entre deux commentaires SSE « ping »
+
+    # Limitation de débit : seau à jetons par client (utilisateur du token, sinon IP), « requêtes/secondes »
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_DEFAULT: str = "200/10"  # toutes les routes non listées, seau commun par client
+    RATE_LIMIT_ROUTES: Dict[str, str] = {
+        "POST /auth/login": "10/60",
+        "POST /auth/register": "5/300",
+        "POST /offres/bulk": "10/60",
+        "GET /offres/recherche": "60/10",
+        "GET /admin/export/*": "5/60",
+    }
+    RATE_LIMIT_BACKEND: Literal["memory", "redis"] = "memory"  # redis : budgets partagés entre workers
+    RATE_LIMIT_REDIS_URL: Optional[str] = None
+    RATE_LIMIT_TRUST_FORWARDED: bool = False  # derrière un proxy : IP lue dans X-Forwarded-For
+
+    # Contrôle d'admission : requêtes traitées en même temps par worker (0 = illimité)
+    MAX_CONCURRENT_REQUESTS: int = 64
+    ADMISSION_TIMEOUT: float = 0.5  # attente maximale d'une place avant 503
+
+    # Métriques Prometheus exposées sur /metrics
+    METRICS_ENABLED: bool = True
+
+    # Profilage SQL par requête (opt-in) : en-tête Server-Timing, journal des requêtes lentes et N+1
+    SQL_PROFILING: bool = False
+    SQL_PROFILING_SAMPLE_RATE: float = 1.0  # part des requêtes profilées (0.01 : une sur cent)
+    SLOW_REQUEST_SECONDS: float = 0.5
+    N_PLUS_ONE_THRESHOLD: int = 10  # même forme de requête SQL répétée au moins N fois
+    SERVER_TIMING: bool = True
+
+    # Balayeur de fond (un seul worker, élu par verrou) : offres expirées, réservations non récupérées
+    EXPIRATION_SWEEP_INTERVAL: float = 60.0  # secondes, 0 pour désactiver
+    EXPIRATION_SWEEP_BATCH: int = 1000
+    RESERVATION_PICKUP_WINDOW_HOURS: float = 48.0  # 0 : jamais d'annulation automatique
+
+    # Hachage des mots de passe (bcrypt) hors boucle d'événements
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: Optional[int] = None  # défaut : nombre de CPU
+    PASSWORD_HASH_MAX_PENDING: int = 64  # au-delà : 503 immédiat
+
     # Email settings (optionnel)
     SMTP_HOST: Optional[str] = None
     SMTP_PORT: Optional[int] = None
     SMTP_USER: Optional[str] = None
     SMTP_PASSWORD: Optional[str] = None
-    
+    SMTP_FROM: Optional[str] = None  # défaut : SMTP_USER
+    SMTP_STARTTLS: bool = True
+    SMTP_TIMEOUT: float = 30.0
+    SMTP_POOL_SIZE: int = 2  # connexions SMTP gardées ouvertes par le worker d'envoi
+
+    # Boîte d'envoi : emails écrits avec la transaction (si SMTP_HOST est défini), envoyés par un worker
+    OUTBOX_INTERVAL: float = 5.0  # secondes entre deux passages, 0 pour désactiver l'envoi
+    OUTBOX_BATCH: int = 100
+    OUTBOX_MAX_ATTEMPTS: int = 8
+    OUTBOX_RETRY_BASE: float = 30.0  # délai doublé à chaque échec temporaire...
+    OUTBOX_RETRY_MAX: float = 3600.0  # ...jusqu'à ce plafond
+
     class Config:
         env_file = ".env"
 
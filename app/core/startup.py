@@ -0,0 +1,175 @@
+import asyncio
+import logging
+import time
+from typing import Dict, Tuple
+
+from sqlalchemy import inspect, select, text
+from sqlalchemy.orm import configure_mappers
+from starlette.concurrency import run_in_threadpool
+
+from app import database, models, security
+from app.core.config import settings
+from app.utils.metrics import STARTUP_SECONDS
+from app.utils.replica import replica_router
+
+logger = logging.getLogger(__name__)
+
+class SchemaNotReady(RuntimeError):
+    """Tables absentes : la base n'est pas migrée (alembic upgrade head)"""
+
+class StartupReport:
+    """État du worker : durée de chaque étape du démarrage, erreurs non bloquantes, arrêt en cours"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.timings: Dict[str, float] = {}
+        self.errors: Dict[str, str] = {}
+        self.completed = False
+        self.draining = False  # SIGTERM reçu : plus de nouvelles requêtes
+
+    @property
+    def total(self) -> float:
+        return sum(self.timings.values())
+
+    def summary(self) -> str:
+        steps = ", ".join(f"{name} {seconds * 1000:.1f} ms" for name, seconds in self.timings.items())
+        return f"{self.total * 1000:.0f} ms ({steps})"
+
+startup_report = StartupReport()
+
+def missing_tables(connection) -> list:
+    existing = set(inspect(connection).get_table_names())
+    return sorted(set(database.Base.metadata.tables) - existing)
+
+async def check_schema():
+    if settings.DB_ASYNC:
+        async with database.async_engine.connect() as conn:
+            missing = await conn.run_sync(missing_tables)
+    else:
+        def check():
+            with database.engine.connect() as conn:
+                return missing_tables(conn)
+        missing = await run_in_threadpool(check)
+    if missing:
+        raise SchemaNotReady(f"Tables manquantes ({', '.join(missing)}) : lancer alembic upgrade head")
+
+async def prefill_pool():
+    """Ouvre DB_POOL_PREFILL connexions ensemble puis les rend au pool"""
+    count = min(settings.DB_POOL_PREFILL, settings.DB_POOL_SIZE)
+    if settings.DB_ASYNC:
+        connections = await asyncio.gather(*(database.async_engine.connect() for _ in range(count)))
+        for conn in connections:
+            await conn.close()
+    else:
+        connections = [await run_in_threadpool(database.engine.connect) for _ in range(count)]
+        for conn in connections:
+            conn.close()
+
+async def check_replica():
+    # Première mesure du retard ; réplique injoignable : lectures sur le primaire
+    try:
+        await replica_router.measure_lag(database.async_replica_engine)
+    except Exception as exc:
+        replica_router.mark_down(exc)
+        raise
+
+async def warm_queries():
+    # Premières requêtes ORM : stratégies de chargement et cache de compilation SQL
+    async with database.session_scope() as db:
+        await db.scalar(select(models.Offre).limit(1))
+        await db.scalar(select(models.Utilisateur).limit(1))
+
+def security_self_test():
+    # Charge le backend bcrypt de passlib et vérifie qu'il fonctionne, à coût minimal (4 tours)
+    from passlib.hash import bcrypt
+    hashed = bcrypt.using(rounds=4).hash("auto-test")
+    if not security.pwd_context.verify("auto-test", hashed):
+        raise RuntimeError("bcrypt : vérification de l'auto-test en échec")
+    token = security.create_access_token({"sub": "0"}, expires_minutes=1)
+    if (security.decode_token(token) or {}).get("sub") != "0":
+        raise RuntimeError("JWT : décodage de l'auto-test en échec")
+
+async def warm_up() -> StartupReport:
+    """Démarrage explicite du worker, chaque étape mesurée (lifespan).
+
+    Moteurs, mappers, schéma, réplique, pool, premières requêtes, bcrypt/JWT.
+    Une base injoignable n'empêche pas le démarrage (erreur journalisée, le pool se
+    reconnectera) ; un schéma incomplet, si.
+    """
+    report = startup_report
+    report.reset()
+
+    async def step(name: str, fn, *, fatal: bool = False):
+        started = time.perf_counter()
+        try:
+            result = fn()
+            if asyncio.iscoroutine(result):
+                await result
+        except SchemaNotReady:
+            raise
+        except Exception as exc:
+            if fatal:
+                raise
+            report.errors[name] = repr(exc)
+            logger.exception("Démarrage : étape %s en échec", name)
+        finally:
+            report.timings[name] = time.perf_counter() - started
+            STARTUP_SECONDS.labels(name).set(report.timings[name])
+
+    await step("moteurs", database.init_engines, fatal=True)
+    await step("mappers", configure_mappers, fatal=True)
+    if settings.STARTUP_SCHEMA_CHECK:
+        await step("schema", check_schema)
+    if database.async_replica_engine is not None:
+        await step("replique", check_replica)
+    if settings.STARTUP_WARMUP:
+        if settings.DB_POOL_PREFILL > 0:
+            await step("pool", prefill_pool)
+        await step("requetes", warm_queries)
+        # Dans le pool bcrypt : démarre aussi son premier thread
+        await step("securite", lambda: security.password_hasher.run(security_self_test))
+    report.completed = True
+    logger.info("Worker prêt en %s", report.summary())
+    return report
+
+async def ping_database():
+    if settings.DB_ASYNC:
+        async with database.async_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+    else:
+        def ping():
+            with database.engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+        await run_in_threadpool(ping)
+
+async def check_readiness() -> Tuple[bool, dict]:
+    """Le worker peut-il recevoir du trafic ? (démarré, pas en arrêt, base joignable)
+
+    Pool plein : pas de ping (il attendrait derrière les requêtes), la base est
+    joignable puisque toutes les connexions sont prises ; le worker reste prêt.
+    """
+    report = startup_report
+    pool = database.pool_metrics["async" if settings.DB_ASYNC else "sync"].snapshot()
+    details = {
+        "started": report.completed,
+        "draining": report.draining,
+        "pool": {key: pool[key] for key in ("size", "checked_out", "overflow", "max_overflow") if key in pool},
+        "replica": replica_router.state(),  # sans effet sur la disponibilité : repli sur le primaire
+    }
+    if not report.completed or report.draining:
+        details["database"] = "non vérifiée"
+        return False, details
+    if "size" in pool and pool["checked_out"] >= pool["size"] + pool["max_overflow"]:
+        details["database"] = "pool plein"
+        return True, details
+    started = time.perf_counter()
+    try:
+        await asyncio.wait_for(ping_database(), settings.READINESS_DB_TIMEOUT)
+    except Exception as exc:
+        details["database"] = f"injoignable : {exc!r}"
+        return False, details
+    details["database"] = "ok"
+    details["ping_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    return True, details
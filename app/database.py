@@ -1,21 +1,285 @@
-import os
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
-from dotenv import load_dotenv
+import asyncio
+from contextlib import asynccontextmanager, nullcontext
+from typing import Optional
 
-load_dotenv()
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import DBAPIError, SQLAlchemyError
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.orm import sessionmaker, declarative_base, Session
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+from starlette.concurrency import run_in_threadpool
 
-DATABASE_URL = os.getenv("DATABASE_URL")
+from app.core.config import settings
+from app.utils.metrics import install_query_metrics
+from app.utils.pool_metrics import PoolMetrics, instrumented_pool_class, install_pre_ping
+from app.utils.profiling import install_sql_profiling
+from app.utils.replica import replica_router, user_writes
 
-engine = create_engine(DATABASE_URL, pool_pre_ping=True)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+DATABASE_URL = settings.DATABASE_URL
+
+# Pilotes asynchrones associés aux pilotes synchrones de DATABASE_URL
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+}
+
+def get_async_database_url(url: str) -> str:
+    """Déduit l'URL asynchrone (asyncpg/aiosqlite) à partir de l'URL synchrone"""
+    parsed = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed.drivername, parsed.drivername)
+    return parsed.set(drivername=driver).render_as_string(hide_password=False)
+
+ASYNC_DATABASE_URL = settings.ASYNC_DATABASE_URL or get_async_database_url(DATABASE_URL)
+
+REPLICA_URL = settings.DATABASE_REPLICA_URL
+ASYNC_REPLICA_URL = settings.ASYNC_DATABASE_REPLICA_URL or (REPLICA_URL and get_async_database_url(REPLICA_URL))
+
+def pool_capacity() -> tuple:
+    """Taille et débordement du pool de ce worker.
+
+    Avec DB_MAX_CONNECTIONS, le budget de connexions du serveur est réparti entre
+    ses WEB_WORKERS processus (par moteur) : DB_POOL_SIZE et DB_MAX_OVERFLOW
+    deviennent des plafonds.
+    """
+    size, overflow = settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW
+    if settings.DB_MAX_CONNECTIONS:
+        per_worker = max(1, settings.DB_MAX_CONNECTIONS // (settings.WEB_WORKERS or 1))
+        size = min(size, per_worker)
+        overflow = min(overflow, per_worker - size)
+    return size, overflow
+
+def pool_options() -> dict:
+    """Options de pool communes aux moteurs synchrone et asynchrone"""
+    size, overflow = pool_capacity()
+    return {
+        "pool_size": size,
+        "max_overflow": overflow,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+    }
+
+# Statistiques des pools, exposées par /status/pool (réplique ajoutée si configurée)
+pool_metrics = {"sync": PoolMetrics("sync"), "async": PoolMetrics("async")}
+
+def create_engines(url: str, async_url: str, name: str = ""):
+    """Moteurs synchrone et asynchrone instrumentés d'une base (`name` préfixe leurs statistiques)"""
+    sync_metrics = pool_metrics.setdefault(f"{name}sync", PoolMetrics(f"{name}sync"))
+    async_metrics = pool_metrics.setdefault(f"{name}async", PoolMetrics(f"{name}async"))
+    sync_engine = create_engine(
+        url,
+        poolclass=instrumented_pool_class(QueuePool, sync_metrics),
+        # SQLite : la session synchrone passe d'un thread du pool à l'autre
+        connect_args={"check_same_thread": False} if url.startswith("sqlite") else {},
+        **pool_options()
+    )
+    async_db_engine = create_async_engine(
+        async_url,
+        poolclass=instrumented_pool_class(AsyncAdaptedQueuePool, async_metrics),
+        **pool_options()
+    )
+    for target, metrics in ((sync_engine, sync_metrics), (async_db_engine.sync_engine, async_metrics)):
+        install_pre_ping(target, metrics, settings.DB_POOL_PRE_PING, settings.DB_POOL_PRE_PING_IDLE_SECONDS)
+        install_query_metrics(target)
+        install_sql_profiling(target)
+    return sync_engine, async_db_engine
+
+# Moteurs et fabriques de sessions créés par init_engines() (lifespan), pas à
+# l'import : importer l'application ne charge aucun pilote et ne touche pas à la base.
+_initialized = False
+
+def init_engines():
+    """Crée les moteurs du primaire et de la réplique éventuelle (idempotent, aucune connexion ouverte)"""
+    global engine, async_engine, SessionLocal, AsyncSessionLocal, _initialized
+    global replica_engine, async_replica_engine, ReplicaSessionLocal, AsyncReplicaSessionLocal
+    if _initialized:
+        return
+    engine, async_engine = create_engines(DATABASE_URL, ASYNC_DATABASE_URL)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+    replica_engine = async_replica_engine = ReplicaSessionLocal = AsyncReplicaSessionLocal = None
+    if REPLICA_URL:
+        replica_engine, async_replica_engine = create_engines(REPLICA_URL, ASYNC_REPLICA_URL, name="replica_")
+        ReplicaSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=replica_engine)
+        AsyncReplicaSessionLocal = async_sessionmaker(async_replica_engine, autoflush=False, expire_on_commit=False)
+    _initialized = True
+
+async def dispose_engines():
+    """Ferme les connexions des pools (arrêt du worker)"""
+    if _initialized:
+        for target in (async_engine, async_replica_engine):
+            if target is not None:
+                await target.dispose()
+        for target in (engine, replica_engine):
+            if target is not None:
+                target.dispose()
+
+ENGINE_ATTRIBUTES = {
+    "engine", "async_engine", "SessionLocal", "AsyncSessionLocal",
+    "replica_engine", "async_replica_engine", "ReplicaSessionLocal", "AsyncReplicaSessionLocal",
+}
+
+def __getattr__(name):
+    # Hors lifespan (tests, scripts, benchmarks) : moteurs créés au premier accès
+    if name in ENGINE_ATTRIBUTES:
+        init_engines()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 Base = declarative_base()
 
+class ThreadedSession:
+    """Session synchrone exposant l'interface awaitable d'AsyncSession.
+
+    Chaque appel à la base est exécuté dans le threadpool de Starlette, ce qui
+    permet aux routes `async def` de fonctionner en mode synchrone (DB_ASYNC=false).
+    """
+
+    def __init__(self, session: Session):
+        self.sync_session = session
+
+    @property
+    def info(self) -> dict:
+        return self.sync_session.info
+
+    def add(self, instance):
+        self.sync_session.add(instance)
+
+    def add_all(self, instances):
+        self.sync_session.add_all(instances)
+
+    async def execute(self, statement, *args, **kwargs):
+        return await run_in_threadpool(self.sync_session.execute, statement, *args, **kwargs)
+
+    async def scalar(self, statement, *args, **kwargs):
+        return await run_in_threadpool(self.sync_session.scalar, statement, *args, **kwargs)
+
+    async def scalars(self, statement, *args, **kwargs):
+        return await run_in_threadpool(self.sync_session.scalars, statement, *args, **kwargs)
+
+    async def get(self, entity, ident, **kwargs):
+        return await run_in_threadpool(self.sync_session.get, entity, ident, **kwargs)
+
+    async def refresh(self, instance, *args, **kwargs):
+        await run_in_threadpool(self.sync_session.refresh, instance, *args, **kwargs)
+
+    async def delete(self, instance):
+        await run_in_threadpool(self.sync_session.delete, instance)
+
+    async def flush(self):
+        await run_in_threadpool(self.sync_session.flush)
+
+    async def commit(self):
+        await run_in_threadpool(self.sync_session.commit)
+
+    async def rollback(self):
+        await run_in_threadpool(self.sync_session.rollback)
+
+    async def close(self):
+        await run_in_threadpool(self.sync_session.close)
+
+    async def connection(self):
+        return await run_in_threadpool(self.sync_session.connection)
+
+    async def run_sync(self, fn, *args, **kwargs):
+        return await run_in_threadpool(fn, self.sync_session, *args, **kwargs)
+
+# En mode synchrone, une session bloquée en attente d'une connexion occupe un
+# thread dont d'autres sessions ont besoin pour rendre la leur : on limite donc
+# le nombre de sessions ouvertes à la capacité du pool, sans occuper de thread.
+sync_sessions = asyncio.Semaphore(sum(pool_capacity()))
+replica_sessions = asyncio.Semaphore(sum(pool_capacity()))
+
+# Lire ses écritures : get_current_user inscrit l'utilisateur dans session.info,
+# un commit le fait lire sur le primaire pendant REPLICA_STICKY_SECONDS
+@event.listens_for(Session, "after_commit")
+def remember_commit(session):
+    session.info["committed"] = True
+
+async def remember_writer(db):
+    user_id = db.info.get("user_id")
+    if user_id is not None and db.info.get("committed"):
+        await replica_router.mark_write(user_writes(user_id))
+
 # Dépendance FastAPI pour obtenir une session DB par requête
-def get_db():
-    db = SessionLocal()
+async def get_db():
+    if not _initialized:
+        init_engines()
+    if settings.DB_ASYNC:
+        async with AsyncSessionLocal() as db:
+            try:
+                yield db
+            finally:
+                await remember_writer(db)
+    else:
+        async with sync_sessions:
+            db = ThreadedSession(SessionLocal(expire_on_commit=False))
+            try:
+                yield db
+            finally:
+                await remember_writer(db)
+                await db.close()
+
+# Même session hors requête HTTP (tâches de fond) : async with session_scope() as db
+session_scope = asynccontextmanager(get_db)
+
+async def open_replica_session():
+    """Session sur la réplique, connexion déjà obtenue ; None (réplique écartée) si elle ne répond pas"""
+    if settings.DB_ASYNC:
+        db = AsyncReplicaSessionLocal()
+    else:
+        db = ThreadedSession(ReplicaSessionLocal(expire_on_commit=False))
     try:
+        await db.connection()
+    except (SQLAlchemyError, OSError) as exc:
+        await db.close()
+        replica_router.mark_down(exc)
+        return None
+    return db
+
+@asynccontextmanager
+async def read_session(sticky_key: Optional[str] = None):
+    """Session des routes en lecture seule : réplique si le routeur l'accepte, sinon primaire.
+
+    `sticky_key` : lecture sur le primaire si cette clé a été écrite récemment.
+
+    Réplique injoignable à l'ouverture : la requête bascule sur le primaire. Une
+    connexion perdue en cours de requête fait échouer celle-ci, et écarte la
+    réplique pour les suivantes.
+    """
+    if not _initialized:
+        init_engines()
+    if AsyncReplicaSessionLocal is None or not await replica_router.choose(sticky_key):
+        async with session_scope() as db:
+            yield db
+        return
+    async with replica_sessions if not settings.DB_ASYNC else nullcontext():
+        db = await open_replica_session()
+        if db is None:
+            async with session_scope() as db:
+                yield db
+            return
+        try:
+            yield db
+        except DBAPIError as exc:
+            if exc.connection_invalidated:
+                replica_router.mark_down(exc)
+            raise
+        finally:
+            await db.close()
+
+# Dépendances FastAPI des routes publiques en lecture seule
+async def get_read_db():
+    async with read_session() as db:
         yield db
-    finally:
-        db.close()
\ No newline at end of file
+
+def read_engine(asynchronous: bool = True):
+    """Moteur pour une lecture hors session (exports) : réplique si elle est à jour"""
+    if not _initialized:
+        init_engines()
+    if async_replica_engine is not None and replica_router.state() == "ok":
+        return async_replica_engine if asynchronous else replica_engine
+    return async_engine if asynchronous else engine
@@ -1,19 +1,65 @@
-from fastapi import FastAPI
+import asyncio
+import os
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
 from sqlalchemy.orm import Session
 
-from app.database import Base, engine
+from app.core.config import settings
+from app import database
+from app.core.startup import check_readiness, startup_report, warm_up
+from app.database import pool_metrics
 from app.routes import auth, offres, transactions, admin
+from app.security import PasswordHasherBusy
+from app.utils.events import offre_events
+from app.utils.metrics import CONTENT_TYPE_LATEST, MetricsMiddleware, mark_process_dead, render_metrics
+from app.utils.profiling import SQLProfilingMiddleware
+from app.utils.replica import replica_router
+from app.utils.rate_limit import AdmissionMiddleware
+from app.workers.expiration import run_sweeper
+from app.workers.outbox import run_outbox_worker
+
+# Le schéma est géré par les migrations (alembic upgrade head) ; le démarrage
+# vérifie seulement qu'il est en place. Aucun accès à la base à l'import.
 
-# Création des tables au démarrage (dev)
-Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await warm_up()
+    # Chaque worker lance les tâches de fond ; seul celui qui obtient le verrou de chacune travaille
+    await offre_events.start()
+    stop = asyncio.Event()
+    tasks = []
+    if settings.EXPIRATION_SWEEP_INTERVAL > 0:
+        tasks.append(asyncio.create_task(run_sweeper(stop, settings.EXPIRATION_SWEEP_INTERVAL)))
+    if database.async_replica_engine is not None:
+        # Par worker : chacun mesure le retard de la réplique pour ses propres lectures
+        tasks.append(asyncio.create_task(
+            replica_router.monitor(database.async_replica_engine, stop, settings.REPLICA_LAG_CHECK_INTERVAL)
+        ))
+    if settings.SMTP_HOST and settings.OUTBOX_INTERVAL > 0:
+        tasks.append(asyncio.create_task(run_outbox_worker(stop, settings.OUTBOX_INTERVAL)))
+    try:
+        yield
+    finally:
+        stop.set()
+        await asyncio.gather(*tasks)
+        # Termine les flux WebSocket/SSE ouverts
+        await offre_events.stop()
+        await database.dispose_engines()
+        mark_process_dead()
 
 app = FastAPI(
     title="Backend FastAPI - Transfert de denrées",
     version="1.0.0",
-    description="API pour authentification et gestion du système de dons alimentaires."
+    description="API pour authentification et gestion du système de dons alimentaires.",
+    lifespan=lifespan,
 )
 
+# Limitation de débit et contrôle d'admission, sous CORS : les refus portent les en-têtes CORS
+app.add_middleware(AdmissionMiddleware)
+
 # CORS (autorise l'appli Flutter pendant le dev)
 app.add_middleware(
     CORSMiddleware,
@@ -23,6 +69,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Profilage SQL (SQL_PROFILING) : sans effet tant qu'il n'est pas activé
+app.add_middleware(SQLProfilingMiddleware)
+
+# Ajouté en dernier : englobe les autres middlewares et mesure la requête complète
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+# File de hachage bcrypt pleine : on refuse vite plutôt que d'empiler
+@app.exception_handler(PasswordHasherBusy)
+async def password_hasher_busy_handler(request: Request, exc: PasswordHasherBusy):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Service momentanément surchargé, réessayez."},
+        headers={"Retry-After": "1"},
+    )
+
 # Routers
 app.include_router(auth.router, prefix="/auth", tags=["Authentication"])
 app.include_router(offres.router, prefix="/offres", tags=["Offres"])
@@ -39,4 +101,32 @@ def system_status():
         "status": "running",
         "service": "transfert-denrees-api",
         "version": "1.0.0"
-    }
\ No newline at end of file
+    }
+
+@app.get("/status/health", tags=["System"])
+def health():
+    # Vivacité : le processus répond ; ne dépend pas de la base
+    return {
+        "status": "draining" if startup_report.draining else "ok",
+        "pid": os.getpid(),
+        "startup_ms": {step: round(seconds * 1000, 1) for step, seconds in startup_report.timings.items()},
+        "startup_errors": startup_report.errors,
+    }
+
+@app.get("/status/ready", tags=["System"])
+async def ready():
+    # Disponibilité : 503 tant que le démarrage n'est pas fini, pendant l'arrêt ou si la base ne répond pas
+    is_ready, details = await check_readiness()
+    return JSONResponse({"ready": is_ready, **details}, status_code=200 if is_ready else 503)
+
+@app.get("/status/pool", tags=["System"])
+def pool_status():
+    # Statistiques live du pool actif (et de l'autre moteur pour comparaison)
+    return {
+        "active": "async" if settings.DB_ASYNC else "sync",
+        "pools": {name: metrics.snapshot() for name, metrics in pool_metrics.items()},
+    }
+
+@app.get("/metrics", tags=["System"], include_in_schema=False)
+def metrics():
+    return Response(render_metrics(), media_type=CONTENT_TYPE_LATEST)
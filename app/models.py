@@ -1,9 +1,17 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Enum, Text, Float, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Enum, Text, Float, ForeignKey, Index
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, text
 from app.database import Base
 import enum
 
+def stock_initial(context):
+    # Une offre neuve n'a aucune portion réservée
+    return context.get_current_parameters()["quantite"]
+
+# Clés ASCII comparées octet par octet (plages de préfixes sur l'index, quelle que soit la locale)
+def ascii_key(length: int):
+    return String(length).with_variant(String(length, collation="C"), "postgresql")
+
 class RoleEnum(str, enum.Enum):
     beneficiaire = "beneficiaire"
     donateur = "donateur"
@@ -20,6 +28,11 @@ class StatutTransactionEnum(str, enum.Enum):
     recupere = "recupere"
     annule = "annule"
 
+class StatutEmailEnum(str, enum.Enum):
+    en_attente = "en_attente"
+    envoye = "envoye"
+    echec = "echec"
+
 class Utilisateur(Base):
     __tablename__ = "utilisateurs"
 
@@ -34,6 +47,13 @@ class Utilisateur(Base):
     offres = relationship("Offre", back_populates="createur")
     transactions = relationship("Transaction", back_populates="beneficiaire")
 
+    __table_args__ = (
+        # Pagination par curseur sur (created_at, id)
+        Index("ix_utilisateurs_created_at_id", "created_at", "id"),
+        # Filtres de /admin/users
+        Index("ix_utilisateurs_role_is_active", "role", "is_active"),
+    )
+
 class Offre(Base):
     __tablename__ = "offres"
 
@@ -42,15 +62,45 @@ class Offre(Base):
     description = Column(Text, nullable=True)
     type_offre = Column(Enum(TypeOffreEnum), nullable=False)
     quantite = Column(Integer, nullable=False)
+    # Portions encore réservables ; l'offre est indisponible quand il n'en reste plus
+    quantite_restante = Column(Integer, nullable=False, default=stock_initial)
     localisation = Column(String(255), nullable=True)
     date_expiration = Column(DateTime(timezone=True), nullable=True)
     is_disponible = Column(Boolean, default=True)
+    # Mise hors ligne par le créateur ou un admin : des portions rendues ne la remettent pas en ligne
+    is_bloquee = Column(Boolean, nullable=False, default=False)
     createur_id = Column(Integer, ForeignKey("utilisateurs.id"), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Position facultative ; geohash précalculé (app.utils.search.set_location) pour la recherche de proximité
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
+    geohash = Column(ascii_key(12), nullable=True)
     
     createur = relationship("Utilisateur", back_populates="offres")
     transactions = relationship("Transaction", back_populates="offre")
 
+    __table_args__ = (
+        Index("ix_offres_created_at_id", "created_at", "id"),
+        # Index partiel : GET /offres/ ne lit que les offres disponibles
+        Index(
+            "ix_offres_disponibles_created_at_id", "created_at", "id",
+            postgresql_where=text("is_disponible"),
+            sqlite_where=text("is_disponible = 1"),
+        ),
+        # Filtres de /admin/offres, dans l'ordre de pagination
+        Index("ix_offres_is_disponible_created_at_id", "is_disponible", "created_at", "id"),
+        Index("ix_offres_type_offre_created_at_id", "type_offre", "created_at", "id"),
+        Index("ix_offres_createur_id", "createur_id"),
+        # Recherche de proximité : plages de préfixes géohash
+        Index("ix_offres_geohash", "geohash"),
+        # Balayeur : offres disponibles déjà expirées
+        Index(
+            "ix_offres_disponibles_date_expiration", "date_expiration",
+            postgresql_where=text("is_disponible"),
+            sqlite_where=text("is_disponible = 1"),
+        ),
+    )
+
 class Transaction(Base):
     __tablename__ = "transactions"
 
@@ -58,8 +108,59 @@ class Transaction(Base):
     offre_id = Column(Integer, ForeignKey("offres.id"), nullable=False)
     beneficiaire_id = Column(Integer, ForeignKey("utilisateurs.id"), nullable=False)
     statut = Column(Enum(StatutTransactionEnum), nullable=False, default=StatutTransactionEnum.reserve)
+    quantite = Column(Integer, nullable=False, default=1)  # portions réservées
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     
     offre = relationship("Offre", back_populates="transactions")
-    beneficiaire = relationship("Utilisateur", back_populates="transactions")
\ No newline at end of file
+    beneficiaire = relationship("Utilisateur", back_populates="transactions")
+
+    __table_args__ = (
+        Index("ix_transactions_created_at_id", "created_at", "id"),
+        Index("ix_transactions_offre_id_statut", "offre_id", "statut"),
+        Index("ix_transactions_beneficiaire_id_created_at", "beneficiaire_id", "created_at"),
+        # Une seule transaction par bénéficiaire et par offre, quel que soit son statut
+        Index("uq_transactions_offre_beneficiaire", "offre_id", "beneficiaire_id", unique=True),
+        # Balayeur : réservations non récupérées, les plus anciennes d'abord
+        Index(
+            "ix_transactions_reserve_created_at", "created_at",
+            postgresql_where=text("statut = 'reserve'"),
+            sqlite_where=text("statut = 'reserve'"),
+        ),
+    )
+
+# Index inversé de la recherche plein texte : un terme normalisé par ligne
+class OffreTerme(Base):
+    __tablename__ = "offre_termes"
+
+    terme = Column(ascii_key(64), primary_key=True)
+    offre_id = Column(Integer, ForeignKey("offres.id", ondelete="CASCADE"), primary_key=True)
+
+    __table_args__ = (
+        Index("ix_offre_termes_offre_id", "offre_id"),
+    )
+
+# Boîte d'envoi transactionnelle : écrite dans la même transaction que l'action
+# métier, vidée par le worker app.workers.outbox
+class EmailSortant(Base):
+    __tablename__ = "emails_sortants"
+
+    id = Column(Integer, primary_key=True)
+    destinataire = Column(String(120), nullable=False)
+    sujet = Column(String(255), nullable=False)
+    corps = Column(Text, nullable=False)
+    statut = Column(Enum(StatutEmailEnum), nullable=False, default=StatutEmailEnum.en_attente)
+    tentatives = Column(Integer, nullable=False, default=0)
+    prochain_essai = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    derniere_erreur = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    envoye_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        # Messages à (re)tenter, dans l'ordre d'échéance
+        Index(
+            "ix_emails_sortants_en_attente", "prochain_essai", "id",
+            postgresql_where=text("statut = 'en_attente'"),
+            sqlite_where=text("statut = 'en_attente'"),
+        ),
+    )
@@ -1,21 +1,40 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from datetime import datetime, timezone
+
+from fastapi import APIRouter, Depends, HTTPException, Response, status, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from sqlalchemy import func, select, update
 from typing import List, Optional
 
+from app.core.config import settings
 from app.database import get_db
 from app import models
 from app.schemas import (
     UserOut, UserUpdate, UserWithStats, UserStats,
     OffreOut, OffreWithCreator, TransactionOut, TransactionWithDetails,
-    DashboardStats
+    DashboardStats, BulkDisponibilite, BulkIds, BulkResult
 )
-from app.routes.auth import get_current_user
+from app.routes.auth import CurrentUser, get_current_user, get_user_read_db, user_cache
+from app.routes.transactions import TRANSACTION_DETAILS, TRANSACTION_DETAILS_ROWS
+from app.utils.events import OFFRE_LIBEREE, OFFRE_MODIFIEE, OFFRE_SUPPRIMEE, offre_events
+from app.utils.export import ExportFormat, export_response
+from app.utils.fast_json import RowSerializer, json_response
+from app.utils.notifications import ANNULATION, notify_donateurs
+from app.utils.pagination import paginate_keyset, cached_count, pagination_headers, set_pagination_headers
+from app.utils.response_cache import invalidate_offre, invalidate_offres
+from app.utils.stats import dashboard_stats
+from app.utils.stock import STOCK_EPUISE, annuler_et_restituer, changer_disponibilite
 
 router = APIRouter()
 
+# Chemin rapide (FAST_SERIALIZATION) pour la liste admin des offres
+OFFRE_WITH_CREATOR_ROWS = RowSerializer(
+    OffreWithCreator, models.Offre, nested={"createur": (UserOut, models.Offre.createur)}
+)
+USER_ROWS = RowSerializer(UserOut, models.Utilisateur)
+
 # Dépendance pour vérifier les droits admin
-def get_admin_user(current_user: models.Utilisateur = Depends(get_current_user)):
+async def get_admin_user(current_user: CurrentUser = Depends(get_current_user)):
     if current_user.role != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -27,42 +46,50 @@ def get_admin_user(current_user: models.Utilisateur = Depends(get_current_user))
 
 # Lister tous les utilisateurs avec pagination et filtres
 @router.get("/users", response_model=List[UserOut])
-def list_users(
+async def list_users(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, le=1000),
+    cursor: Optional[str] = Query(None),
+    include_total: bool = Query(False),
     role: Optional[str] = Query(None),
     is_active: Optional[bool] = Query(None),
-    db: Session = Depends(get_db),
-    admin: models.Utilisateur = Depends(get_admin_user)
+    db: AsyncSession = Depends(get_user_read_db),
+    admin: CurrentUser = Depends(get_admin_user)
 ):
-    query = db.query(models.Utilisateur)
+    query = select(models.Utilisateur)
     
     if role:
-        query = query.filter(models.Utilisateur.role == role)
+        query = query.where(models.Utilisateur.role == role)
     if is_active is not None:
-        query = query.filter(models.Utilisateur.is_active == is_active)
+        query = query.where(models.Utilisateur.is_active == is_active)
     
-    users = query.offset(skip).limit(limit).all()
+    users, next_cursor = await paginate_keyset(db, query, models.Utilisateur, limit, cursor=cursor, skip=skip)
+    total = await cached_count(db, query, ("users", role, is_active)) if include_total else None
+    set_pagination_headers(response, next_cursor, total)
     return users
 
 # Détails d'un utilisateur avec statistiques
 @router.get("/users/{user_id}", response_model=UserWithStats)
-def get_user_details(
+async def get_user_details(
     user_id: int,
-    db: Session = Depends(get_db),
-    admin: models.Utilisateur = Depends(get_admin_user)
+    db: AsyncSession = Depends(get_user_read_db),
+    admin: CurrentUser = Depends(get_admin_user)
 ):
-    user = db.query(models.Utilisateur).filter(models.Utilisateur.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="Utilisateur non trouvé.")
-    
-    # Calculer les statistiques
-    total_offres = db.query(models.Offre).filter(models.Offre.createur_id == user_id).count()
-    total_transactions = db.query(models.Transaction).filter(models.Transaction.beneficiaire_id == user_id).count()
-    transactions_actives = db.query(models.Transaction).filter(
+    # Utilisateur et statistiques en un seul aller-retour
+    total_offres = select(func.count()).where(models.Offre.createur_id == user_id).scalar_subquery()
+    total_transactions = select(func.count()).where(models.Transaction.beneficiaire_id == user_id).scalar_subquery()
+    transactions_actives = select(func.count()).where(
         models.Transaction.beneficiaire_id == user_id,
         models.Transaction.statut.in_(["reserve", "recupere"])
-    ).count()
+    ).scalar_subquery()
+    row = (await db.execute(
+        select(models.Utilisateur, total_offres, total_transactions, transactions_actives)
+        .where(models.Utilisateur.id == user_id)
+    )).first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Utilisateur non trouvé.")
+    user, total_offres, total_transactions, transactions_actives = row
     
     stats = UserStats(
         total_offres=total_offres,
@@ -74,13 +101,13 @@ def get_user_details(
 
 # Modifier un utilisateur
 @router.put("/users/{user_id}", response_model=UserOut)
-def update_user(
+async def update_user(
     user_id: int,
     user_update: UserUpdate,
-    db: Session = Depends(get_db),
-    admin: models.Utilisateur = Depends(get_admin_user)
+    db: AsyncSession = Depends(get_db),
+    admin: CurrentUser = Depends(get_admin_user)
 ):
-    user = db.query(models.Utilisateur).filter(models.Utilisateur.id == user_id).first()
+    user = await db.get(models.Utilisateur, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="Utilisateur non trouvé.")
     
@@ -89,21 +116,54 @@ def update_user(
         raise HTTPException(status_code=400, detail="Vous ne pouvez pas désactiver votre propre compte.")
     
     # Mettre à jour les champs
-    for field, value in user_update.dict(exclude_unset=True).items():
+    was_active = user.is_active
+    for field, value in user_update.model_dump(exclude_unset=True).items():
         setattr(user, field, value)
     
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    # is_active/role ont pu changer : le prochain accès relira le compte
+    user_cache.invalidate(user_id)
+    dashboard_stats.apply(utilisateurs_actifs=int(user.is_active) - int(was_active))
+    await db.refresh(user)
     return user
 
+# Désactiver des utilisateurs par lots
+@router.put("/users/bulk/desactivation", response_model=BulkResult)
+async def deactivate_users_bulk(
+    lot: BulkIds,
+    db: AsyncSession = Depends(get_db),
+    admin: CurrentUser = Depends(get_admin_user)
+):
+    ids = [user_id for user_id in lot.ids if user_id != admin.id]
+    existants = set((await db.scalars(select(models.Utilisateur.id).where(models.Utilisateur.id.in_(ids)))).all())
+    desactives = (await db.scalars(
+        update(models.Utilisateur)
+        .where(models.Utilisateur.id.in_(existants), models.Utilisateur.is_active == True)
+        .values(is_active=False)
+        .returning(models.Utilisateur.id)
+        .execution_options(synchronize_session=False)
+    )).all()
+    await db.commit()
+    for user_id in desactives:
+        user_cache.invalidate(user_id)
+    dashboard_stats.apply(utilisateurs_actifs=-len(desactives))
+    
+    erreurs = []
+    for index, user_id in enumerate(lot.ids):
+        if user_id == admin.id:
+            erreurs.append({"index": index, "detail": "Vous ne pouvez pas désactiver votre propre compte."})
+        elif user_id not in existants:
+            erreurs.append({"index": index, "detail": "Utilisateur non trouvé."})
+    return {"modifies": len(desactives), "ids": desactives, "erreurs": erreurs}
+
 # Supprimer un utilisateur
 @router.delete("/users/{user_id}")
-def delete_user(
+async def delete_user(
     user_id: int,
-    db: Session = Depends(get_db),
-    admin: models.Utilisateur = Depends(get_admin_user)
+    db: AsyncSession = Depends(get_db),
+    admin: CurrentUser = Depends(get_admin_user)
 ):
-    user = db.query(models.Utilisateur).filter(models.Utilisateur.id == user_id).first()
+    user = await db.get(models.Utilisateur, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="Utilisateur non trouvé.")
     
@@ -111,134 +171,235 @@ def delete_user(
         raise HTTPException(status_code=400, detail="Vous ne pouvez pas supprimer votre propre compte.")
     
     # Anonymiser plutôt que supprimer (GDPR friendly)
+    was_active = user.is_active
     user.nom = "Utilisateur supprimé"
     user.email = f"deleted_{user_id}@deleted.com"
     user.is_active = False
     
-    db.commit()
+    await db.commit()
+    user_cache.invalidate(user_id)
+    dashboard_stats.apply(utilisateurs_actifs=-int(was_active))
     return {"message": "Utilisateur anonymisé avec succès."}
 
 # === SUPERVISION DES OFFRES ===
 
 # Lister toutes les offres avec détails créateur
 @router.get("/offres", response_model=List[OffreWithCreator])
-def list_all_offres(
+async def list_all_offres(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, le=1000),
+    cursor: Optional[str] = Query(None),
+    include_total: bool = Query(False),
     is_disponible: Optional[bool] = Query(None),
     type_offre: Optional[str] = Query(None),
-    db: Session = Depends(get_db),
-    admin: models.Utilisateur = Depends(get_admin_user)
+    db: AsyncSession = Depends(get_user_read_db),
+    admin: CurrentUser = Depends(get_admin_user)
 ):
-    query = db.query(models.Offre)
-    
+    filters = []
     if is_disponible is not None:
-        query = query.filter(models.Offre.is_disponible == is_disponible)
+        filters.append(models.Offre.is_disponible == is_disponible)
     if type_offre:
-        query = query.filter(models.Offre.type_offre == type_offre)
+        filters.append(models.Offre.type_offre == type_offre)
+    query = select(models.Offre).options(joinedload(models.Offre.createur, innerjoin=True)).where(*filters)
+    total = await cached_count(db, query, ("offres", is_disponible, type_offre)) if include_total else None
     
-    offres = query.offset(skip).limit(limit).all()
+    if settings.FAST_SERIALIZATION:
+        rows, next_cursor = await paginate_keyset(
+            db, OFFRE_WITH_CREATOR_ROWS.select().where(*filters), models.Offre, limit, cursor=cursor, skip=skip, as_rows=True
+        )
+        return json_response(OFFRE_WITH_CREATOR_ROWS.dumps(rows), pagination_headers(next_cursor, total))
+    
+    offres, next_cursor = await paginate_keyset(db, query, models.Offre, limit, cursor=cursor, skip=skip)
+    set_pagination_headers(response, next_cursor, total)
     return offres
 
 # Bloquer/débloquer une offre
 @router.put("/offres/{offre_id}/toggle-disponibilite", response_model=OffreOut)
-def toggle_offre_disponibilite(
+async def toggle_offre_disponibilite(
     offre_id: int,
-    db: Session = Depends(get_db),
-    admin: models.Utilisateur = Depends(get_admin_user)
+    db: AsyncSession = Depends(get_db),
+    admin: CurrentUser = Depends(get_admin_user)
 ):
-    offre = db.query(models.Offre).filter(models.Offre.id == offre_id).first()
+    offre = await db.get(models.Offre, offre_id)
     if not offre:
         raise HTTPException(status_code=404, detail="Offre non trouvée.")
-    
-    offre.is_disponible = not offre.is_disponible
-    db.commit()
-    db.refresh(offre)
+    # Disponibilité déduite du stock : une offre épuisée ne se remet pas en ligne
+    if not await changer_disponibilite(db, offre, not offre.is_disponible):
+        await db.rollback()
+        raise HTTPException(status_code=400, detail=STOCK_EPUISE)
+    await db.commit()
+    dashboard_stats.apply(offres_disponibles=1 if offre.is_disponible else -1)
+    await invalidate_offre(offre_id)
+    await offre_events.publish(OFFRE_MODIFIEE, [offre_id])
+    await db.refresh(offre)
     return offre
 
+# Bloquer/débloquer des offres par lots (un seul UPDATE)
+@router.put("/offres/bulk/disponibilite", response_model=BulkResult)
+async def set_offres_disponibilite_bulk(
+    lot: BulkDisponibilite,
+    db: AsyncSession = Depends(get_db),
+    admin: CurrentUser = Depends(get_admin_user)
+):
+    existants = set((await db.scalars(select(models.Offre.id).where(models.Offre.id.in_(lot.ids)))).all())
+    # Les offres épuisées restent indisponibles
+    en_stock = [models.Offre.quantite_restante > 0] if lot.is_disponible else []
+    modifiees = (await db.scalars(
+        update(models.Offre)
+        .where(models.Offre.id.in_(existants), models.Offre.is_disponible == (not lot.is_disponible), *en_stock)
+        .values(is_disponible=lot.is_disponible, is_bloquee=not lot.is_disponible)
+        .returning(models.Offre.id)
+        .execution_options(synchronize_session=False)
+    )).all()
+    if not lot.is_disponible:
+        # Déjà hors ligne faute de stock : bloquées quand même, une annulation ne les remettra pas en ligne
+        await db.execute(
+            update(models.Offre)
+            .where(models.Offre.id.in_(existants), models.Offre.is_bloquee == False)
+            .values(is_bloquee=True)
+            .execution_options(synchronize_session=False)
+        )
+    await db.commit()
+    dashboard_stats.apply(offres_disponibles=len(modifiees) if lot.is_disponible else -len(modifiees))
+    await invalidate_offres(modifiees)
+    await offre_events.publish(OFFRE_MODIFIEE, modifiees)
+    
+    erreurs = [{"index": index, "detail": "Offre non trouvée."} for index, offre_id in enumerate(lot.ids) if offre_id not in existants]
+    return {"modifies": len(modifiees), "ids": modifiees, "erreurs": erreurs}
+
 # Supprimer une offre
 @router.delete("/offres/{offre_id}")
-def delete_offre_admin(
+async def delete_offre_admin(
     offre_id: int,
-    db: Session = Depends(get_db),
-    admin: models.Utilisateur = Depends(get_admin_user)
+    db: AsyncSession = Depends(get_db),
+    admin: CurrentUser = Depends(get_admin_user)
 ):
-    offre = db.query(models.Offre).filter(models.Offre.id == offre_id).first()
+    offre = await db.get(models.Offre, offre_id)
     if not offre:
         raise HTTPException(status_code=404, detail="Offre non trouvée.")
     
-    db.delete(offre)
-    db.commit()
+    was_disponible = offre.is_disponible
+    await db.delete(offre)
+    await db.commit()
+    dashboard_stats.apply(total_offres=-1, offres_disponibles=-int(was_disponible))
+    await invalidate_offre(offre_id, listed=bool(was_disponible))
+    await offre_events.publish(OFFRE_SUPPRIMEE, [offre_id])
     return {"message": "Offre supprimée avec succès."}
 
 # === SUPERVISION DES TRANSACTIONS ===
 
 # Lister toutes les transactions
 @router.get("/transactions", response_model=List[TransactionWithDetails])
-def list_all_transactions(
+async def list_all_transactions(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, le=1000),
+    cursor: Optional[str] = Query(None),
+    include_total: bool = Query(False),
     statut: Optional[str] = Query(None),
-    db: Session = Depends(get_db),
-    admin: models.Utilisateur = Depends(get_admin_user)
+    db: AsyncSession = Depends(get_user_read_db),
+    admin: CurrentUser = Depends(get_admin_user)
 ):
-    query = db.query(models.Transaction)
+    filters = [models.Transaction.statut == statut] if statut else []
+    query = select(models.Transaction).options(*TRANSACTION_DETAILS).where(*filters)
+    total = await cached_count(db, query, ("transactions", statut)) if include_total else None
     
-    if statut:
-        query = query.filter(models.Transaction.statut == statut)
+    if settings.FAST_SERIALIZATION:
+        rows, next_cursor = await paginate_keyset(
+            db, TRANSACTION_DETAILS_ROWS.select().where(*filters), models.Transaction, limit,
+            cursor=cursor, skip=skip, descending=True, as_rows=True
+        )
+        return json_response(TRANSACTION_DETAILS_ROWS.dumps(rows), pagination_headers(next_cursor, total))
     
-    transactions = query.order_by(models.Transaction.created_at.desc()).offset(skip).limit(limit).all()
+    transactions, next_cursor = await paginate_keyset(
+        db, query, models.Transaction, limit, cursor=cursor, skip=skip, descending=True
+    )
+    set_pagination_headers(response, next_cursor, total)
     return transactions
 
 # Forcer l'annulation d'une transaction
 @router.put("/transactions/{transaction_id}/forcer-annulation", response_model=TransactionOut)
-def forcer_annulation_transaction(
+async def forcer_annulation_transaction(
     transaction_id: int,
-    db: Session = Depends(get_db),
-    admin: models.Utilisateur = Depends(get_admin_user)
+    db: AsyncSession = Depends(get_db),
+    admin: CurrentUser = Depends(get_admin_user)
 ):
-    transaction = db.query(models.Transaction).filter(models.Transaction.id == transaction_id).first()
+    transaction = await db.get(models.Transaction, transaction_id)
     if not transaction:
         raise HTTPException(status_code=404, detail="Transaction non trouvée.")
     
     if transaction.statut == "annule":
         raise HTTPException(status_code=400, detail="Cette transaction est déjà annulée.")
     
+    # Rend les portions d'une transaction réservée ; une transaction récupérée n'en rend pas
     ancien_statut = transaction.statut
-    transaction.statut = "annule"
+    remises = await annuler_et_restituer(db, transaction, datetime.now(timezone.utc))
+    if remises is None:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Cette transaction a été modifiée entre-temps.")
     
-    # Remettre l'offre disponible si nécessaire
+    await notify_donateurs(db, [transaction.id], ANNULATION)
+    await db.commit()
+    dashboard_stats.apply(
+        transactions_en_cours=-int(ancien_statut == "reserve"), offres_disponibles=len(remises)
+    )
     if ancien_statut == "reserve":
-        transaction.offre.is_disponible = True
-    
-    db.commit()
-    db.refresh(transaction)
+        await invalidate_offre(transaction.offre_id)
+        await offre_events.publish(OFFRE_LIBEREE if remises else OFFRE_MODIFIEE, [transaction.offre_id])
+    await db.refresh(transaction)
     return transaction
 
+# === EXPORTS ===
+# Tables complètes en flux NDJSON ou CSV (mêmes filtres que les listes), sans pagination
+
+@router.get("/export/utilisateurs")
+async def export_users(
+    format: ExportFormat = Query("ndjson"),
+    role: Optional[str] = Query(None),
+    is_active: Optional[bool] = Query(None),
+    admin: CurrentUser = Depends(get_admin_user)
+):
+    filters = []
+    if role:
+        filters.append(models.Utilisateur.role == role)
+    if is_active is not None:
+        filters.append(models.Utilisateur.is_active == is_active)
+    query = USER_ROWS.select().where(*filters).order_by(models.Utilisateur.id)
+    return export_response(USER_ROWS, query, format, "utilisateurs")
+
+@router.get("/export/offres")
+async def export_offres(
+    format: ExportFormat = Query("ndjson"),
+    is_disponible: Optional[bool] = Query(None),
+    type_offre: Optional[str] = Query(None),
+    admin: CurrentUser = Depends(get_admin_user)
+):
+    filters = []
+    if is_disponible is not None:
+        filters.append(models.Offre.is_disponible == is_disponible)
+    if type_offre:
+        filters.append(models.Offre.type_offre == type_offre)
+    query = OFFRE_WITH_CREATOR_ROWS.select().where(*filters).order_by(models.Offre.id)
+    return export_response(OFFRE_WITH_CREATOR_ROWS, query, format, "offres")
+
+@router.get("/export/transactions")
+async def export_transactions(
+    format: ExportFormat = Query("ndjson"),
+    statut: Optional[str] = Query(None),
+    admin: CurrentUser = Depends(get_admin_user)
+):
+    filters = [models.Transaction.statut == statut] if statut else []
+    query = TRANSACTION_DETAILS_ROWS.select().where(*filters).order_by(models.Transaction.id)
+    return export_response(TRANSACTION_DETAILS_ROWS, query, format, "transactions")
+
 # === TABLEAU DE BORD ===
 
 # Statistiques générales
 @router.get("/dashboard", response_model=DashboardStats)
-def get_dashboard_stats(
-    db: Session = Depends(get_db),
-    admin: models.Utilisateur = Depends(get_admin_user)
+async def get_dashboard_stats(
+    db: AsyncSession = Depends(get_user_read_db),
+    admin: CurrentUser = Depends(get_admin_user)
 ):
-    total_utilisateurs = db.query(models.Utilisateur).count()
-    utilisateurs_actifs = db.query(models.Utilisateur).filter(models.Utilisateur.is_active == True).count()
-    
-    total_offres = db.query(models.Offre).count()
-    offres_disponibles = db.query(models.Offre).filter(models.Offre.is_disponible == True).count()
-    
-    total_transactions = db.query(models.Transaction).count()
-    transactions_en_cours = db.query(models.Transaction).filter(
-        models.Transaction.statut.in_(["reserve"])
-    ).count()
-    
-    return DashboardStats(
-        total_utilisateurs=total_utilisateurs,
-        utilisateurs_actifs=utilisateurs_actifs,
-        total_offres=total_offres,
-        offres_disponibles=offres_disponibles,
-        total_transactions=total_transactions,
-        transactions_en_cours=transactions_en_cours
-    )
\ No newline at end of file
+    # Compteurs en mémoire, recalculés en une requête au-delà de DASHBOARD_STATS_MAX_AGE
+    return DashboardStats(**await dashboard_stats.get(db))
\ No newline at end of file
@@ -1,57 +1,111 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi.security import OAuth2PasswordBearer
+from dataclasses import dataclass
 from typing import Optional
 
-from app.database import get_db
+from app.core.config import settings
+from app.database import get_db, read_session
 from app import models
 from app.schemas import UserCreate, UserOut, UserLogin, Token
-from app.security import hash_password, verify_password, create_access_token, decode_token
+from app.security import hash_password_async, verify_and_update_password, create_access_token, decode_token
+from app.utils.cache import TTLCache
+from app.utils.replica import user_writes
+from app.utils.stats import dashboard_stats
 
 router = APIRouter()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")  # pour la doc Swagger
 
+# Utilisateur authentifié, détaché de la session SQLAlchemy
+@dataclass(frozen=True)
+class CurrentUser:
+    id: int
+    role: str
+    nom: Optional[str] = None
+    email: Optional[str] = None  # absent quand le rôle vient du token
+    is_active: bool = True
+
+    @classmethod
+    def from_model(cls, user: models.Utilisateur) -> "CurrentUser":
+        return cls(id=user.id, role=models.RoleEnum(user.role).value, nom=user.nom, email=user.email, is_active=user.is_active)
+
+# Cache des utilisateurs actifs par id, à invalider quand le compte change (admin)
+user_cache = TTLCache(maxsize=settings.AUTH_USER_CACHE_SIZE, ttl=settings.AUTH_USER_CACHE_TTL)
+
 # REGISTER
 @router.post("/register", response_model=UserOut, status_code=status.HTTP_201_CREATED)
-def register(payload: UserCreate, db: Session = Depends(get_db)):
+async def register(payload: UserCreate, db: AsyncSession = Depends(get_db)):
     # email unique
-    existing = db.query(models.Utilisateur).filter(models.Utilisateur.email == payload.email).first()
+    existing = await db.scalar(select(models.Utilisateur).where(models.Utilisateur.email == payload.email))
     if existing:
         raise HTTPException(status_code=400, detail="Cet email est déjà utilisé.")
+    # bcrypt est coûteux en CPU : on le sort de la boucle d'événements
+    password_hash = await hash_password_async(payload.mot_de_passe)
     # rôle valide (Enum géré au modèle)
     user = models.Utilisateur(
         nom=payload.nom,
         email=payload.email,
-        password_hash=hash_password(payload.mot_de_passe),
+        password_hash=password_hash,
         role=payload.role
     )
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    dashboard_stats.apply(total_utilisateurs=1, utilisateurs_actifs=1)
+    await db.refresh(user)
     return user
 
 # LOGIN (JSON)
 @router.post("/login", response_model=Token)
-def login(payload: UserLogin, db: Session = Depends(get_db)):
-    user: Optional[models.Utilisateur] = db.query(models.Utilisateur).filter(models.Utilisateur.email == payload.email).first()
-    if not user or not verify_password(payload.mot_de_passe, user.password_hash):
+async def login(payload: UserLogin, db: AsyncSession = Depends(get_db)):
+    user: Optional[models.Utilisateur] = await db.scalar(select(models.Utilisateur).where(models.Utilisateur.email == payload.email))
+    if not user:
+        raise HTTPException(status_code=401, detail="Identifiants invalides.")
+    valid, new_hash = await verify_and_update_password(payload.mot_de_passe, user.password_hash)
+    if not valid:
         raise HTTPException(status_code=401, detail="Identifiants invalides.")
     if not user.is_active:
         raise HTTPException(status_code=403, detail="Compte désactivé.")
+    # Coût bcrypt modifié depuis le dernier login : on remplace le hachage
+    if new_hash:
+        user.password_hash = new_hash
+        await db.commit()
     access_token = create_access_token({"sub": str(user.id), "role": user.role.value})
     return {"access_token": access_token, "token_type": "bearer"}
 
 # Dépendance pour récupérer l'utilisateur courant depuis le token
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> models.Utilisateur:
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)) -> CurrentUser:
     payload = decode_token(token)
     if payload is None or "sub" not in payload:
         raise HTTPException(status_code=401, detail="Token invalide ou expiré.")
     user_id = int(payload["sub"])
-    user = db.query(models.Utilisateur).get(user_id)
-    if not user or not user.is_active:
-        raise HTTPException(status_code=401, detail="Utilisateur non trouvé ou inactif.")
-    return user
+    # Un commit sur cette session fera relire ses données à l'utilisateur sur le primaire
+    db.info["user_id"] = user_id
+
+    # Mode sans état : le rôle signé par /login fait foi jusqu'à l'expiration du token
+    if settings.AUTH_TRUST_TOKEN_ROLE and "role" in payload:
+        return CurrentUser(id=user_id, role=payload["role"])
+
+    current_user = user_cache.get(user_id)
+    if current_user is None:
+        user = await db.get(models.Utilisateur, user_id)
+        if not user or not user.is_active:
+            raise HTTPException(status_code=401, detail="Utilisateur non trouvé ou inactif.")
+        current_user = CurrentUser.from_model(user)
+        user_cache.set(user_id, current_user)
+    return current_user
+
+# Session de lecture d'un utilisateur authentifié : sur le primaire s'il vient d'écrire
+async def get_user_read_db(current_user: CurrentUser = Depends(get_current_user)):
+    async with read_session(user_writes(current_user.id)) as db:
+        yield db
 
 @router.get("/me", response_model=UserOut)
-def me(current_user: models.Utilisateur = Depends(get_current_user)):
+async def me(current_user: CurrentUser = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    if current_user.email is None:
+        # Rôle lu dans le token : l'utilisateur a pu être supprimé ou désactivé depuis sa connexion
+        user = await db.get(models.Utilisateur, current_user.id)
+        if not user or not user.is_active:
+            raise HTTPException(status_code=401, detail="Utilisateur non trouvé ou inactif.")
+        return user
     return current_user
\ No newline at end of file
@@ -1,16 +1,37 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from datetime import datetime, timezone
 
-from app.database import get_db
+import anyio
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import and_, insert, or_, select, update
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+
+from app.core.config import settings
+from app.database import get_db, get_read_db, read_session
 from app import models
-from app.schemas import OffreCreate, OffreOut, OffreUpdate
-from app.routes.auth import get_current_user
+from app.schemas import BulkOffresResult, OffreCreate, OffreOut, OffreUpdate
+from app.routes.auth import CurrentUser, get_current_user
+from app.utils.bulk import validate_items
+from app.utils.events import OFFRE_CREEE, OFFRE_MODIFIEE, OFFRE_SUPPRIMEE, offre_events, sse_stream
+from app.utils.fast_json import RowSerializer
+from app.utils.pagination import paginate_keyset, cached_count, pagination_headers
+from app.utils.response_cache import (
+    OFFRES_LIST, build_response, cache_key, invalidate_offre, offre_tag, response_cache, response_from_body,
+    send_cached,
+)
+from app.utils.search import geohash_of, index_offre, search_nearby, search_text, set_location, terms_of
+from app.utils.stats import dashboard_stats
+from app.utils.stock import STOCK_EPUISE, changer_disponibilite, relistable
 
 router = APIRouter()
 
+# Chemin rapide (FAST_SERIALIZATION) : OffreOut construit depuis les colonnes SQL
+OFFRE_ROWS = RowSerializer(OffreOut, models.Offre)
+
 # Dépendance pour vérifier que l'utilisateur peut créer des offres
-def get_donateur_or_partenaire(current_user: models.Utilisateur = Depends(get_current_user)):
+async def get_donateur_or_partenaire(current_user: CurrentUser = Depends(get_current_user)):
     if current_user.role not in ["donateur", "partenaire"]:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -20,66 +41,248 @@ def get_donateur_or_partenaire(current_user: models.Utilisateur = Depends(get_cu
 
 # Créer une offre (donateur/partenaire uniquement)
 @router.post("/", response_model=OffreOut, status_code=status.HTTP_201_CREATED)
-def create_offre(offre: OffreCreate, db: Session = Depends(get_db), current_user: models.Utilisateur = Depends(get_donateur_or_partenaire)):
+async def create_offre(offre: OffreCreate, db: AsyncSession = Depends(get_db), current_user: CurrentUser = Depends(get_donateur_or_partenaire)):
     db_offre = models.Offre(
-        **offre.dict(),
+        **offre.model_dump(),
         createur_id=current_user.id
     )
+    set_location(db_offre)
     db.add(db_offre)
-    db.commit()
-    db.refresh(db_offre)
+    await db.flush()
+    await index_offre(db, db_offre.id, db_offre.titre, db_offre.description)
+    await db.commit()
+    dashboard_stats.apply(total_offres=1, offres_disponibles=1)
+    await response_cache.invalidate(OFFRES_LIST)
+    await offre_events.publish(OFFRE_CREEE, [db_offre.id])
+    await db.refresh(db_offre)
     return db_offre
 
+# Créer des offres par lots (partenaires) : tableau JSON ou flux NDJSON (Content-Type: application/x-ndjson)
+# Les éléments invalides sont rapportés un par un, les autres créés dans une seule transaction
+@router.post("/bulk", response_model=BulkOffresResult, status_code=status.HTTP_201_CREATED)
+async def create_offres_bulk(request: Request, db: AsyncSession = Depends(get_db), current_user: CurrentUser = Depends(get_donateur_or_partenaire)):
+    valid, erreurs = await validate_items(
+        request, OffreCreate, settings.OFFRES_BULK_MAX_ITEMS, settings.OFFRES_BULK_MAX_BYTES
+    )
+    ids = []
+    if valid:
+        rows = [
+            {**offre.model_dump(), "createur_id": current_user.id, "is_disponible": True,
+             "geohash": geohash_of(offre.latitude, offre.longitude)}
+            for _, offre in valid
+        ]
+        # INSERT multi-lignes (insertmanyvalues) : quelques allers-retours pour tout le lot. Les termes
+        # sont calculés depuis les lignes renvoyées, sans dépendre de l'ordre de RETURNING
+        # (l'exiger ferait retomber SQLite sur un INSERT par ligne)
+        created = (await db.execute(
+            insert(models.Offre).returning(models.Offre.id, models.Offre.titre, models.Offre.description), rows
+        )).all()
+        ids = sorted(row.id for row in created)
+        termes = [
+            {"terme": terme, "offre_id": row.id}
+            for row in created for terme in terms_of(row.titre, row.description)
+        ]
+        if termes:
+            await db.execute(insert(models.OffreTerme), termes)
+        await db.commit()
+        dashboard_stats.apply(total_offres=len(ids), offres_disponibles=len(ids))
+        await response_cache.invalidate(OFFRES_LIST)
+        await offre_events.publish(OFFRE_CREEE, ids)
+    return {"crees": len(ids), "ids": ids, "erreurs": erreurs}
+
 # Lister toutes les offres disponibles
+# Pagination par `skip` (historique) ou par `cursor` (en-tête X-Next-Cursor de la page précédente)
+# Réponses publiques mises en cache (ETag / If-None-Match) et invalidées à chaque écriture
 @router.get("/", response_model=List[OffreOut])
-def list_offres(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    offres = db.query(models.Offre).filter(models.Offre.is_disponible == True).offset(skip).limit(limit).all()
-    return offres
+async def list_offres(
+    request: Request,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    include_total: bool = False,
+):
+    key = cache_key(request)
+    # Versions lues avant la requête SQL : une écriture concurrente périme l'entrée stockée
+    versions = await response_cache.versions([OFFRES_LIST])
+    cached = await response_cache.lookup(key, versions)
+    if cached is None:
+        # Session ouverte seulement sur un défaut de cache : un succès ne prend aucune connexion
+        async with read_session() as db:
+            query = select(models.Offre).where(models.Offre.is_disponible == True)
+            total = await cached_count(db, query, "offres:disponibles") if include_total else None
+            if settings.FAST_SERIALIZATION:
+                rows, next_cursor = await paginate_keyset(
+                    db, OFFRE_ROWS.select().where(models.Offre.is_disponible == True), models.Offre, limit,
+                    cursor=cursor, skip=skip, as_rows=True,
+                )
+                cached = response_from_body(OFFRE_ROWS.dumps(rows), pagination_headers(next_cursor, total))
+            else:
+                offres, next_cursor = await paginate_keyset(db, query, models.Offre, limit, cursor=cursor, skip=skip)
+                cached = build_response([OffreOut.model_validate(o) for o in offres], pagination_headers(next_cursor, total))
+        await response_cache.store(key, versions, cached)
+    return send_cached(request, cached)
+
+# Rechercher des offres disponibles par texte (titre/description) et/ou proximité
+# Déclarée avant /{offre_id} pour ne pas être capturée par celle-ci
+@router.get("/recherche", response_model=List[OffreOut])
+async def rechercher_offres(
+    q: Optional[str] = None,
+    lat: Optional[float] = Query(None, ge=-90, le=90),
+    lon: Optional[float] = Query(None, ge=-180, le=180),
+    rayon_km: float = Query(5.0, gt=0, le=100),
+    limit: int = Query(50, ge=1, le=200),
+    db: AsyncSession = Depends(get_read_db)
+):
+    terms = terms_of(q)
+    if (lat is None) != (lon is None):
+        raise HTTPException(status_code=400, detail="Indiquez à la fois lat et lon.")
+    if lat is None and not terms:
+        raise HTTPException(status_code=400, detail="Indiquez un texte (q) ou une position (lat, lon).")
+
+    if lat is None:
+        return await search_text(db, terms, limit)
+    return await search_nearby(db, lat, lon, rayon_km, terms, limit)
+
+# Flux temps réel des offres : {"type": "offre_reservee", "offre_ids": [12]} à chaque changement.
+# Le client se resynchronise par GET /offres/ à la (re)connexion, puis applique les événements.
+# Un abonné qui ne lit pas assez vite est déconnecté (code 1013 / événement « dropped »).
+@router.get("/flux")
+async def offres_flux():
+    subscriber = offre_events.subscribe()
+    if subscriber is None:
+        raise HTTPException(status_code=503, detail="Trop d'abonnés au flux, réessayez plus tard.")
+    return StreamingResponse(
+        sse_stream(subscriber, settings.EVENTS_KEEPALIVE), media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.websocket("/ws")
+async def offres_ws(websocket: WebSocket):
+    subscriber = offre_events.subscribe()
+    if subscriber is None:
+        await websocket.close(code=1013)
+        return
+    await websocket.accept()
+
+    async def push(scope: anyio.CancelScope):
+        while (payload := await subscriber.get()) is not None:
+            await websocket.send_text(payload.decode())
+        await websocket.close(code=1013 if subscriber.dropped else 1001)
+        scope.cancel()
+
+    try:
+        async with anyio.create_task_group() as tasks:
+            tasks.start_soon(push, tasks.cancel_scope)
+            # Lire est la seule façon d'apprendre la déconnexion d'un client qui ne reçoit rien
+            try:
+                while True:
+                    await websocket.receive_text()
+            except WebSocketDisconnect:
+                tasks.cancel_scope.cancel()
+    finally:
+        offre_events.unsubscribe(subscriber)
 
 # Voir les détails d'une offre
 @router.get("/{offre_id}", response_model=OffreOut)
-def get_offre(offre_id: int, db: Session = Depends(get_db)):
-    offre = db.query(models.Offre).filter(models.Offre.id == offre_id).first()
-    if not offre:
-        raise HTTPException(status_code=404, detail="Offre non trouvée.")
-    return offre
+async def get_offre(offre_id: int, request: Request):
+    key = cache_key(request)
+    versions = await response_cache.versions([offre_tag(offre_id)])
+    cached = await response_cache.lookup(key, versions)
+    if cached is None:
+        async with read_session() as db:
+            offre = await db.get(models.Offre, offre_id)
+            if not offre:
+                raise HTTPException(status_code=404, detail="Offre non trouvée.")
+            cached = build_response(OffreOut.model_validate(offre))
+        await response_cache.store(key, versions, cached)
+    return send_cached(request, cached)
+
+async def changer_quantite(db: AsyncSession, offre: models.Offre, quantite: int):
+    """Change la quantité totale d'une offre ; le stock restant suit l'écart.
+
+    UPDATE conditionnel, comme une réservation : les portions déjà réservées
+    ne peuvent pas disparaître, même si une réservation arrive en même temps.
+    """
+    ecart = quantite - models.Offre.quantite
+    restante = models.Offre.quantite_restante + ecart
+    result = (await db.execute(
+        update(models.Offre)
+        .where(models.Offre.id == offre.id, restante >= 0)
+        .values(
+            quantite=quantite,
+            quantite_restante=restante,
+            # Épuisée, elle sort des listes ; réapprovisionnée, elle y revient (sauf si bloquée ou expirée)
+            is_disponible=and_(
+                restante > 0,
+                or_(models.Offre.is_disponible, relistable(datetime.now(timezone.utc))),
+            ),
+        )
+        .returning(models.Offre.quantite, models.Offre.quantite_restante, models.Offre.is_disponible)
+        .execution_options(synchronize_session=False)
+    )).first()
+    if result is None:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="La quantité ne peut pas être inférieure aux portions déjà réservées.")
+    set_committed_value(offre, "quantite", result.quantite)
+    set_committed_value(offre, "quantite_restante", result.quantite_restante)
+    set_committed_value(offre, "is_disponible", result.is_disponible)
 
 # Modifier une offre (créateur ou admin seulement)
 @router.put("/{offre_id}", response_model=OffreOut)
-def update_offre(offre_id: int, offre_update: OffreUpdate, db: Session = Depends(get_db), current_user: models.Utilisateur = Depends(get_current_user)):
-    offre = db.query(models.Offre).filter(models.Offre.id == offre_id).first()
+async def update_offre(offre_id: int, offre_update: OffreUpdate, db: AsyncSession = Depends(get_db), current_user: CurrentUser = Depends(get_current_user)):
+    offre = await db.get(models.Offre, offre_id)
     if not offre:
         raise HTTPException(status_code=404, detail="Offre non trouvée.")
-    
+
     # Vérifier les permissions
     if offre.createur_id != current_user.id and current_user.role != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Vous ne pouvez modifier que vos propres offres."
         )
-    
+
     # Mettre à jour les champs modifiés
-    for field, value in offre_update.dict(exclude_unset=True).items():
+    was_disponible = offre.is_disponible
+    changes = offre_update.model_dump(exclude_unset=True)
+    if "quantite" in changes:
+        await changer_quantite(db, offre, changes.pop("quantite"))
+    if "is_disponible" in changes and not await changer_disponibilite(db, offre, changes.pop("is_disponible")):
+        await db.rollback()
+        raise HTTPException(status_code=400, detail=STOCK_EPUISE)
+    for field, value in changes.items():
         setattr(offre, field, value)
-    
-    db.commit()
-    db.refresh(offre)
+    # Index de recherche maintenus dans la même transaction
+    if changes.keys() & {"latitude", "longitude"}:
+        set_location(offre)
+    if changes.keys() & {"titre", "description"}:
+        await index_offre(db, offre.id, offre.titre, offre.description)
+
+    await db.commit()
+    dashboard_stats.apply(offres_disponibles=int(bool(offre.is_disponible)) - int(bool(was_disponible)))
+    # La liste ne montre que les offres disponibles : inutile de la périmer sinon
+    await invalidate_offre(offre_id, listed=bool(was_disponible or offre.is_disponible))
+    await offre_events.publish(OFFRE_MODIFIEE, [offre_id])
+    await db.refresh(offre)
     return offre
 
 # Supprimer une offre (créateur ou admin seulement)
 @router.delete("/{offre_id}")
-def delete_offre(offre_id: int, db: Session = Depends(get_db), current_user: models.Utilisateur = Depends(get_current_user)):
-    offre = db.query(models.Offre).filter(models.Offre.id == offre_id).first()
+async def delete_offre(offre_id: int, db: AsyncSession = Depends(get_db), current_user: CurrentUser = Depends(get_current_user)):
+    offre = await db.get(models.Offre, offre_id)
     if not offre:
         raise HTTPException(status_code=404, detail="Offre non trouvée.")
-    
+
     # Vérifier les permissions
     if offre.createur_id != current_user.id and current_user.role != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Vous ne pouvez supprimer que vos propres offres."
         )
-    
-    db.delete(offre)
-    db.commit()
+
+    was_disponible = offre.is_disponible
+    await db.delete(offre)
+    await db.commit()
+    dashboard_stats.apply(total_offres=-1, offres_disponibles=-int(was_disponible))
+    await invalidate_offre(offre_id, listed=bool(was_disponible))
+    await offre_events.publish(OFFRE_SUPPRIMEE, [offre_id])
     return {"message": "Offre supprimée avec succès."}
\ No newline at end of file
@@ -1,19 +1,41 @@
+from datetime import datetime, timezone
+
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import exists, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
 from typing import List
 
+from app.core.config import settings
 from app.database import get_db
 from app import models
-from app.schemas import TransactionReserver, TransactionOut, TransactionWithDetails
-from app.routes.auth import get_current_user
+from app.schemas import OffreOut, TransactionReserver, TransactionOut, TransactionWithDetails, UserOut
+from app.routes.auth import CurrentUser, get_current_user, get_user_read_db
+from app.utils.events import OFFRE_LIBEREE, OFFRE_MODIFIEE, OFFRE_RESERVEE, offre_events
+from app.utils.fast_json import RowSerializer, json_response
+from app.utils.notifications import ANNULATION, RESERVATION, notify_donateurs
+from app.utils.response_cache import invalidate_offre
+from app.utils.stats import dashboard_stats
+from app.utils.stock import annuler_et_restituer, not_expired
 
 router = APIRouter()
 
-# Réserver une offre
-@router.post("/reserver", response_model=TransactionOut, status_code=status.HTTP_201_CREATED)
-def reserver_offre(reservation: TransactionReserver, db: Session = Depends(get_db), current_user: models.Utilisateur = Depends(get_current_user)):
+# Offre et bénéficiaire chargés dans la même requête (jointure) pour TransactionWithDetails
+TRANSACTION_DETAILS = (
+    joinedload(models.Transaction.offre, innerjoin=True),
+    joinedload(models.Transaction.beneficiaire, innerjoin=True),
+)
+# Même forme lue en colonnes SQL (FAST_SERIALIZATION)
+TRANSACTION_DETAILS_ROWS = RowSerializer(
+    TransactionWithDetails, models.Transaction,
+    nested={"offre": (OffreOut, models.Transaction.offre), "beneficiaire": (UserOut, models.Transaction.beneficiaire)},
+)
+
+async def expliquer_refus_reservation(db: AsyncSession, offre_id: int, user_id: int, quantite: int):
+    """Retrouve pourquoi la réservation atomique n'a rien modifié et lève l'erreur correspondante"""
     # Vérifier que l'offre existe
-    offre = db.query(models.Offre).filter(models.Offre.id == reservation.id_offre).first()
+    offre = await db.get(models.Offre, offre_id)
     if not offre:
         raise HTTPException(status_code=404, detail="Offre non trouvée.")
     
@@ -22,14 +44,14 @@ def reserver_offre(reservation: TransactionReserver, db: Session = Depends(get_d
         raise HTTPException(status_code=400, detail="Cette offre n'est plus disponible.")
     
     # Vérifier qu'on ne réserve pas sa propre offre
-    if offre.createur_id == current_user.id:
+    if offre.createur_id == user_id:
         raise HTTPException(status_code=400, detail="Vous ne pouvez pas réserver votre propre offre.")
     
     # ✅ CONTRAINTE 1: Un bénéficiaire ne peut pas réserver deux fois la même offre
-    existing_transaction = db.query(models.Transaction).filter(
-        models.Transaction.offre_id == reservation.id_offre,
-        models.Transaction.beneficiaire_id == current_user.id
-    ).first()
+    existing_transaction = (await db.scalars(select(models.Transaction).where(
+        models.Transaction.offre_id == offre_id,
+        models.Transaction.beneficiaire_id == user_id
+    ).limit(1))).first()
     
     if existing_transaction:
         if existing_transaction.statut == "reserve":
@@ -38,35 +60,71 @@ def reserver_offre(reservation: TransactionReserver, db: Session = Depends(get_d
             raise HTTPException(status_code=400, detail="Vous avez déjà récupéré cette offre.")
         elif existing_transaction.statut == "annule":
             raise HTTPException(status_code=400, detail="Vous avez déjà une transaction annulée pour cette offre.")
-    
-    # ✅ CONTRAINTE 2: Vérifier qu'aucune autre transaction active n'existe pour cette offre
-    any_active_transaction = db.query(models.Transaction).filter(
-        models.Transaction.offre_id == reservation.id_offre,
-        models.Transaction.statut.in_(["reserve", "recupere"])
-    ).first()
-    
-    if any_active_transaction:
-        raise HTTPException(status_code=400, detail="Cette offre a déjà été réservée par un autre utilisateur.")
-    
-    # Créer la transaction
-    transaction = models.Transaction(
-        offre_id=reservation.id_offre,
-        beneficiaire_id=current_user.id,
-        statut="reserve"
+
+    # Demande supérieure aux portions restantes
+    if offre.quantite_restante < quantite:
+        raise HTTPException(status_code=400, detail=f"Stock insuffisant : il reste {offre.quantite_restante} portion(s).")
+
+    # L'offre a été prise entre-temps par une réservation concurrente
+    raise HTTPException(status_code=400, detail="Cette offre n'est plus disponible.")
+
+# Réserver une offre (tout ou partie de ses portions)
+@router.post("/reserver", response_model=TransactionOut, status_code=status.HTTP_201_CREATED)
+async def reserver_offre(reservation: TransactionReserver, db: AsyncSession = Depends(get_db), current_user: CurrentUser = Depends(get_current_user)):
+    quantite = reservation.quantite
+    # Décrément atomique du stock, sans lecture préalable : l'UPDATE ne touche la ligne que s'il
+    # reste assez de portions. Les réservations concurrentes attendent le verrou de ligne puis
+    # réévaluent la condition sur le stock à jour : jamais de survente
+    prise = await db.execute(
+        update(models.Offre)
+        .where(
+            models.Offre.id == reservation.id_offre,
+            models.Offre.is_disponible == True,
+            models.Offre.quantite_restante >= quantite,
+            # Expirée mais pas encore balayée : déjà plus réservable
+            not_expired(datetime.now(timezone.utc)),
+            models.Offre.createur_id != current_user.id,
+            ~exists().where(
+                models.Transaction.offre_id == reservation.id_offre,
+                models.Transaction.beneficiaire_id == current_user.id
+            )
+        )
+        .values(
+            quantite_restante=models.Offre.quantite_restante - quantite,
+            # Disponibilité déduite du stock (valeur d'avant l'UPDATE) : la dernière portion retire l'offre
+            is_disponible=models.Offre.quantite_restante > quantite,
+        )
+        .returning(models.Offre.is_disponible)
+        .execution_options(synchronize_session=False)
     )
-    
-    # Marquer l'offre comme non disponible
-    offre.is_disponible = False
-    
-    db.add(transaction)
-    db.commit()
-    db.refresh(transaction)
+    offre = prise.first()
+    if offre is None:
+        await db.rollback()
+        await expliquer_refus_reservation(db, reservation.id_offre, current_user.id, quantite)
+    epuisee = not offre.is_disponible
+    
+    # L'index unique uq_transactions_offre_beneficiaire écarte une double réservation concurrente
+    # du même bénéficiaire ; le rollback rend alors les portions décrémentées
+    try:
+        transaction = await db.scalar(
+            insert(models.Transaction)
+            .values(offre_id=reservation.id_offre, beneficiaire_id=current_user.id, statut="reserve", quantite=quantite)
+            .returning(models.Transaction)
+        )
+        await notify_donateurs(db, [transaction.id], RESERVATION)
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Vous avez déjà réservé cette offre.")
+    dashboard_stats.apply(total_transactions=1, transactions_en_cours=1, offres_disponibles=-int(epuisee))
+    await invalidate_offre(reservation.id_offre)
+    await offre_events.publish(OFFRE_RESERVEE if epuisee else OFFRE_MODIFIEE, [reservation.id_offre])
     return transaction
 
 # Marquer une transaction comme récupérée
 @router.put("/{transaction_id}/recuperer", response_model=TransactionOut)
-def recuperer_offre(transaction_id: int, db: Session = Depends(get_db), current_user: models.Utilisateur = Depends(get_current_user)):
-    transaction = db.query(models.Transaction).filter(models.Transaction.id == transaction_id).first()
+async def recuperer_offre(transaction_id: int, db: AsyncSession = Depends(get_db), current_user: CurrentUser = Depends(get_current_user)):
+    transaction = await db.get(models.Transaction, transaction_id)
     if not transaction:
         raise HTTPException(status_code=404, detail="Transaction non trouvée.")
     
@@ -80,15 +138,27 @@ def recuperer_offre(transaction_id: int, db: Session = Depends(get_db), current_
         elif transaction.statut == "annule":
             raise HTTPException(status_code=400, detail="Cette transaction a été annulée.")
     
-    transaction.statut = "recupere"
-    db.commit()
-    db.refresh(transaction)
+    # Le statut ne change que s'il vaut encore « reserve » : une annulation concurrente
+    # (bénéficiaire, admin ou balayage) a pu rendre les portions depuis la lecture
+    recuperee = (await db.execute(
+        update(models.Transaction)
+        .where(models.Transaction.id == transaction_id, models.Transaction.statut == "reserve")
+        .values(statut="recupere")
+        .returning(models.Transaction.id)
+        .execution_options(synchronize_session=False)
+    )).first()
+    if recuperee is None:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Cette transaction a été modifiée entre-temps.")
+    await db.commit()
+    dashboard_stats.apply(transactions_en_cours=-1)
+    await db.refresh(transaction)
     return transaction
 
 # Annuler une transaction
 @router.put("/{transaction_id}/annuler", response_model=TransactionOut)
-def annuler_transaction(transaction_id: int, db: Session = Depends(get_db), current_user: models.Utilisateur = Depends(get_current_user)):
-    transaction = db.query(models.Transaction).filter(models.Transaction.id == transaction_id).first()
+async def annuler_transaction(transaction_id: int, db: AsyncSession = Depends(get_db), current_user: CurrentUser = Depends(get_current_user)):
+    transaction = await db.get(models.Transaction, transaction_id)
     if not transaction:
         raise HTTPException(status_code=404, detail="Transaction non trouvée.")
     
@@ -101,36 +171,49 @@ def annuler_transaction(transaction_id: int, db: Session = Depends(get_db), curr
     elif transaction.statut == "annule":
         raise HTTPException(status_code=400, detail="Cette transaction est déjà annulée.")
     
-    # Sauvegarder l'ancien statut pour la logique de remise en disponibilité
-    ancien_statut = transaction.statut
-    transaction.statut = "annule"
-    
-    # Remettre l'offre disponible si elle était réservée
-    if ancien_statut == "reserve":
-        transaction.offre.is_disponible = True
-    
-    db.commit()
-    db.refresh(transaction)
+    # Rend les portions réservées ; l'offre épuisée repasse disponible
+    remises = await annuler_et_restituer(db, transaction, datetime.now(timezone.utc))
+    if remises is None:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Cette transaction a été modifiée entre-temps.")
+    
+    await notify_donateurs(db, [transaction.id], ANNULATION)
+    await db.commit()
+    dashboard_stats.apply(transactions_en_cours=-1, offres_disponibles=len(remises))
+    await invalidate_offre(transaction.offre_id)
+    await offre_events.publish(OFFRE_LIBEREE if remises else OFFRE_MODIFIEE, [transaction.offre_id])
+    await db.refresh(transaction)
     return transaction
 
+async def list_transactions_of(db: AsyncSession, beneficiaire_id: int):
+    """Transactions d'un bénéficiaire, les plus récentes d'abord"""
+    order = (models.Transaction.created_at.desc(), models.Transaction.id.desc())
+    if settings.FAST_SERIALIZATION:
+        rows = await db.execute(
+            TRANSACTION_DETAILS_ROWS.select()
+            .where(models.Transaction.beneficiaire_id == beneficiaire_id)
+            .order_by(*order)
+        )
+        return json_response(TRANSACTION_DETAILS_ROWS.dumps(rows.all()))
+    
+    transactions = await db.scalars(
+        select(models.Transaction)
+        .options(*TRANSACTION_DETAILS)
+        .where(models.Transaction.beneficiaire_id == beneficiaire_id)
+        .order_by(*order)
+    )
+    return transactions.all()
+
 # Historique des transactions d'un utilisateur
 @router.get("/historique/{user_id}", response_model=List[TransactionWithDetails])
-def get_historique_transactions(user_id: int, db: Session = Depends(get_db), current_user: models.Utilisateur = Depends(get_current_user)):
+async def get_historique_transactions(user_id: int, db: AsyncSession = Depends(get_user_read_db), current_user: CurrentUser = Depends(get_current_user)):
     # Vérifier les permissions (utilisateur lui-même ou admin)
     if user_id != current_user.id and current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Vous ne pouvez voir que votre propre historique.")
     
-    transactions = db.query(models.Transaction).filter(
-        models.Transaction.beneficiaire_id == user_id
-    ).order_by(models.Transaction.created_at.desc()).all()
-    
-    return transactions
+    return await list_transactions_of(db, user_id)
 
 # Mes transactions (raccourci)
 @router.get("/mes-transactions", response_model=List[TransactionWithDetails])
-def get_mes_transactions(db: Session = Depends(get_db), current_user: models.Utilisateur = Depends(get_current_user)):
-    transactions = db.query(models.Transaction).filter(
-        models.Transaction.beneficiaire_id == current_user.id
-    ).order_by(models.Transaction.created_at.desc()).all()
-    
-    return transactions
\ No newline at end of file
+async def get_mes_transactions(db: AsyncSession = Depends(get_user_read_db), current_user: CurrentUser = Depends(get_current_user)):
+    return await list_transactions_of(db, current_user.id)
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, EmailStr, field_validator
-from typing import Optional, Literal
+from pydantic import BaseModel, EmailStr, Field, field_validator
+from typing import Any, List, Optional, Literal
 from datetime import datetime
 
 RoleLiteral = Literal["beneficiaire","donateur","partenaire","admin"]
@@ -47,6 +47,8 @@ class OffreBase(BaseModel):
     quantite: int
     localisation: Optional[str] = None
     date_expiration: Optional[datetime] = None
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
 
 class OffreCreate(OffreBase):
     @field_validator("quantite")
@@ -62,10 +64,13 @@ class OffreUpdate(BaseModel):
     quantite: Optional[int] = None
     localisation: Optional[str] = None
     date_expiration: Optional[datetime] = None
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
     is_disponible: Optional[bool] = None
 
 class OffreOut(OffreBase):
     id: int
+    quantite_restante: int
     is_disponible: bool
     createur_id: int
     created_at: datetime
@@ -76,12 +81,21 @@ class OffreOut(OffreBase):
 # Schémas pour les transactions
 class TransactionReserver(BaseModel):
     id_offre: int
+    quantite: int = 1  # portions de l'offre
+
+    @field_validator("quantite")
+    @classmethod
+    def validate_quantite(cls, v):
+        if v <= 0:
+            raise ValueError("La quantité doit être positive.")
+        return v
 
 class TransactionOut(BaseModel):
     id: int
     offre_id: int
     beneficiaire_id: int
     statut: StatutTransactionLiteral
+    quantite: int
     created_at: datetime
     updated_at: datetime
 
@@ -124,4 +138,25 @@ class OffreWithCreator(OffreOut):
     createur: UserOut
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+# Opérations par lots : erreurs rapportées élément par élément
+class BulkErreur(BaseModel):
+    index: int  # position dans le lot envoyé
+    detail: Any  # message, ou erreurs de validation de l'élément
+
+class BulkOffresResult(BaseModel):
+    crees: int
+    ids: List[int]  # offres créées, par identifiant croissant
+    erreurs: List[BulkErreur]
+
+class BulkIds(BaseModel):
+    ids: List[int] = Field(..., min_length=1, max_length=10000)
+
+class BulkDisponibilite(BulkIds):
+    is_disponible: bool
+
+class BulkResult(BaseModel):
+    modifies: int
+    ids: List[int]
+    erreurs: List[BulkErreur]
@@ -1,16 +1,27 @@
+import asyncio
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
 from jose import jwt, JWTError
 from passlib.context import CryptContext
-from dotenv import load_dotenv
 
-load_dotenv()
+from app.core.config import settings
+from app.utils.metrics import PASSWORD_HASH_SECONDS
 
-SECRET_KEY = os.getenv("SECRET_KEY", "changeme")
-ALGORITHM = os.getenv("ALGORITHM", "HS256")
-ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "60"))
+# Lus par Settings (environnement puis .env), une seule fois
+SECRET_KEY = settings.SECRET_KEY
+ALGORITHM = settings.ALGORITHM
+ACCESS_TOKEN_EXPIRE_MINUTES = settings.ACCESS_TOKEN_EXPIRE_MINUTES
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Les hachages d'un autre coût sont considérés obsolètes (needs_update) et refaits au login
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.BCRYPT_ROUNDS,
+)
 
 def hash_password(password: str) -> str:
     return pwd_context.hash(password)
@@ -18,6 +29,52 @@ def hash_password(password: str) -> str:
 def verify_password(plain_password: str, password_hash: str) -> bool:
     return pwd_context.verify(plain_password, password_hash)
 
+class PasswordHasherBusy(Exception):
+    """Trop de hachages en attente : la requête est refusée (503) plutôt que mise en file"""
+
+class PasswordHasher:
+    """Exécute bcrypt dans un pool de threads dédié et borné.
+
+    bcrypt relâche le GIL : les threads occupent les cœurs sans bloquer la boucle
+    d'événements. `max_pending` borne la file (en cours + en attente).
+    """
+
+    def __init__(self, workers: Optional[int], max_pending: int):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending
+        self.pending = 0
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+
+    async def run(self, fn, *args):
+        if self.pending >= self.max_pending:
+            raise PasswordHasherBusy()
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self.pending -= 1
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+password_hasher = PasswordHasher(settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_MAX_PENDING)
+
+# Mesurés dans le thread bcrypt : le temps d'attente dans la file n'est pas compté
+def _timed_hash(password: str) -> str:
+    with PASSWORD_HASH_SECONDS.labels("hash").time():
+        return hash_password(password)
+
+def _timed_verify_and_update(plain_password: str, password_hash: str) -> Tuple[bool, Optional[str]]:
+    with PASSWORD_HASH_SECONDS.labels("verify").time():
+        return pwd_context.verify_and_update(plain_password, password_hash)
+
+async def hash_password_async(password: str) -> str:
+    return await password_hasher.run(_timed_hash, password)
+
+async def verify_and_update_password(plain_password: str, password_hash: str) -> Tuple[bool, Optional[str]]:
+    """Vérifie le mot de passe ; renvoie aussi le nouveau hachage si le coût configuré a changé"""
+    return await password_hasher.run(_timed_verify_and_update, plain_password, password_hash)
+
 def create_access_token(data: dict, expires_minutes: int = ACCESS_TOKEN_EXPIRE_MINUTES) -> str:
     to_encode = data.copy()
     expire = datetime.now(timezone.utc) + timedelta(minutes=expires_minutes)
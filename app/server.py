@@ -0,0 +1,139 @@
+"""Serveur de production : plusieurs workers uvicorn, arrêt propre sur SIGTERM.
+
+    alembic upgrade head && exec python -m app.server
+
+WEB_WORKERS processus (défaut : CPU disponibles) partagent le port ; uvloop et
+httptools sont utilisés s'ils sont installés. Tant qu'un état reste en mémoire
+(cache de réponses, flux des offres, écritures récentes de la réplique, cache
+des utilisateurs, budgets de débit, compteurs du tableau de bord), il serait
+propre à chaque worker : un seul worker par défaut, et WEB_WORKERS>1 est
+refusé. Chaque worker prépare ses connexions au démarrage (lifespan) et reçoit
+sa part de DB_MAX_CONNECTIONS.
+Sur SIGTERM, un worker n'accepte plus de connexions, termine ses flux
+WebSocket/SSE, attend les requêtes en cours (GRACEFUL_SHUTDOWN_TIMEOUT) puis
+ferme ses pools.
+"""
+import logging
+import math
+import os
+import sys
+import tempfile
+from importlib.util import find_spec
+from typing import List
+
+import uvicorn
+from uvicorn.supervisors import Multiprocess
+
+from app.core.config import settings
+
+logger = logging.getLogger("uvicorn.error")
+
+def available_cpus() -> int:
+    """CPU utilisables par le processus : affinité, puis quota cgroup v2 (docker --cpus)"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:  # Windows, macOS
+        cpus = os.cpu_count() or 1
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cpus = min(cpus, max(1, math.ceil(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+def process_local_state() -> List[str]:
+    """Réglages dont l'état reste dans le processus : plusieurs workers ne le partageraient pas"""
+    local = []
+    if settings.RESPONSE_CACHE_SIZE > 0 and settings.RESPONSE_CACHE_BACKEND == "memory":
+        local.append("RESPONSE_CACHE_BACKEND")  # invalidations et ETag
+    if settings.EVENTS_BACKEND == "memory":
+        local.append("EVENTS_BACKEND")  # événements du flux des offres
+    if settings.DATABASE_REPLICA_URL and settings.REPLICA_STICKY_BACKEND == "memory":
+        local.append("REPLICA_STICKY_BACKEND")  # relecture de ses propres écritures
+    if settings.AUTH_USER_CACHE_SIZE > 0:
+        local.append("AUTH_USER_CACHE_SIZE")  # rôle et désactivation invalidés dans un seul worker
+    if settings.RATE_LIMIT_ENABLED and settings.RATE_LIMIT_BACKEND == "memory":
+        local.append("RATE_LIMIT_BACKEND")  # budgets multipliés par le nombre de workers
+    if settings.DASHBOARD_STATS_MAX_AGE > 0:
+        local.append("DASHBOARD_STATS_MAX_AGE")  # deltas appliqués dans un seul worker
+    return local
+
+def worker_count() -> int:
+    local = process_local_state()
+    if settings.WEB_WORKERS is None:
+        if local:
+            logger.warning(
+                "Un seul worker : %s en mémoire ; configurer des backends partagés pour en lancer plusieurs",
+                ", ".join(local),
+            )
+            return 1
+        return available_cpus()
+    if settings.WEB_WORKERS > 1 and local:
+        raise SystemExit(
+            f"WEB_WORKERS={settings.WEB_WORKERS} refusé : {', '.join(local)} garde un état propre à chaque worker "
+            "(cache, flux, écritures récentes, utilisateurs, débit ou compteurs incohérents d'un worker à l'autre). "
+            "Configurer redis / postgres (ou désactiver ces caches), ou WEB_WORKERS=1."
+        )
+    return settings.WEB_WORKERS
+
+def prepare_metrics_dir():
+    """Répertoire partagé des métriques Prometheus entre workers, vidé au démarrage"""
+    path = os.environ.get("PROMETHEUS_MULTIPROC_DIR") or tempfile.mkdtemp(prefix="prometheus-")
+    os.makedirs(path, exist_ok=True)
+    for name in os.listdir(path):
+        if name.endswith(".db"):
+            os.remove(os.path.join(path, name))
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = path
+
+class DrainingServer(uvicorn.Server):
+    """Serveur uvicorn qui, à l'arrêt, se déclare indisponible et termine les flux.
+
+    Un flux WebSocket/SSE ne finit jamais de lui-même : sans cela, il retiendrait
+    le worker jusqu'à GRACEFUL_SHUTDOWN_TIMEOUT. Les clients se reconnectent
+    (SSE : retry 3 s) à un autre worker ou à la nouvelle instance.
+    """
+
+    async def shutdown(self, sockets=None):
+        # Modules déjà chargés avec l'application, dans ce worker
+        from app.core.startup import startup_report
+        from app.utils.events import offre_events
+
+        startup_report.draining = True
+        offre_events.disconnect_all()
+        await super().shutdown(sockets=sockets)
+
+def main():
+    workers = worker_count()
+    # Lu par chaque worker (répartition de DB_MAX_CONNECTIONS, voir database.pool_capacity)
+    os.environ["WEB_WORKERS"] = str(workers)
+    settings.WEB_WORKERS = workers
+    if workers > 1 and settings.METRICS_ENABLED:
+        prepare_metrics_dir()
+
+    config = uvicorn.Config(
+        "app.main:app",
+        host=settings.WEB_HOST,
+        port=settings.WEB_PORT,
+        workers=workers,
+        loop="auto",  # uvloop si installé
+        http="auto",  # httptools si installé
+        ws=settings.WEB_WS,
+        lifespan="on",  # démarrage en échec (schéma absent) : le worker s'arrête
+        timeout_graceful_shutdown=settings.GRACEFUL_SHUTDOWN_TIMEOUT,
+    )
+    server = DrainingServer(config)
+    logger.info(
+        "%d worker(s), boucle %s, HTTP %s, WebSocket %s", workers,
+        "uvloop" if find_spec("uvloop") else "asyncio", "httptools" if find_spec("httptools") else "h11", settings.WEB_WS,
+    )
+    if workers > 1:
+        Multiprocess(config, target=server.run, sockets=[config.bind_socket()]).run()
+    else:
+        server.run()
+        if not server.started:
+            sys.exit(3)
+
+if __name__ == "__main__":
+    main()
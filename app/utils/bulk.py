@@ -0,0 +1,88 @@
+from typing import AsyncIterator, Tuple, Type
+
+import orjson
+from fastapi import HTTPException, Request
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel, ValidationError
+
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl", "application/x-jsonlines")
+
+def is_ndjson(request: Request) -> bool:
+    return request.headers.get("content-type", "").split(";")[0].strip().lower() in NDJSON_TYPES
+
+def too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(status_code=413, detail=f"Lot trop volumineux : au plus {max_bytes} octets.")
+
+async def limited_stream(request: Request, max_bytes: int) -> AsyncIterator[bytes]:
+    """Morceaux du corps ; 413 dès que le lot dépasse `max_bytes` (annoncé ou reçu)"""
+    length = request.headers.get("content-length", "")
+    if length.isdigit() and int(length) > max_bytes:
+        raise too_large(max_bytes)
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > max_bytes:
+            raise too_large(max_bytes)
+        yield chunk
+
+async def ndjson_lines(request: Request, max_bytes: int) -> AsyncIterator[bytes]:
+    """Lignes non vides du corps, lues au fil du flux (sans charger tout le corps)"""
+    pending = bytearray()
+    async for chunk in limited_stream(request, max_bytes):
+        # Seul le nouveau morceau est parcouru : linéaire même pour une très longue ligne
+        end = chunk.rfind(b"\n")
+        if end < 0:
+            pending += chunk
+            continue
+        pending += chunk[:end]
+        for line in pending.split(b"\n"):
+            if line.strip():
+                yield bytes(line)
+        pending = bytearray(chunk[end + 1:])
+    if pending.strip():
+        yield bytes(pending)
+
+async def raw_items(request: Request, max_bytes: int) -> AsyncIterator[object]:
+    """Éléments d'un tableau JSON ou d'un flux NDJSON ; une ligne illisible donne son exception"""
+    if is_ndjson(request):
+        async for line in ndjson_lines(request, max_bytes):
+            try:
+                yield orjson.loads(line)
+            except orjson.JSONDecodeError as exc:
+                yield exc
+        return
+    body = bytearray()
+    async for chunk in limited_stream(request, max_bytes):
+        body += chunk
+    try:
+        items = orjson.loads(body)
+    except orjson.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="Corps JSON invalide.")
+    if not isinstance(items, list):
+        raise HTTPException(status_code=400, detail="Un tableau JSON (ou un flux NDJSON) est attendu.")
+    for item in items:
+        yield item
+
+async def validate_items(request: Request, schema: Type[BaseModel], max_items: int, max_bytes: int) -> Tuple[list, list]:
+    """Valide chaque élément du lot : renvoie [(index, objet)] et [{index, detail}]"""
+    valid, errors = [], []
+    index = -1
+    async for index, item in aenumerate(raw_items(request, max_bytes)):
+        if index >= max_items:
+            raise HTTPException(status_code=413, detail=f"Au plus {max_items} éléments par lot.")
+        if isinstance(item, Exception):
+            errors.append({"index": index, "detail": f"JSON invalide : {item}"})
+            continue
+        try:
+            valid.append((index, schema.model_validate(item)))
+        except ValidationError as exc:
+            errors.append({"index": index, "detail": jsonable_encoder(exc.errors(include_url=False, include_context=False))})
+    if index < 0:
+        raise HTTPException(status_code=400, detail="Le lot est vide.")
+    return valid, errors
+
+async def aenumerate(iterator):
+    index = 0
+    async for item in iterator:
+        yield index, item
+        index += 1
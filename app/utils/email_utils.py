@@ -1,26 +1,135 @@
+import asyncio
 import smtplib
+import time
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
+from typing import Optional
+
 from app.core.config import settings
 
+def build_message(to_email: str, subject: str, body: str, sender: Optional[str] = None) -> MIMEMultipart:
+    msg = MIMEMultipart()
+    msg['From'] = sender or settings.SMTP_FROM or settings.SMTP_USER
+    msg['To'] = to_email
+    msg['Subject'] = subject
+    msg.attach(MIMEText(body, 'plain'))
+    return msg
+
+def connect_smtp(host: str, port: int, user: Optional[str], password: Optional[str], starttls: bool, timeout: float) -> smtplib.SMTP:
+    server = smtplib.SMTP(host, port, timeout=timeout)
+    if starttls:
+        server.starttls()
+    if user and password:
+        server.login(user, password)
+    return server
+
 def send_email(to_email: str, subject: str, body: str):
-    """Envoie un email (fonctionnalité future)"""
+    """Envoi direct et bloquant (une connexion par message) : les routes passent par la boîte d'envoi"""
     try:
-        msg = MIMEMultipart()
-        msg['From'] = settings.SMTP_USER
-        msg['To'] = to_email
-        msg['Subject'] = subject
-        
-        msg.attach(MIMEText(body, 'plain'))
-        
-        server = smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT)
-        server.starttls()
-        server.login(settings.SMTP_USER, settings.SMTP_PASSWORD)
-        text = msg.as_string()
-        server.sendmail(settings.SMTP_USER, to_email, text)
+        server = connect_smtp(
+            settings.SMTP_HOST, settings.SMTP_PORT, settings.SMTP_USER, settings.SMTP_PASSWORD,
+            settings.SMTP_STARTTLS, settings.SMTP_TIMEOUT,
+        )
+        server.send_message(build_message(to_email, subject, body))
         server.quit()
-        
+
         return True
     except Exception as e:
         print(f"Error sending email: {e}")
-        return False
\ No newline at end of file
+        return False
+
+def is_permanent(error: Exception) -> bool:
+    """Refus définitif du serveur (5xx) : inutile de réessayer"""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code >= 500
+    return False
+
+class _Connection:
+    __slots__ = ("server", "last_used")
+
+    def __init__(self):
+        self.server: Optional[smtplib.SMTP] = None
+        self.last_used = 0.0
+
+class SMTPPool:
+    """Connexions SMTP ouvertes une fois puis réutilisées d'un message à l'autre.
+
+    Établir une session (TCP, EHLO, STARTTLS, AUTH) coûte plusieurs allers-retours ;
+    ici elle n'est payée qu'à la première utilisation, ou après une déconnexion du
+    serveur. Les envois (smtplib, bloquant) tournent dans des threads, au plus
+    `size` à la fois ; une connexion restée inactive plus de `max_idle` secondes
+    est vérifiée par NOOP avant d'être réutilisée.
+    """
+
+    def __init__(self, host: str, port: int, user: Optional[str] = None, password: Optional[str] = None,
+                 starttls: bool = True, size: int = 2, timeout: float = 30.0, max_idle: float = 60.0):
+        self.options = (host, port, user, password, starttls, timeout)
+        self.max_idle = max_idle
+        self.connections = [_Connection() for _ in range(size)]
+        self._free: Optional[asyncio.Queue] = None
+        self.opened = 0  # sessions SMTP ouvertes depuis la création du pool
+
+    @classmethod
+    def from_settings(cls) -> "SMTPPool":
+        return cls(
+            settings.SMTP_HOST, settings.SMTP_PORT or 25, settings.SMTP_USER, settings.SMTP_PASSWORD,
+            starttls=settings.SMTP_STARTTLS, size=settings.SMTP_POOL_SIZE, timeout=settings.SMTP_TIMEOUT,
+        )
+
+    def _queue(self) -> asyncio.Queue:
+        # Créée à la première utilisation, dans la boucle du worker
+        if self._free is None:
+            self._free = asyncio.Queue()
+            for connection in self.connections:
+                self._free.put_nowait(connection)
+        return self._free
+
+    def _open(self, connection: _Connection):
+        self._close(connection)
+        connection.server = connect_smtp(*self.options)
+        self.opened += 1
+
+    def _close(self, connection: _Connection):
+        if connection.server is not None:
+            try:
+                connection.server.quit()
+            except Exception:
+                connection.server.close()
+            connection.server = None
+
+    def _send(self, connection: _Connection, message):
+        if connection.server is None:
+            self._open(connection)
+        elif time.monotonic() - connection.last_used > self.max_idle:
+            try:
+                connection.server.noop()
+            except (smtplib.SMTPException, OSError):
+                self._open(connection)
+        try:
+            connection.server.send_message(message)
+        except (smtplib.SMTPServerDisconnected, ConnectionError):
+            # Le serveur a fermé la session (délai d'inactivité, redémarrage) : une reprise immédiate
+            self._open(connection)
+            connection.server.send_message(message)
+        except (smtplib.SMTPRecipientsRefused, smtplib.SMTPResponseException):
+            # Message refusé : smtplib a déjà réinitialisé la session (RSET), elle reste utilisable
+            raise
+        except (smtplib.SMTPException, OSError):
+            self._close(connection)
+            raise
+        finally:
+            connection.last_used = time.monotonic()
+
+    async def send(self, message):
+        free = self._queue()
+        connection = await free.get()
+        try:
+            await asyncio.to_thread(self._send, connection, message)
+        finally:
+            free.put_nowait(connection)
+
+    async def close(self):
+        for connection in self.connections:
+            await asyncio.to_thread(self._close, connection)
@@ -0,0 +1,258 @@
+import asyncio
+import logging
+from typing import Callable, List, Optional, Set
+
+import orjson
+from sqlalchemy.engine import make_url
+
+from app.core.config import settings
+from app.utils.metrics import EVENTS_DROPPED, EVENTS_PUBLISHED, EVENTS_SUBSCRIBERS
+
+logger = logging.getLogger(__name__)
+
+# Types d'événements du flux des offres
+OFFRE_CREEE = "offre_creee"
+OFFRE_MODIFIEE = "offre_modifiee"
+OFFRE_RESERVEE = "offre_reservee"
+OFFRE_LIBEREE = "offre_liberee"  # réservation annulée : l'offre est de nouveau disponible
+OFFRE_EXPIREE = "offre_expiree"
+OFFRE_SUPPRIMEE = "offre_supprimee"
+
+# Identifiants par message : reste sous la limite de 8000 octets de NOTIFY
+MAX_IDS_PER_EVENT = 500
+# Notifications en attente d'envoi par worker ; au-delà (PostgreSQL injoignable) elles sont perdues
+MAX_PENDING_NOTIFY = 10000
+# Notifications envoyées en un aller-retour
+NOTIFY_BATCH = 100
+
+class Subscriber:
+    """File bornée d'un abonné ; None signale la fin du flux"""
+
+    __slots__ = ("queue", "dropped")
+
+    def __init__(self, size: int):
+        self.queue: asyncio.Queue = asyncio.Queue(size)
+        self.dropped = False
+
+    async def get(self) -> Optional[bytes]:
+        return await self.queue.get()
+
+    def close(self):
+        # Vide la file (mémoire libérée tout de suite) puis y place la fin de flux
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+class LocalBackend:
+    """Diffusion dans le processus seulement (un worker)"""
+
+    async def start(self, deliver: Callable[[bytes], None]):
+        self.deliver = deliver
+
+    async def publish(self, payload: bytes):
+        self.deliver(payload)
+
+    async def stop(self):
+        pass
+
+class PostgresBackend:
+    """Diffusion entre workers par LISTEN/NOTIFY (asyncpg).
+
+    Chaque worker écoute le canal sur une connexion dédiée et publie par
+    pg_notify sur une autre ; ses propres messages lui reviennent par l'écoute,
+    comme ceux des autres workers. publish() ne fait que mettre le message en
+    file : une tâche de fond les envoie par lots, sans retenir les routes
+    derrière la connexion d'envoi. Connexion d'écoute perdue : reconnexion avec
+    attente croissante (les événements émis entre-temps sont perdus, les clients
+    se resynchronisent par GET /offres/).
+    """
+
+    channel = "offre_events"
+
+    def __init__(self, url: str):
+        self.dsn = make_url(url).set(drivername="postgresql").render_as_string(hide_password=False)
+        self.listener = None
+        self.sender = None
+        self.pending: Optional[asyncio.Queue] = None
+        self._sending: Optional[asyncio.Task] = None
+        self._reconnecting: Optional[asyncio.Task] = None
+        self._stopped = False
+
+    async def start(self, deliver: Callable[[bytes], None]):
+        self.deliver = deliver
+        self._stopped = False
+        await self._listen()
+
+    async def _listen(self):
+        import asyncpg
+        self.listener = await asyncpg.connect(self.dsn)
+        self.listener.add_termination_listener(self._on_termination)
+        await self.listener.add_listener(self.channel, self._on_notify)
+
+    def _on_notify(self, connection, pid, channel, payload: str):
+        self.deliver(payload.encode())
+
+    def _on_termination(self, connection):
+        if not self._stopped and self._reconnecting is None:
+            self._reconnecting = asyncio.get_running_loop().create_task(self._reconnect())
+
+    async def _reconnect(self):
+        delay = 0.5
+        try:
+            while not self._stopped:
+                try:
+                    await self._listen()
+                    return
+                except Exception:
+                    logger.warning("Flux des offres : reconnexion à PostgreSQL dans %.1f s", delay)
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, 30.0)
+        finally:
+            self._reconnecting = None
+
+    async def publish(self, payload: bytes):
+        if self._sending is None:
+            self.pending = asyncio.Queue(MAX_PENDING_NOTIFY)
+            self._sending = asyncio.get_running_loop().create_task(self._send_loop())
+        try:
+            self.pending.put_nowait(payload)
+        except asyncio.QueueFull:
+            logger.warning("Flux des offres : file d'envoi pleine, événement perdu")
+
+    async def _send_loop(self):
+        while True:
+            batch = [await self.pending.get()]
+            while not self.pending.empty() and len(batch) < NOTIFY_BATCH:
+                batch.append(self.pending.get_nowait())
+            try:
+                await self._send(batch)
+            except Exception:
+                logger.exception("Flux des offres : %s événement(s) non publiés", len(batch))
+
+    async def _send(self, batch: List[bytes]):
+        import asyncpg
+        for attempt in range(2):
+            try:
+                if self.sender is None or self.sender.is_closed():
+                    self.sender = await asyncpg.connect(self.dsn)
+                await self.sender.executemany(
+                    "SELECT pg_notify($1, $2)", [(self.channel, payload.decode()) for payload in batch]
+                )
+                return
+            except (OSError, asyncpg.PostgresConnectionError, asyncpg.InterfaceError):
+                self.sender = None
+                if attempt:
+                    raise
+
+    async def stop(self):
+        self._stopped = True
+        if self._reconnecting is not None:
+            self._reconnecting.cancel()
+        if self._sending is not None:
+            self._sending.cancel()
+            # Derniers messages en file : envoyés au mieux avant la fermeture
+            batch = []
+            while not self.pending.empty():
+                batch.append(self.pending.get_nowait())
+            if batch:
+                try:
+                    await self._send(batch)
+                except Exception:
+                    logger.warning("Flux des offres : %s événement(s) perdus à l'arrêt", len(batch))
+            self._sending = self.pending = None
+        for connection in (self.listener, self.sender):
+            if connection is not None and not connection.is_closed():
+                await connection.close()
+        self.listener = self.sender = None
+
+class BroadcastHub:
+    """Diffuse les événements des offres aux abonnés WebSocket/SSE du processus.
+
+    Chaque message est sérialisé une fois et déposé sans attente dans la file
+    bornée de chaque abonné : un abonné dont la file est pleine (client trop lent
+    ou bloqué) est déconnecté plutôt que de retenir la mémoire ou les autres.
+    """
+
+    def __init__(self, backend, queue_size: int, max_subscribers: int):
+        self.backend = backend
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self.subscribers: Set[Subscriber] = set()
+        self.started = False
+
+    async def start(self):
+        await self.backend.start(self.deliver)
+        self.started = True
+
+    async def stop(self):
+        self.started = False
+        self.disconnect_all()
+        await self.backend.stop()
+
+    def disconnect_all(self):
+        """Termine les flux ouverts (WebSocket fermé en 1001, fin du flux SSE)"""
+        for subscriber in list(self.subscribers):
+            self.unsubscribe(subscriber)
+            subscriber.close()
+
+    def subscribe(self) -> Optional[Subscriber]:
+        """Nouvel abonné, ou None si le processus en sert déjà le maximum"""
+        if len(self.subscribers) >= self.max_subscribers:
+            return None
+        subscriber = Subscriber(self.queue_size)
+        self.subscribers.add(subscriber)
+        EVENTS_SUBSCRIBERS.inc()
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        if subscriber in self.subscribers:
+            self.subscribers.remove(subscriber)
+            EVENTS_SUBSCRIBERS.dec()
+
+    def deliver(self, payload: bytes):
+        for subscriber in list(self.subscribers):
+            try:
+                subscriber.queue.put_nowait(payload)
+            except asyncio.QueueFull:
+                subscriber.dropped = True
+                self.unsubscribe(subscriber)
+                subscriber.close()
+                EVENTS_DROPPED.inc()
+
+    async def publish(self, event_type: str, offre_ids: List[int]):
+        """Publie un événement (après commit) ; un échec est journalisé, jamais propagé à la route"""
+        if not self.started or not offre_ids:
+            return
+        try:
+            for start in range(0, len(offre_ids), MAX_IDS_PER_EVENT):
+                payload = orjson.dumps({"type": event_type, "offre_ids": offre_ids[start:start + MAX_IDS_PER_EVENT]})
+                await self.backend.publish(payload)
+            EVENTS_PUBLISHED.labels(event_type).inc()
+        except Exception:
+            logger.exception("Publication de l'événement %s impossible", event_type)
+
+def create_backend():
+    if settings.EVENTS_BACKEND == "postgres":
+        from app.database import ASYNC_DATABASE_URL
+        return PostgresBackend(ASYNC_DATABASE_URL)
+    return LocalBackend()
+
+offre_events = BroadcastHub(create_backend(), queue_size=settings.EVENTS_QUEUE_SIZE, max_subscribers=settings.EVENTS_MAX_SUBSCRIBERS)
+
+async def sse_stream(subscriber: Subscriber, keepalive: float):
+    """Corps text/event-stream d'un abonné, avec commentaires de maintien de connexion"""
+    try:
+        yield b"retry: 3000\n\n"
+        while True:
+            try:
+                payload = await asyncio.wait_for(subscriber.get(), timeout=keepalive)
+            except asyncio.TimeoutError:
+                yield b": ping\n\n"
+                continue
+            if payload is None:
+                if subscriber.dropped:
+                    yield b"event: dropped\ndata: {}\n\n"
+                return
+            yield b"data: " + payload + b"\n\n"
+    finally:
+        offre_events.unsubscribe(subscriber)
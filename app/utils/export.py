@@ -0,0 +1,82 @@
+import csv
+import enum
+import io
+from datetime import date, datetime
+from typing import AsyncIterator, Literal
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Boolean, Date, DateTime, Enum
+from starlette.concurrency import iterate_in_threadpool
+
+from app.core.config import settings
+from app import database
+from app.utils.fast_json import RowSerializer
+
+ExportFormat = Literal["ndjson", "csv"]
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+def sync_partitions(query, batch_size: int):
+    # Curseur côté serveur (psycopg2 : curseur nommé ; SQLite : lecture incrémentale)
+    with database.read_engine(asynchronous=False).connect() as conn:
+        result = conn.execution_options(yield_per=batch_size).execute(query)
+        yield from result.partitions()
+
+async def async_partitions(query, batch_size: int):
+    async with database.read_engine().connect() as conn:
+        result = await conn.stream(query.execution_options(yield_per=batch_size))
+        async for rows in result.partitions():
+            yield rows
+
+def partitions(query, batch_size: int) -> AsyncIterator:
+    """Lignes de la requête par lots de `batch_size`, sans jamais charger le résultat entier.
+
+    La connexion est ouverte ici, pendant l'envoi de la réponse : la session de la
+    requête (get_db) est déjà refermée quand le corps commence à partir. Elle va
+    à la réplique si elle est à jour.
+    """
+    if settings.DB_ASYNC:
+        return async_partitions(query, batch_size)
+    return iterate_in_threadpool(sync_partitions(query, batch_size))
+
+async def ndjson_chunks(serializer: RowSerializer, batches: AsyncIterator) -> AsyncIterator[bytes]:
+    # Un objet JSON par ligne, au même format que les listes paginées
+    dumps_item = serializer.dumps_item
+    async for rows in batches:
+        yield b"".join(dumps_item(row) + b"\n" for row in rows)
+
+def csv_converter(column_type):
+    if isinstance(column_type, Enum):
+        return lambda value: value.value if isinstance(value, enum.Enum) else value
+    if isinstance(column_type, (DateTime, Date)):
+        return lambda value: value.isoformat() if isinstance(value, (date, datetime)) else value
+    if isinstance(column_type, Boolean):
+        return lambda value: "true" if value else "false"
+    return None
+
+async def csv_chunks(serializer: RowSerializer, batches: AsyncIterator) -> AsyncIterator[bytes]:
+    # Colonnes à plat ; celles des relations sont préfixées (createur__email)
+    converters = [(i, convert) for i, column in enumerate(serializer.columns) for convert in (csv_converter(column.type),) if convert]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow([column.name for column in serializer.columns])
+    async for rows in batches:
+        for row in rows:
+            values = list(row)
+            for i, convert in converters:
+                if values[i] is not None:
+                    values[i] = convert(values[i])
+            writer.writerow(values)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+def export_response(serializer: RowSerializer, query, format: ExportFormat, name: str) -> StreamingResponse:
+    """Export complet en flux : mémoire constante quelle que soit la taille de la table"""
+    batches = partitions(query, settings.EXPORT_BATCH_SIZE)
+    chunks = csv_chunks(serializer, batches) if format == "csv" else ndjson_chunks(serializer, batches)
+    return StreamingResponse(
+        chunks, media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{format}"'},
+    )
@@ -0,0 +1,93 @@
+import json
+from typing import Dict, List, Sequence, Tuple, Type, get_args
+
+import orjson
+from fastapi import Response
+from pydantic import BaseModel
+from sqlalchemy import select
+
+# Même rendu que pydantic (mode json) + JSONResponse : dates ISO 8601 avec « Z » pour UTC,
+# enums par valeur, UTF-8 sans échappement ni espaces
+ORJSON_OPTIONS = orjson.OPT_UTC_Z
+
+def same_float_text(value) -> bool:
+    """orjson écrit ce flottant comme json.dumps (repr) : vrai hors de ]0, 1e-4[ et [1e16, ∞[.
+
+    En dehors, orjson écrit 0.00001 et 1e16 là où JSONResponse écrit 1e-05 et 1e+16.
+    """
+    return value is None or value == 0 or 1e-4 <= abs(value) < 1e16
+
+def json_response_body(body: bytes) -> bytes:
+    """Réécrit un corps orjson exactement comme JSONResponse (chemin lent, rare)"""
+    return json.dumps(orjson.loads(body), ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+class RowSerializer:
+    """Sérialise directement des lignes SQL (tuples de colonnes) au format d'un schéma.
+
+    Les colonnes sont sélectionnées dans l'ordre des champs du schéma, si bien
+    que chaque ligne se convertit en dict par un simple zip : ni objets ORM
+    (identity map), ni validation pydantic par ligne. Réservé aux schémas dont
+    tous les champs sont des colonnes, les relations imbriquées venant en dernier.
+    Un lot contenant un flottant qu'orjson écrirait autrement que JSONResponse
+    (voir same_float_text) est réécrit par json.dumps.
+    """
+
+    def __init__(self, schema: Type[BaseModel], model, nested: Dict[str, Tuple[Type[BaseModel], object]] = None, prefix: str = ""):
+        nested = nested or {}
+        fields = list(schema.model_fields)
+        scalars = [name for name in fields if name not in nested]
+        if fields[:len(scalars)] != scalars:
+            raise ValueError(f"{schema.__name__} : les relations doivent suivre les champs simples")
+        self.keys = tuple(scalars)
+        self.floats = [
+            i for i, name in enumerate(scalars)
+            if float in (schema.model_fields[name].annotation, *get_args(schema.model_fields[name].annotation))
+        ]
+        self.columns = [getattr(model, name).label(prefix + name) for name in scalars]
+        self.nested: List[Tuple[str, "RowSerializer", int]] = []
+        self.joins = []
+        for name in fields[len(scalars):]:
+            child_schema, relationship = nested[name]
+            child = RowSerializer(child_schema, relationship.property.mapper.class_, prefix=f"{prefix}{name}__")
+            self.nested.append((name, child, len(self.columns)))
+            self.columns.extend(child.columns)
+            self.joins.append(relationship)
+        self.has_floats = bool(self.floats) or any(child.has_floats for _, child, _ in self.nested)
+
+    def select(self):
+        """SELECT des colonnes à plat, avec les jointures des relations imbriquées"""
+        query = select(*self.columns)
+        for relationship in self.joins:
+            query = query.join(relationship)
+        return query
+
+    def to_dict(self, row: Sequence, offset: int = 0) -> dict:
+        item = dict(zip(self.keys, row[offset:offset + len(self.keys)]))
+        for name, child, start in self.nested:
+            item[name] = child.to_dict(row, offset + start)
+        return item
+
+    def floats_match(self, row: Sequence, offset: int = 0) -> bool:
+        if not all(same_float_text(row[offset + i]) for i in self.floats):
+            return False
+        return all(child.floats_match(row, offset + start) for _, child, start in self.nested)
+
+    def dumps(self, rows: Sequence[Sequence]) -> bytes:
+        if not self.nested:
+            keys = self.keys
+            body = orjson.dumps([dict(zip(keys, row)) for row in rows], option=ORJSON_OPTIONS)
+        else:
+            body = orjson.dumps([self.to_dict(row) for row in rows], option=ORJSON_OPTIONS)
+        if self.has_floats and not all(self.floats_match(row) for row in rows):
+            return json_response_body(body)
+        return body
+
+    def dumps_item(self, row: Sequence) -> bytes:
+        """Une ligne seule, au format des éléments de dumps()"""
+        body = orjson.dumps(self.to_dict(row), option=ORJSON_OPTIONS)
+        if self.has_floats and not self.floats_match(row):
+            return json_response_body(body)
+        return body
+
+def json_response(body: bytes, headers: Dict[str, str] = None) -> Response:
+    return Response(body, media_type="application/json", headers=headers)
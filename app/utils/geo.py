@@ -0,0 +1,63 @@
+import math
+from typing import List, Tuple
+
+# Géohash : grille hiérarchique, les offres voisines partagent un préfixe commun
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+GEOHASH_PRECISION = 7  # cellules d'environ 150 m x 150 m
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 111.32
+
+def encode_geohash(latitude: float, longitude: float, precision: int = GEOHASH_PRECISION) -> str:
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        target, interval = (longitude, lon_range) if even else (latitude, lat_range)
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if target >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits, value = 0, 0
+    return "".join(chars)
+
+def cell_size(precision: int) -> Tuple[float, float]:
+    """Hauteur et largeur (en degrés) d'une cellule de la précision donnée"""
+    lon_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lon_bits
+
+def covering_cells(latitude: float, longitude: float, radius_km: float, max_cells: int = 32) -> List[str]:
+    """Préfixes géohash couvrant la boîte englobante du cercle.
+
+    On retient la précision la plus fine qui couvre la boîte en au plus
+    `max_cells` cellules : peu de plages à lire, et peu de faux candidats.
+    """
+    delta_lat = radius_km / KM_PER_DEGREE
+    delta_lon = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(latitude)), 0.01))
+    south, north = max(latitude - delta_lat, -90.0), min(latitude + delta_lat, 90.0)
+    west, east = longitude - delta_lon, longitude + delta_lon
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        height, width = cell_size(precision)
+        # Indices (ligne, colonne) des cellules aux coins de la boîte
+        rows = range(math.floor((south + 90.0) / height), math.floor((north + 90.0) / height) + 1)
+        cols = range(math.floor((west + 180.0) / width), math.floor((east + 180.0) / width) + 1)
+        if len(rows) * len(cols) <= max_cells:
+            break
+    # Centre de chaque cellule, longitude ramenée dans [-180, 180[
+    return sorted({
+        encode_geohash(min((row + 0.5) * height - 90.0, 90.0), ((col + 0.5) * width) % 360.0 - 180.0, precision)
+        for row in rows for col in cols
+    })
+
+def distance_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Distance orthodromique (haversine)"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi, dlambda = phi2 - phi1, math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
@@ -0,0 +1,185 @@
+import os
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from sqlalchemy import event
+
+# Avec plusieurs workers uvicorn, PROMETHEUS_MULTIPROC_DIR doit pointer vers un
+# répertoire partagé (vidé au démarrage) : chaque processus y écrit ses valeurs
+# dans des fichiers mmap et /metrics les agrège.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "Requêtes HTTP traitées", ["method", "route", "status"],
+)
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "Durée des requêtes HTTP", ["method", "route"], buckets=LATENCY_BUCKETS,
+)
+HTTP_IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "Requêtes HTTP en cours", multiprocess_mode="livesum",
+)
+REQUEST_DB_QUERIES = Histogram(
+    "http_request_db_queries", "Requêtes SQL émises par requête HTTP", ["method", "route"], buckets=QUERY_COUNT_BUCKETS,
+)
+REQUEST_DB_SECONDS = Histogram(
+    "http_request_db_seconds", "Temps passé en base par requête HTTP", ["method", "route"], buckets=LATENCY_BUCKETS,
+)
+
+POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out", "Connexions empruntées au pool", ["pool"], multiprocess_mode="livesum",
+)
+POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds", "Attente pour obtenir une connexion du pool", ["pool"], buckets=LATENCY_BUCKETS,
+)
+POOL_CHECKOUT_FAILURES = Counter(
+    "db_pool_checkout_failures_total", "Échecs d'obtention d'une connexion (timeout, connexion refusée)", ["pool"],
+)
+
+PASSWORD_HASH_SECONDS = Histogram(
+    "password_hash_seconds", "Durée d'un calcul bcrypt (hors attente dans la file)", ["operation"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+
+SWEEP_DURATION = Histogram(
+    "sweep_duration_seconds", "Durée d'un passage du balayeur d'expirations", ["job"], buckets=LATENCY_BUCKETS,
+)
+SWEEP_ROWS = Counter(
+    "sweep_rows_total", "Lignes modifiées par le balayeur d'expirations", ["job"],
+)
+SWEEPER_LEADER = Gauge(
+    "sweeper_is_leader", "1 si ce processus exécute le balayeur", multiprocess_mode="livesum",
+)
+
+OUTBOX_MESSAGES = Counter(
+    "outbox_messages_total", "Emails traités par le worker d'envoi", ["result"],
+)
+OUTBOX_BATCH_SECONDS = Histogram(
+    "outbox_batch_seconds", "Durée d'envoi d'un lot de la boîte d'envoi", buckets=LATENCY_BUCKETS,
+)
+
+EVENTS_SUBSCRIBERS = Gauge(
+    "offre_events_subscribers", "Abonnés connectés au flux des offres", multiprocess_mode="livesum",
+)
+EVENTS_PUBLISHED = Counter(
+    "offre_events_published_total", "Événements publiés sur le flux des offres", ["type"],
+)
+EVENTS_DROPPED = Counter(
+    "offre_events_dropped_subscribers_total", "Abonnés trop lents déconnectés",
+)
+
+RATE_LIMITED = Counter(
+    "rate_limited_requests_total", "Requêtes refusées (429) par la limitation de débit", ["budget"],
+)
+LOAD_SHED = Counter(
+    "load_shed_requests_total", "Requêtes refusées (503) faute de place parmi les requêtes en cours",
+)
+
+SLOW_REQUESTS = Counter(
+    "slow_requests_total", "Requêtes profilées au-delà de SLOW_REQUEST_SECONDS", ["method", "route"],
+)
+N_PLUS_ONE = Counter(
+    "sql_n_plus_one_requests_total", "Requêtes profilées répétant une même requête SQL (N+1)", ["method", "route"],
+)
+
+READ_ROUTING = Counter(
+    "db_read_routing_total", "Sessions de lecture par base choisie et raison", ["target", "reason"],
+)
+REPLICA_LAG = Gauge(
+    "db_replica_lag_seconds", "Retard de la réplique mesuré par le worker", multiprocess_mode="max",
+)
+
+STARTUP_SECONDS = Gauge(
+    "startup_step_seconds", "Durée des étapes du démarrage du worker", ["step"], multiprocess_mode="max",
+)
+
+class QueryStats:
+    """Requêtes SQL de la requête HTTP en cours"""
+
+    __slots__ = ("count", "seconds")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+# Partagé par référence avec les threads du mode synchrone (contexte copié par run_in_threadpool)
+current_query_stats: ContextVar[Optional[QueryStats]] = ContextVar("current_query_stats", default=None)
+
+def install_query_metrics(engine):
+    """Compte les requêtes SQL de `engine` dans les statistiques de la requête HTTP en cours"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info["query_started_at"] = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        stats = current_query_stats.get()
+        started = conn.info.pop("query_started_at", None)
+        if stats is not None and started is not None:
+            stats.count += 1
+            stats.seconds += time.perf_counter() - started
+
+def route_template(scope) -> str:
+    # Le gabarit (/offres/{offre_id}) et non le chemin : cardinalité bornée
+    route = scope.get("route")
+    return getattr(route, "path", None) or "<unmatched>"
+
+class MetricsMiddleware:
+    """Middleware ASGI : compteur, latence et requêtes SQL par route"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        stats = QueryStats()
+        token = current_query_stats.set(stats)
+        HTTP_IN_PROGRESS.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            HTTP_IN_PROGRESS.dec()
+            current_query_stats.reset(token)
+            method, route = scope["method"], route_template(scope)
+            HTTP_REQUESTS.labels(method, route, str(status_code)).inc()
+            HTTP_LATENCY.labels(method, route).observe(elapsed)
+            REQUEST_DB_QUERIES.labels(method, route).observe(stats.count)
+            REQUEST_DB_SECONDS.labels(method, route).observe(stats.seconds)
+
+def render_metrics() -> bytes:
+    """Exposition texte Prometheus, agrégée sur tous les workers en mode multiprocessus"""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+def mark_process_dead():
+    """Fin du worker : retire ses jauges « live » des agrégats multiprocessus"""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        multiprocess.mark_process_dead(os.getpid())
@@ -0,0 +1,36 @@
+from typing import List
+
+from sqlalchemy import insert, literal, select
+from sqlalchemy.orm import aliased
+
+from app import models
+from app.core.config import settings
+
+Donateur = aliased(models.Utilisateur)
+Beneficiaire = aliased(models.Utilisateur)
+
+RESERVATION = ("Votre offre a été réservée", "a été réservée par")
+ANNULATION = ("Réservation annulée", "est de nouveau disponible : réservation annulée par")
+NON_RECUPEREE = ("Réservation expirée", "est de nouveau disponible : réservation non récupérée par")
+
+async def notify_donateurs(db, transaction_ids: List[int], message):
+    """Écrit dans la boîte d'envoi un email au donateur de chaque transaction.
+
+    Un seul INSERT ... SELECT dans la transaction en cours : l'email existe si et
+    seulement si l'action est validée, sans aucun appel SMTP dans la requête.
+    """
+    if not settings.SMTP_HOST or not transaction_ids:
+        return
+    sujet, action = message
+    corps = literal("Votre offre « ") + models.Offre.titre + literal(f" » {action} ") + Beneficiaire.email + literal(".")
+    await db.execute(
+        insert(models.EmailSortant).from_select(
+            ["destinataire", "sujet", "corps"],
+            select(Donateur.email, literal(sujet), corps)
+            .select_from(models.Transaction)
+            .join(models.Offre, models.Transaction.offre_id == models.Offre.id)
+            .join(Donateur, models.Offre.createur_id == Donateur.id)
+            .join(Beneficiaire, models.Transaction.beneficiaire_id == Beneficiaire.id)
+            .where(models.Transaction.id.in_(transaction_ids)),
+        )
+    )
@@ -1,6 +1,13 @@
-from typing import List, TypeVar, Generic
+import base64
+import json
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple, TypeVar, Generic
+from fastapi import HTTPException, Response
 from pydantic import BaseModel
-from sqlalchemy.orm import Query
+from sqlalchemy import Select, func, select, tuple_
+
+from app.core.config import settings
+from app.utils.cache import TTLCache
 
 T = TypeVar('T')
 
@@ -11,15 +18,78 @@ class PaginatedResponse(BaseModel, Generic[T]):
     size: int
     pages: int
 
-def paginate(query: Query, page: int = 1, size: int = 50) -> dict:
-    """Utilitaire pour paginer les résultats de requête"""
-    total = query.count()
-    items = query.offset((page - 1) * size).limit(size).all()
-    
-    return {
-        "items": items,
-        "total": total,
-        "page": page,
-        "size": size,
-        "pages": (total + size - 1) // size
-    }
\ No newline at end of file
+# === PAGINATION PAR CURSEUR (keyset) ===
+
+def encode_cursor(created_at: datetime, id: int) -> str:
+    """Curseur opaque désignant la dernière ligne renvoyée"""
+    raw = json.dumps([created_at.isoformat() if created_at else None, id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[Optional[datetime], int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, id = json.loads(raw)
+        return (datetime.fromisoformat(created_at) if created_at else None), int(id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Curseur de pagination invalide.")
+
+async def paginate_keyset(
+    db,
+    query: Select,
+    model,
+    limit: int,
+    cursor: Optional[str] = None,
+    skip: int = 0,
+    descending: bool = False,
+    as_rows: bool = False,
+) -> Tuple[list, Optional[str]]:
+    """Pagine `query` triée sur (created_at, id).
+
+    Avec un curseur, la page démarre juste après la ligne désignée (coût constant
+    quelle que soit la profondeur) ; sinon on retombe sur offset/limit. Renvoie les
+    lignes et le curseur de la page suivante (None en fin de liste).
+    `as_rows` renvoie des tuples de colonnes (dont `created_at` et `id`) au lieu d'objets ORM.
+    """
+    key = tuple_(model.created_at, model.id)
+    if descending:
+        query = query.order_by(model.created_at.desc(), model.id.desc())
+    else:
+        query = query.order_by(model.created_at.asc(), model.id.asc())
+
+    if cursor:
+        created_at, last_id = decode_cursor(cursor)
+        # On relit created_at en base : la valeur stockée fait foi (précision, fuseau)
+        stored = select(model.created_at).where(model.id == last_id).scalar_subquery()
+        bound = tuple_(func.coalesce(stored, created_at), last_id)
+        query = query.where(key < bound if descending else key > bound)
+    elif skip:
+        query = query.offset(skip)
+
+    # Une ligne de plus pour savoir s'il existe une page suivante
+    fetch = db.execute if as_rows else db.scalars
+    rows = (await fetch(query.limit(limit + 1))).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1].created_at, rows[-1].id)
+
+# Totaux mis en cache : COUNT(*) n'est pas recalculé à chaque page
+count_cache = TTLCache(maxsize=1024, ttl=settings.PAGINATION_COUNT_TTL)
+
+async def cached_count(db, query: Select, key) -> int:
+    total = count_cache.get(key)
+    if total is None:
+        total = await db.scalar(select(func.count()).select_from(query.order_by(None).subquery()))
+        count_cache.set(key, total)
+    return total
+
+def pagination_headers(next_cursor: Optional[str], total: Optional[int] = None) -> Dict[str, str]:
+    headers = {}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    if total is not None:
+        headers["X-Total-Count"] = str(total)
+    return headers
+
+def set_pagination_headers(response: Response, next_cursor: Optional[str], total: Optional[int] = None):
+    response.headers.update(pagination_headers(next_cursor, total))
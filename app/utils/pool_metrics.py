@@ -0,0 +1,134 @@
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, List
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+
+from app.utils.metrics import POOL_CHECKED_OUT, POOL_CHECKOUT_FAILURES, POOL_CHECKOUT_WAIT
+
+# Bornes (secondes) de l'histogramme du temps d'attente d'une connexion
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class PoolMetrics:
+    """Compteurs d'un pool de connexions : attente au checkout et échecs"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.pool = None
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.wait_counts: List[int] = [0] * (len(WAIT_BUCKETS) + 1)
+            self.wait_sum = 0.0
+            self.wait_max = 0.0
+            self.checkouts = 0
+            self.checkout_failures = 0
+            self.pings = 0
+            self.invalidated = 0
+
+    def observe_wait(self, seconds: float):
+        with self._lock:
+            self.wait_counts[bisect_left(WAIT_BUCKETS, seconds)] += 1
+            self.wait_sum += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            self.checkouts += 1
+        POOL_CHECKOUT_WAIT.labels(self.name).observe(seconds)
+        POOL_CHECKED_OUT.labels(self.name).inc()
+
+    def record_failure(self):
+        with self._lock:
+            self.checkout_failures += 1
+        POOL_CHECKOUT_FAILURES.labels(self.name).inc()
+
+    def snapshot(self) -> Dict:
+        """Statistiques instantanées (état du pool + histogramme cumulatif)"""
+        with self._lock:
+            cumulative, buckets = 0, {}
+            for bound, count in zip(WAIT_BUCKETS + (float("inf"),), self.wait_counts):
+                cumulative += count
+                buckets["+Inf" if bound == float("inf") else str(bound)] = cumulative
+            stats = {
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "pings": self.pings,
+                "invalidated": self.invalidated,
+                "wait_seconds": {
+                    "buckets": buckets,
+                    "sum": round(self.wait_sum, 6),
+                    "max": round(self.wait_max, 6),
+                    "count": self.checkouts,
+                },
+            }
+        pool = self.pool
+        if pool is not None:
+            stats.update({
+                "size": pool.size(),
+                "checked_in": pool.checkedin(),
+                "checked_out": pool.checkedout(),
+                "overflow": max(pool.overflow(), 0),
+                "max_overflow": getattr(pool, "_max_overflow", 0),
+            })
+        return stats
+
+class _TimedCheckoutMixin:
+    """Mesure le temps passé à obtenir une connexion (attente + connexion éventuelle)"""
+
+    metrics: PoolMetrics
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except Exception:
+            self.metrics.record_failure()
+            raise
+        self.metrics.observe_wait(time.perf_counter() - started)
+        return connection
+
+def instrumented_pool_class(base, metrics: PoolMetrics):
+    """Sous-classe `base` (QueuePool ou AsyncAdaptedQueuePool) reliée à `metrics`"""
+    assert base in (QueuePool, AsyncAdaptedQueuePool)
+    return type(f"Instrumented{base.__name__}", (_TimedCheckoutMixin, base), {"metrics": metrics})
+
+def install_pre_ping(engine, metrics: PoolMetrics, strategy: str, idle_seconds: float):
+    """Branche la stratégie de pre-ping et le suivi du pool sur `engine`.
+
+    - "always" : ping à chaque checkout (équivalent de pool_pre_ping=True)
+    - "idle"   : ping seulement si la connexion est restée inutilisée plus de `idle_seconds`
+    - "never"  : aucun ping, les connexions mortes sont détectées à l'usage
+    """
+    pool = engine.pool
+    metrics.pool = pool
+
+    @event.listens_for(pool, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        connection_record.info["checked_in_at"] = time.monotonic()
+        POOL_CHECKED_OUT.labels(metrics.name).dec()
+
+    @event.listens_for(pool, "invalidate")
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        metrics.invalidated += 1
+
+    if strategy == "never":
+        return
+
+    @event.listens_for(pool, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        checked_in_at = connection_record.info.get("checked_in_at")
+        if checked_in_at is None:
+            return  # connexion neuve
+        if strategy == "idle" and time.monotonic() - checked_in_at < idle_seconds:
+            return
+        metrics.pings += 1
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute("SELECT 1")
+        except Exception as e:
+            # Le pool jette la connexion et en ouvre une nouvelle
+            raise exc.DisconnectionError() from e
+        finally:
+            cursor.close()
@@ -0,0 +1,178 @@
+import logging
+import random
+import re
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+import orjson
+from sqlalchemy import event
+
+from app.core.config import settings
+from app.utils.metrics import N_PLUS_ONE, SLOW_REQUESTS, route_template
+
+logger = logging.getLogger(__name__)
+
+# Normalisation : valeurs et listes IN remplacées, pour regrouper les requêtes de même forme
+_IN_LIST = re.compile(r"\(\s*(?:\?|%s|\$\d+|%\(\w+\)s|:\w+)(?:\s*,\s*(?:\?|%s|\$\d+|%\(\w+\)s|:\w+))+\s*\)")
+_PARAM = re.compile(r"\$\d+|%\(\w+\)s|%s|(?<![:\w]):\w+")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_SPACES = re.compile(r"\s+")
+
+def normalize_sql(statement: str) -> str:
+    """Forme de la requête : paramètres et littéraux remplacés par ?, listes IN réduites à (...)"""
+    statement = _STRING.sub("?", statement)
+    statement = _IN_LIST.sub("(...)", statement)
+    statement = _PARAM.sub("?", statement)
+    statement = _NUMBER.sub("?", statement)
+    return _SPACES.sub(" ", statement).strip()
+
+class RequestProfile:
+    """Requêtes SQL d'une requête HTTP échantillonnée, regroupées par texte exact"""
+
+    __slots__ = ("count", "seconds", "statements")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements: Dict[str, List[float]] = {}  # texte -> [nombre, durée totale, durée max]
+
+    def record(self, statement: str, elapsed: float):
+        self.count += 1
+        self.seconds += elapsed
+        entry = self.statements.get(statement)
+        if entry is None:
+            self.statements[statement] = [1, elapsed, elapsed]
+        else:
+            entry[0] += 1
+            entry[1] += elapsed
+            if elapsed > entry[2]:
+                entry[2] = elapsed
+
+    def shapes(self) -> Dict[str, List[float]]:
+        """Regroupe par forme normalisée (normalisation payée une fois par texte distinct)"""
+        shapes: Dict[str, List[float]] = {}
+        for statement, (count, total, slowest) in self.statements.items():
+            shape = normalize_sql(statement)
+            entry = shapes.setdefault(shape, [0, 0.0, 0.0])
+            entry[0] += count
+            entry[1] += total
+            entry[2] = max(entry[2], slowest)
+        return shapes
+
+# Profil de la requête HTTP en cours ; None si elle n'est pas échantillonnée
+current_profile: ContextVar[Optional[RequestProfile]] = ContextVar("current_profile", default=None)
+
+def install_sql_profiling(engine):
+    """Enregistre chaque requête SQL de `engine` dans le profil de la requête HTTP en cours"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if current_profile.get() is not None:
+            conn.info["profile_started_at"] = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        profile = current_profile.get()
+        started = conn.info.pop("profile_started_at", None)
+        if profile is not None and started is not None:
+            profile.record(statement, time.perf_counter() - started)
+
+class SQLProfiler:
+    """Réglages du profilage ; modifiables à chaud (tests, benchmark)"""
+
+    def __init__(self, enabled: bool, sample_rate: float, slow_seconds: float, n_plus_one: int,
+                 server_timing: bool = True):
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.slow_seconds = slow_seconds
+        self.n_plus_one = n_plus_one
+        self.server_timing = server_timing
+
+    @classmethod
+    def from_settings(cls) -> "SQLProfiler":
+        return cls(
+            settings.SQL_PROFILING, settings.SQL_PROFILING_SAMPLE_RATE, settings.SLOW_REQUEST_SECONDS,
+            settings.N_PLUS_ONE_THRESHOLD, settings.SERVER_TIMING,
+        )
+
+    def sampled(self) -> bool:
+        return self.enabled and (self.sample_rate >= 1.0 or random.random() < self.sample_rate)
+
+    def report(self, scope, status: int, elapsed: float, profile: RequestProfile) -> Optional[dict]:
+        """Rapport structuré si la requête est lente ou répète une même requête SQL, sinon None"""
+        slow = elapsed >= self.slow_seconds
+        if not slow and profile.count < self.n_plus_one:
+            return None
+        shapes = profile.shapes()
+        repeated = [
+            {"sql": shape, "count": count, "ms": round(total * 1000, 2)}
+            for shape, (count, total, _) in shapes.items() if count >= self.n_plus_one
+        ]
+        if not slow and not repeated:
+            return None
+        slowest_shape, slowest = max(
+            ((shape, entry[2]) for shape, entry in shapes.items()), key=lambda item: item[1], default=("", 0.0),
+        )
+        return {
+            "method": scope["method"],
+            "path": scope["path"],
+            "route": route_template(scope),
+            "status": status,
+            "slow": slow,
+            "ms": round(elapsed * 1000, 2),
+            "db_ms": round(profile.seconds * 1000, 2),
+            "queries": profile.count,
+            "slowest": {"sql": slowest_shape, "ms": round(slowest * 1000, 2)},
+            "n_plus_one": sorted(repeated, key=lambda shape: -shape["count"]),
+        }
+
+sql_profiler = SQLProfiler.from_settings()
+
+def server_timing(profile: RequestProfile, elapsed: float) -> bytes:
+    return f'db;dur={profile.seconds * 1000:.2f};desc="{profile.count} sql", app;dur={elapsed * 1000:.2f}'.encode()
+
+class SQLProfilingMiddleware:
+    """Middleware ASGI : profil SQL des requêtes échantillonnées (SQL_PROFILING).
+
+    Ajoute l'en-tête Server-Timing (temps SQL et nombre de requêtes jusqu'à
+    l'envoi des en-têtes) et journalise en JSON les requêtes lentes ou qui
+    répètent la même requête SQL (N+1). Non échantillonnée, une requête ne
+    coûte qu'un test ; ses requêtes SQL, une lecture de ContextVar.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not sql_profiler.sampled():
+            return await self.app(scope, receive, send)
+
+        profile = RequestProfile()
+        token = current_profile.set(profile)
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if sql_profiler.server_timing:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", server_timing(profile, time.perf_counter() - started)))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_profile.reset(token)
+            report = sql_profiler.report(scope, status_code, time.perf_counter() - started, profile)
+            if report is not None:
+                route = report["route"]
+                if report["n_plus_one"]:
+                    N_PLUS_ONE.labels(scope["method"], route).inc()
+                if report["slow"]:
+                    SLOW_REQUESTS.labels(scope["method"], route).inc()
+                logger.warning("Requête lente ou N+1 : %s", orjson.dumps(report).decode(), extra={"sql_profile": report})
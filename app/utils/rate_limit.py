@@ -0,0 +1,280 @@
+import asyncio
+import logging
+import math
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from fastapi.responses import JSONResponse
+
+from app.core.config import settings
+from app.security import decode_token
+from app.utils.cache import TTLCache
+from app.utils.metrics import LOAD_SHED, RATE_LIMITED
+
+logger = logging.getLogger(__name__)
+
+# Jamais limités : supervision, et flux longs qui ne tiennent pas de connexion SQL
+EXEMPT_PATHS = frozenset({
+    "/metrics", "/status", "/status/pool", "/status/health", "/status/ready", "/offres/flux", "/offres/ws",
+})
+
+class Budget:
+    """Seau à jetons : `capacity` requêtes d'affilée, rechargées en `period` secondes.
+
+    Se lit « capacity/period » dans la configuration : "10/60" autorise une rafale
+    de 10 requêtes puis une toutes les 6 secondes.
+    """
+
+    __slots__ = ("name", "capacity", "rate")
+
+    def __init__(self, name: str, capacity: int, period: float):
+        self.name = name
+        self.capacity = capacity
+        self.rate = capacity / period  # jetons par seconde
+
+    @classmethod
+    def parse(cls, name: str, spec: str) -> "Budget":
+        capacity, period = spec.split("/")
+        return cls(name, int(capacity), float(period))
+
+    @property
+    def period(self) -> float:
+        return self.capacity / self.rate
+
+class MemoryStore:
+    """Seaux gardés dans le processus : chaque worker applique le budget séparément.
+
+    Au-delà de `max_keys`, le seau utilisé le moins récemment est oublié (LRU,
+    comme TTLCache) : un flot de clés nouvelles ne remet pas à zéro les budgets
+    des clients actifs, dont le seau vient d'être touché.
+    """
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, List[float]]" = OrderedDict()
+
+    async def take(self, key: str, budget: Budget, now: float) -> float:
+        """Consomme un jeton ; renvoie 0 si accordé, sinon l'attente en secondes avant le prochain"""
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            self._buckets[key] = [budget.capacity - 1.0, now]
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return 0.0
+        self._buckets.move_to_end(key)
+        tokens = min(budget.capacity, bucket[0] + (now - bucket[1]) * budget.rate)
+        bucket[1] = now
+        if tokens >= 1.0:
+            bucket[0] = tokens - 1.0
+            return 0.0
+        bucket[0] = tokens
+        return (1.0 - tokens) / budget.rate
+
+    def clear(self):
+        self._buckets.clear()
+
+# Même calcul que MemoryStore, atomique côté Redis
+TOKEN_BUCKET_LUA = """
+local capacity, rate, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(bucket[1])
+if tokens == nil then
+    tokens = capacity
+else
+    tokens = math.min(capacity, tokens + math.max(0, now - tonumber(bucket[2])) * rate)
+end
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return tostring(wait)
+"""
+
+class RedisStore:
+    """Seaux partagés entre workers (et machines) dans Redis, mis à jour par un script Lua.
+
+    `client` est un client `redis.asyncio`. L'horloge est celle du worker
+    (time.time) : les serveurs doivent être synchronisés (NTP).
+    """
+
+    def __init__(self, client, prefix: str = "rate-limit:"):
+        self.client = client
+        self.prefix = prefix
+        self.script = client.register_script(TOKEN_BUCKET_LUA)
+
+    @classmethod
+    def from_url(cls, url: str) -> "RedisStore":
+        import redis.asyncio as redis  # dépendance optionnelle
+
+        return cls(redis.from_url(url))
+
+    async def take(self, key: str, budget: Budget, now: float) -> float:
+        wait = await self.script(keys=[self.prefix + key], args=[budget.capacity, budget.rate, now])
+        return float(wait)
+
+    def clear(self):
+        pass
+
+class RateLimiter:
+    """Budgets par route et par client (utilisateur du token, sinon adresse IP).
+
+    Chaque route listée dans `routes` ("POST /auth/login", ou préfixe
+    "GET /admin/export/*") a son propre seau par client ; les autres requêtes
+    d'un client partagent le seau `default`.
+    """
+
+    def __init__(self, store, default: Budget, routes: Dict[str, Budget], enabled: bool = True,
+                 trust_forwarded: bool = False, clock=time.monotonic):
+        self.store = store
+        self.default = default
+        self.enabled = enabled
+        self.trust_forwarded = trust_forwarded
+        self.clock = clock
+        self.exact: Dict[Tuple[str, str], Budget] = {}
+        self.prefixes: List[Tuple[str, str, Budget]] = []
+        for route, budget in routes.items():
+            method, path = route.split(" ", 1)
+            if path.endswith("*"):
+                self.prefixes.append((method, path[:-1], budget))
+            else:
+                self.exact[(method, path)] = budget
+        # Token → identifiant : une vérification de signature JWT par token et par minute
+        self.token_subjects = TTLCache(maxsize=10_000, ttl=60.0)
+
+    @classmethod
+    def from_settings(cls) -> "RateLimiter":
+        if settings.RATE_LIMIT_BACKEND == "redis":
+            store, clock = RedisStore.from_url(settings.RATE_LIMIT_REDIS_URL), time.time
+        else:
+            store, clock = MemoryStore(), time.monotonic
+        routes = {route: Budget.parse(route, spec) for route, spec in settings.RATE_LIMIT_ROUTES.items()}
+        return cls(
+            store, Budget.parse("*", settings.RATE_LIMIT_DEFAULT), routes, enabled=settings.RATE_LIMIT_ENABLED,
+            trust_forwarded=settings.RATE_LIMIT_TRUST_FORWARDED, clock=clock,
+        )
+
+    def budget_for(self, method: str, path: str) -> Budget:
+        budget = self.exact.get((method, path))
+        if budget is not None:
+            return budget
+        for prefix_method, prefix, budget in self.prefixes:
+            if method == prefix_method and path.startswith(prefix):
+                return budget
+        return self.default
+
+    def client_key(self, scope) -> str:
+        token = None
+        forwarded = None
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                token = value
+            elif name == b"x-forwarded-for":
+                forwarded = value
+        if token is not None and token[:7].lower() == b"bearer ":
+            subject = self.token_subjects.get(token)
+            if subject is None:
+                payload = decode_token(token[7:].decode("latin-1"))
+                # Token invalide : la requête sera refusée, on compte par adresse
+                subject = f"user:{payload['sub']}" if payload and "sub" in payload else ""
+                self.token_subjects.set(token, subject)
+            if subject:
+                return subject
+        if forwarded is not None and self.trust_forwarded:
+            return "ip:" + forwarded.split(b",", 1)[0].strip().decode("latin-1")
+        client = scope.get("client")
+        return "ip:" + (client[0] if client else "unknown")
+
+    async def check(self, scope) -> Tuple[Budget, float]:
+        """Budget appliqué et attente imposée (0 si la requête passe)"""
+        budget = self.budget_for(scope["method"], scope["path"])
+        key = budget.name + "|" + self.client_key(scope)
+        try:
+            return budget, await self.store.take(key, budget, self.clock())
+        except Exception:
+            # Backend partagé indisponible : on laisse passer plutôt que de tout bloquer
+            logger.exception("Limitation de débit indisponible")
+            return budget, 0.0
+
+class ConcurrencyLimiter:
+    """Nombre maximal de requêtes traitées en même temps par le processus.
+
+    Au-delà, une requête attend au plus `timeout` secondes qu'une place se
+    libère, puis reçoit 503 : la charge est refusée avant que les requêtes
+    s'empilent dans la file d'attente du pool de connexions.
+    """
+
+    def __init__(self, limit: int, timeout: float):
+        self.limit = limit
+        self.timeout = timeout
+        self.semaphore = asyncio.Semaphore(limit) if limit > 0 else None
+
+    @property
+    def enabled(self) -> bool:
+        return self.semaphore is not None
+
+    async def acquire(self) -> bool:
+        if not self.semaphore.locked():
+            await self.semaphore.acquire()
+            return True
+        if self.timeout <= 0:
+            return False
+        try:
+            await asyncio.wait_for(self.semaphore.acquire(), self.timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def release(self):
+        self.semaphore.release()
+
+rate_limiter = RateLimiter.from_settings()
+concurrency_limiter = ConcurrencyLimiter(settings.MAX_CONCURRENT_REQUESTS, settings.ADMISSION_TIMEOUT)
+
+def too_many_requests(retry_after: float) -> JSONResponse:
+    return JSONResponse(
+        status_code=429,
+        content={"detail": "Trop de requêtes, réessayez plus tard."},
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+def overloaded() -> JSONResponse:
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Service momentanément surchargé, réessayez."},
+        headers={"Retry-After": "1"},
+    )
+
+class AdmissionMiddleware:
+    """Middleware ASGI : budget du client (429), puis place parmi les requêtes en cours (503)"""
+
+    def __init__(self, app, limiter: Optional[RateLimiter] = None, concurrency: Optional[ConcurrencyLimiter] = None):
+        self.app = app
+        self.limiter = limiter
+        self.concurrency = concurrency
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in EXEMPT_PATHS:
+            return await self.app(scope, receive, send)
+
+        limiter = self.limiter or rate_limiter
+        if limiter.enabled:
+            budget, wait = await limiter.check(scope)
+            if wait > 0:
+                RATE_LIMITED.labels(budget.name).inc()
+                return await too_many_requests(wait)(scope, receive, send)
+
+        concurrency = self.concurrency or concurrency_limiter
+        if not concurrency.enabled:
+            return await self.app(scope, receive, send)
+        if not await concurrency.acquire():
+            LOAD_SHED.inc()
+            return await overloaded()(scope, receive, send)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            concurrency.release()
@@ -0,0 +1,160 @@
+import asyncio
+import logging
+import time
+from typing import Optional
+
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.utils.cache import TTLCache
+from app.utils.metrics import READ_ROUTING, REPLICA_LAG
+
+logger = logging.getLogger(__name__)
+
+# Clé d'écriture récente d'un utilisateur
+def user_writes(user_id: int) -> str:
+    return f"user:{user_id}"
+
+# Retard de rejeu d'un standby PostgreSQL ; 0 s'il a tout rejoué (primaire inactif) ou n'est pas un standby
+POSTGRES_LAG_SQL = text("""
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+END
+""")
+
+class MemoryWriters:
+    """Écritures récentes (clé : « user:12 »), propres au processus"""
+
+    def __init__(self, ttl: float, maxsize: int = 100_000):
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    async def mark(self, key: str):
+        self.cache.set(key, True)
+
+    async def recent(self, key: str) -> bool:
+        return self.cache.get(key) is not None
+
+    def clear(self):
+        self.cache.clear()
+
+class RedisWriters:
+    """Écritures récentes partagées entre workers : une clé Redis expirante par clé d'écriture.
+
+    `client` est un client `redis.asyncio`.
+    """
+
+    def __init__(self, client, ttl: float, prefix: str = "replica-writer:"):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url: str, ttl: float) -> "RedisWriters":
+        import redis.asyncio as redis  # dépendance optionnelle
+
+        return cls(redis.from_url(url), ttl)
+
+    async def mark(self, key: str):
+        await self.client.set(self.prefix + key, 1, px=max(int(self.ttl * 1000), 1))
+
+    async def recent(self, key: str) -> bool:
+        return bool(await self.client.exists(self.prefix + key))
+
+    def clear(self):
+        pass
+
+class ReplicaRouter:
+    """Choisit la base des lectures : la réplique si elle est configurée, joignable et à jour.
+
+    Lectures sur le primaire :
+    - pendant `retry_seconds` après une erreur de connexion à la réplique ;
+    - tant que son retard mesuré dépasse `max_lag` ;
+    - pour un utilisateur (« user:12 ») qui a écrit depuis moins de
+      `sticky_seconds` : il relit ainsi ses propres écritures.
+    """
+
+    def __init__(self, writers, max_lag: float, retry_seconds: float, enabled: bool = False, clock=time.monotonic):
+        self.writers = writers
+        self.max_lag = max_lag
+        self.retry_seconds = retry_seconds
+        self.enabled = enabled
+        self.clock = clock
+        self.lag: Optional[float] = None  # inconnu tant que la première mesure n'est pas faite
+        self.down_until = 0.0
+
+    @classmethod
+    def from_settings(cls) -> "ReplicaRouter":
+        if settings.REPLICA_STICKY_BACKEND == "redis":
+            writers = RedisWriters.from_url(settings.REPLICA_STICKY_REDIS_URL, settings.REPLICA_STICKY_SECONDS)
+        else:
+            writers = MemoryWriters(settings.REPLICA_STICKY_SECONDS)
+        return cls(writers, settings.REPLICA_MAX_LAG_SECONDS, settings.REPLICA_RETRY_SECONDS,
+                   enabled=bool(settings.DATABASE_REPLICA_URL))
+
+    def state(self) -> str:
+        if not self.enabled:
+            return "désactivée"
+        if self.clock() < self.down_until:
+            return "injoignable"
+        if self.lag is not None and self.lag > self.max_lag:
+            return "en retard"
+        return "ok"
+
+    async def choose(self, key: Optional[str] = None) -> bool:
+        """True si la lecture peut aller à la réplique"""
+        state = self.state()
+        if state != "ok":
+            READ_ROUTING.labels("primary", state).inc()
+            return False
+        if key is not None:
+            try:
+                sticky = await self.writers.recent(key)
+            except Exception:
+                logger.exception("Écritures récentes illisibles, lecture sur le primaire")
+                sticky = True
+            if sticky:
+                READ_ROUTING.labels("primary", "écriture récente").inc()
+                return False
+        READ_ROUTING.labels("replica", "ok").inc()
+        return True
+
+    async def mark_write(self, key: str):
+        if not self.enabled:
+            return
+        try:
+            await self.writers.mark(key)
+        except Exception:
+            logger.exception("Écriture récente non mémorisée : %s", key)
+
+    def mark_down(self, exc: BaseException):
+        if self.clock() >= self.down_until:
+            logger.warning("Réplique injoignable, lectures sur le primaire pendant %.0f s : %r", self.retry_seconds, exc)
+        self.down_until = self.clock() + self.retry_seconds
+
+    async def measure_lag(self, engine) -> float:
+        """Mesure le retard de la réplique (moteur asynchrone) ; SQLite n'en a pas"""
+        async with engine.connect() as conn:
+            if conn.dialect.name == "postgresql":
+                lag = float(await conn.scalar(POSTGRES_LAG_SQL))
+            else:
+                await conn.execute(text("SELECT 1"))
+                lag = 0.0
+        self.lag = lag
+        REPLICA_LAG.set(lag)
+        return lag
+
+    async def monitor(self, engine, stop: asyncio.Event, interval: float):
+        """Boucle de mesure du retard, une par worker"""
+        while not stop.is_set():
+            try:
+                await self.measure_lag(engine)
+                self.down_until = 0.0
+            except Exception as exc:
+                self.mark_down(exc)
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+
+replica_router = ReplicaRouter.from_settings()
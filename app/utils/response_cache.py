@@ -0,0 +1,172 @@
+import hashlib
+import json
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.core.config import settings
+from app.utils.cache import TTLCache
+
+# Étiquettes d'invalidation des réponses publiques sur les offres
+OFFRES_LIST = "offres:list"
+
+def offre_tag(offre_id: int) -> str:
+    return f"offre:{offre_id}"
+
+@dataclass
+class CachedResponse:
+    """Réponse JSON figée : corps déjà sérialisé, ETag et en-têtes utiles"""
+    body: bytes
+    etag: str
+    headers: Dict[str, str] = field(default_factory=dict)
+    versions: Tuple[int, ...] = ()
+
+    def dumps(self) -> bytes:
+        meta = {"etag": self.etag, "headers": self.headers, "versions": list(self.versions)}
+        return json.dumps(meta).encode() + b"\n" + self.body
+
+    @classmethod
+    def loads(cls, raw: bytes) -> "CachedResponse":
+        meta, body = raw.split(b"\n", 1)
+        meta = json.loads(meta)
+        return cls(body=body, etag=meta["etag"], headers=meta["headers"], versions=tuple(meta["versions"]))
+
+class MemoryBackend:
+    """Versions des étiquettes gardées dans le processus (un seul worker)"""
+
+    def __init__(self):
+        self._versions: Dict[str, int] = {}
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return None  # les entrées ne vivent que dans le LRU local
+
+    async def set(self, key: str, value: bytes, ttl: float):
+        pass
+
+    async def versions(self, tags: List[str]) -> Tuple[int, ...]:
+        return tuple(self._versions.get(tag, 0) for tag in tags)
+
+    async def bump(self, tags: Iterable[str]):
+        for tag in tags:
+            self._versions[tag] = self._versions.get(tag, 0) + 1
+
+class RedisBackend:
+    """Backend partagé entre workers : entrées et versions dans Redis.
+
+    `client` est un client `redis.asyncio` (ou tout objet offrant get/set/mget/incr).
+    """
+
+    def __init__(self, client, prefix: str = "response-cache:"):
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url: str) -> "RedisBackend":
+        import redis.asyncio as redis  # dépendance optionnelle
+
+        return cls(redis.from_url(url))
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self.client.get(self.prefix + key)
+
+    async def set(self, key: str, value: bytes, ttl: float):
+        await self.client.set(self.prefix + key, value, ex=max(int(ttl), 1))
+
+    async def versions(self, tags: List[str]) -> Tuple[int, ...]:
+        values = await self.client.mget([f"{self.prefix}v:{tag}" for tag in tags])
+        return tuple(int(v or 0) for v in values)
+
+    async def bump(self, tags: Iterable[str]):
+        for tag in tags:
+            await self.client.incr(f"{self.prefix}v:{tag}")
+
+class ResponseCache:
+    """Cache lecture-seule des réponses GET, invalidé par étiquettes.
+
+    Chaque entrée mémorise la version de ses étiquettes au moment du calcul ;
+    `invalidate` incrémente ces versions, ce qui périme d'un coup toutes les
+    entrées concernées (y compris dans les autres workers avec un backend partagé).
+    Le LRU local évite l'aller-retour vers le backend pour le corps ; seules les
+    versions y sont relues.
+    """
+
+    def __init__(self, backend, maxsize: int, ttl: float):
+        self.backend = backend
+        self.ttl = ttl
+        self.enabled = maxsize > 0
+        self.local = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    async def versions(self, tags: List[str]) -> Tuple[int, ...]:
+        return await self.backend.versions(tags)
+
+    async def lookup(self, key: str, versions: Tuple[int, ...]) -> Optional[CachedResponse]:
+        if not self.enabled:
+            return None
+        entry = self.local.get(key)
+        if entry is None or entry.versions != versions:
+            # Un autre worker a peut-être déjà recalculé la réponse
+            raw = await self.backend.get(key)
+            if raw is None:
+                return None
+            entry = CachedResponse.loads(raw)
+            if entry.versions != versions:
+                return None
+            self.local.set(key, entry)
+        return entry
+
+    async def store(self, key: str, versions: Tuple[int, ...], entry: CachedResponse):
+        if not self.enabled:
+            return
+        entry.versions = versions
+        self.local.set(key, entry)
+        await self.backend.set(key, entry.dumps(), self.ttl)
+
+    async def invalidate(self, *tags: str):
+        await self.backend.bump(tags)
+
+    def clear(self):
+        self.local.clear()
+
+def cache_key(request: Request) -> str:
+    # Paramètres triés : ?limit=10&skip=0 et ?skip=0&limit=10 partagent l'entrée
+    return request.url.path + "?" + "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+
+def build_response(content, headers: Optional[Dict[str, str]] = None) -> CachedResponse:
+    """Sérialise `content` (modèles pydantic déjà validés) comme le ferait FastAPI, et calcule l'ETag"""
+    return response_from_body(JSONResponse(jsonable_encoder(content)).body, headers)
+
+def response_from_body(body: bytes, headers: Optional[Dict[str, str]] = None) -> CachedResponse:
+    etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+    return CachedResponse(body=body, etag=etag, headers=dict(headers or {}))
+
+def etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+def send_cached(request: Request, entry: CachedResponse) -> Response:
+    headers = {**entry.headers, "ETag": entry.etag}
+    if etag_matches(request, entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(entry.body, media_type="application/json", headers=headers)
+
+def create_backend():
+    if settings.RESPONSE_CACHE_BACKEND == "redis":
+        return RedisBackend.from_url(settings.RESPONSE_CACHE_REDIS_URL)
+    return MemoryBackend()
+
+response_cache = ResponseCache(create_backend(), maxsize=settings.RESPONSE_CACHE_SIZE, ttl=settings.RESPONSE_CACHE_TTL)
+
+async def invalidate_offre(offre_id: int, listed: bool = True):
+    """Périme le détail de l'offre et, si elle figure (ou figurait) dans la liste publique, ses pages"""
+    await response_cache.invalidate(offre_tag(offre_id), *([OFFRES_LIST] if listed else []))
+
+async def invalidate_offres(offre_ids):
+    """Même chose pour un lot d'offres (toutes listées) : une seule invalidation"""
+    if offre_ids:
+        await response_cache.invalidate(OFFRES_LIST, *(offre_tag(i) for i in offre_ids))
@@ -0,0 +1,120 @@
+import re
+import unicodedata
+from typing import List, Optional
+
+from sqlalchemy import and_, delete, exists, insert, or_, select
+
+from app import models
+from app.utils.geo import covering_cells, distance_km, encode_geohash
+
+MAX_TERM_LENGTH = 64
+STOP_WORDS = {"au", "aux", "de", "des", "du", "en", "et", "la", "le", "les", "un", "une", "pour", "avec", "sur"}
+
+def normalize(text: str) -> str:
+    # « Thiéboudienne » et « thieboudienne » donnent le même terme
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+def terms_of(*texts: Optional[str]) -> List[str]:
+    """Termes indexés d'un texte libre (minuscules, sans accents ni mots vides)"""
+    terms = set()
+    for text in texts:
+        for word in re.findall(r"[a-z0-9]+", normalize(text or "")):
+            if len(word) >= 2 and word not in STOP_WORDS:
+                terms.add(word[:MAX_TERM_LENGTH])
+    return sorted(terms)
+
+def geohash_of(latitude: Optional[float], longitude: Optional[float]) -> Optional[str]:
+    if latitude is None or longitude is None:
+        return None
+    return encode_geohash(latitude, longitude)
+
+def set_location(offre: models.Offre):
+    """Recalcule le géohash stocké à partir des coordonnées"""
+    offre.geohash = geohash_of(offre.latitude, offre.longitude)
+
+async def index_offre(db, offre_id: int, titre: str, description: Optional[str]):
+    """Remplace les termes de recherche de l'offre (dans la transaction en cours)"""
+    await db.execute(delete(models.OffreTerme).where(models.OffreTerme.offre_id == offre_id))
+    terms = terms_of(titre, description)
+    if terms:
+        await db.execute(insert(models.OffreTerme), [{"terme": t, "offre_id": offre_id} for t in terms])
+
+# Au-delà, un terme est « fréquent » : on parcourt les offres récentes plutôt que l'index des termes
+RARE_TERM_MATCHES = 1000
+# Candidats de proximité rechargés par lots, des plus proches aux plus lointains
+NEARBY_BATCH = 500
+
+def term_range(term: str):
+    # Plage sur l'index (terme, offre_id) : « pain » trouve aussi « pains », « painde »...
+    return and_(models.OffreTerme.terme >= term, models.OffreTerme.terme < term + "\uffff")
+
+def term_filter(term: str):
+    return exists().where(models.OffreTerme.offre_id == models.Offre.id, term_range(term))
+
+async def rarest_term_ids(db, terms: List[str]) -> Optional[List[int]]:
+    """Offres du terme le plus rare, s'il est assez rare pour piloter la requête (sinon None)"""
+    rarest = None
+    for term in terms:
+        ids = (await db.scalars(
+            select(models.OffreTerme.offre_id).where(term_range(term)).limit(RARE_TERM_MATCHES + 1)
+        )).all()
+        if len(ids) <= RARE_TERM_MATCHES and (rarest is None or len(ids) < len(rarest)):
+            rarest = ids
+    return rarest
+
+async def load_in_order(db, ids: List[int], terms: List[str] = ()) -> list:
+    """Charge les offres `ids` (contenant les termes) dans l'ordre donné.
+
+    Le filtre se limite à la clé primaire : sans statistiques, l'optimiseur
+    préférerait sinon l'index sur is_disponible et parcourrait toute la table.
+    """
+    offres = await db.scalars(select(models.Offre).where(models.Offre.id.in_(ids), *(term_filter(t) for t in terms)))
+    by_id = {offre.id: offre for offre in offres}
+    return [by_id[offre_id] for offre_id in ids if offre_id in by_id]
+
+async def search_text(db, terms: List[str], limit: int) -> list:
+    """Offres disponibles contenant tous les termes (préfixes), les plus récentes d'abord.
+
+    Le plan est choisi ici plutôt que par l'optimiseur, qui ne connaît pas la
+    fréquence de chaque terme : un terme rare fournit directement les identifiants,
+    sinon on parcourt l'index (created_at, id) en vérifiant les termes ligne à ligne.
+    """
+    ids = await rarest_term_ids(db, terms)
+    if ids is None:
+        offres = await db.scalars(
+            select(models.Offre)
+            .where(models.Offre.is_disponible == True, *(term_filter(t) for t in terms))
+            .order_by(models.Offre.created_at.desc(), models.Offre.id.desc()).limit(limit)
+        )
+        return offres.all()
+    if not ids:
+        return []
+    rows = await db.execute(
+        select(models.Offre.id, models.Offre.created_at, models.Offre.is_disponible)
+        .where(models.Offre.id.in_(ids), *(term_filter(t) for t in terms))
+    )
+    recent = sorted(((row.created_at, row.id) for row in rows if row.is_disponible), reverse=True)
+    return await load_in_order(db, [offre_id for _, offre_id in recent[:limit]])
+
+async def search_nearby(db, latitude: float, longitude: float, radius_km: float, terms: List[str], limit: int) -> list:
+    """Offres disponibles dans le rayon (et contenant les termes), les plus proches d'abord.
+
+    Les candidats sont lus par plages de préfixes géohash (colonnes seules),
+    filtrés à la distance exacte, puis chargés par lots dans l'ordre des distances.
+    """
+    cells = covering_cells(latitude, longitude, radius_km)
+    candidates = await db.execute(
+        select(models.Offre.id, models.Offre.latitude, models.Offre.longitude, models.Offre.is_disponible)
+        .where(or_(*(and_(models.Offre.geohash >= cell, models.Offre.geohash < cell + "~") for cell in cells)))
+    )
+    nearby = sorted(
+        (distance, row.id) for row in candidates if row.is_disponible
+        for distance in (distance_km(latitude, longitude, row.latitude, row.longitude),) if distance <= radius_km
+    )
+    found = []
+    for start in range(0, len(nearby), NEARBY_BATCH):
+        found.extend(await load_in_order(db, [offre_id for _, offre_id in nearby[start:start + NEARBY_BATCH]], terms))
+        if len(found) >= limit:
+            break
+    return found[:limit]
@@ -0,0 +1,66 @@
+import asyncio
+import time
+from typing import Dict, Optional
+
+from sqlalchemy import func, select, true
+
+from app import models
+from app.core.config import settings
+
+def dashboard_query():
+    """Les six compteurs du tableau de bord en une seule requête (agrégats conditionnels)"""
+    utilisateurs = select(
+        func.count().label("total_utilisateurs"),
+        func.count().filter(models.Utilisateur.is_active == True).label("utilisateurs_actifs"),
+    ).subquery()
+    offres = select(
+        func.count().label("total_offres"),
+        func.count().filter(models.Offre.is_disponible == True).label("offres_disponibles"),
+    ).subquery()
+    transactions = select(
+        func.count().label("total_transactions"),
+        func.count().filter(models.Transaction.statut == "reserve").label("transactions_en_cours"),
+    ).subquery()
+    # Produit cartésien voulu : chaque sous-requête renvoie une seule ligne
+    return select(utilisateurs, offres, transactions).select_from(
+        utilisateurs.join(offres, true()).join(transactions, true())
+    )
+
+class DashboardStatsStore:
+    """Compteurs du tableau de bord gardés en mémoire.
+
+    Les routes appliquent leurs deltas (`apply`) après commit, ce qui garde la
+    vue du processus à jour ; les écritures des autres workers sont rattrapées
+    par un recalcul complet dès que la vue a plus de `max_age` secondes.
+    """
+
+    def __init__(self, max_age: float):
+        self.max_age = max_age
+        self.counters: Optional[Dict[str, int]] = None
+        self.refreshed_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def is_fresh(self) -> bool:
+        return self.counters is not None and time.monotonic() - self.refreshed_at < self.max_age
+
+    async def get(self, db) -> Dict[str, int]:
+        if self.is_fresh():
+            return dict(self.counters)
+        async with self._lock:
+            # Un autre appel a pu recalculer pendant l'attente du verrou
+            if not self.is_fresh():
+                row = (await db.execute(dashboard_query())).one()
+                self.counters = dict(row._mapping)
+                self.refreshed_at = time.monotonic()
+            return dict(self.counters)
+
+    def apply(self, **deltas: int):
+        if self.counters is None:
+            return
+        for name, delta in deltas.items():
+            self.counters[name] += delta
+
+    def invalidate(self):
+        self.counters = None
+
+dashboard_stats = DashboardStatsStore(max_age=settings.DASHBOARD_STATS_MAX_AGE)
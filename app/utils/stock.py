@@ -0,0 +1,90 @@
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import and_, case, or_, update
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app import models
+
+STOCK_EPUISE = "Stock épuisé : l'offre ne peut pas être remise en ligne."
+
+def not_expired(now: datetime):
+    return or_(models.Offre.date_expiration.is_(None), models.Offre.date_expiration > now)
+
+def relistable(now: datetime):
+    """Offre hors ligne seulement faute de stock : ni bloquée, ni expirée"""
+    return and_(models.Offre.quantite_restante == 0, models.Offre.is_bloquee == False, not_expired(now))
+
+async def changer_disponibilite(db, offre: models.Offre, disponible: bool) -> bool:
+    """Met l'offre en ligne ou hors ligne (bloquée) par un UPDATE conditionnel.
+
+    La remise en ligne exige du stock sur la ligne à jour : une réservation
+    concurrente qui prend la dernière portion ne peut pas être annulée par une
+    lecture périmée. Renvoie False si l'offre est épuisée.
+    """
+    en_stock = [models.Offre.quantite_restante > 0] if disponible else []
+    result = (await db.execute(
+        update(models.Offre)
+        .where(models.Offre.id == offre.id, *en_stock)
+        .values(is_disponible=disponible, is_bloquee=not disponible)
+        .returning(models.Offre.is_disponible, models.Offre.quantite_restante)
+        .execution_options(synchronize_session=False)
+    )).first()
+    if result is None:
+        return False
+    set_committed_value(offre, "is_disponible", result.is_disponible)
+    set_committed_value(offre, "is_bloquee", not disponible)
+    set_committed_value(offre, "quantite_restante", result.quantite_restante)
+    return True
+
+def rendus_par_offre(annulees: Iterable) -> Dict[int, int]:
+    """Portions à rendre par offre, depuis des lignes (offre_id, quantite) de transactions annulées"""
+    rendus = defaultdict(int)
+    for row in annulees:
+        rendus[row.offre_id] += row.quantite
+    return dict(rendus)
+
+async def restituer_stock(db, rendus: Dict[int, int], now: datetime) -> List[int]:
+    """Rend aux offres les portions de réservations annulées, en un seul UPDATE conditionnel.
+
+    Une offre épuisée repasse disponible, sauf si elle a expiré entre-temps ;
+    une offre bloquée ou expirée récupère son stock sans être remise en ligne.
+    Renvoie les offres remises en ligne.
+    """
+    if not rendus:
+        return []
+    rendu = case(rendus, value=models.Offre.id)
+    result = await db.execute(
+        update(models.Offre)
+        .where(models.Offre.id.in_(rendus))
+        # Les expressions de SET lisent les valeurs d'avant la mise à jour
+        .values(
+            quantite_restante=models.Offre.quantite_restante + rendu,
+            is_disponible=or_(models.Offre.is_disponible, relistable(now)),
+        )
+        .returning(models.Offre.id, models.Offre.is_disponible, models.Offre.quantite_restante)
+        .execution_options(synchronize_session=False)
+    )
+    # Stock nul avant l'annulation : la ligne renvoyée n'a que les portions rendues
+    return [row.id for row in result if row.is_disponible and row.quantite_restante == rendus[row.id]]
+
+async def annuler_et_restituer(db, transaction: models.Transaction, now: datetime) -> Optional[List[int]]:
+    """Annule `transaction` et, si elle était réservée, rend ses portions à l'offre.
+
+    Le statut ne change que s'il vaut encore celui lu par la route : deux
+    annulations concurrentes ne rendent pas deux fois le stock. Renvoie les
+    offres remises en ligne, ou None si la transaction a changé entre-temps.
+    """
+    annulee = (await db.execute(
+        update(models.Transaction)
+        .where(models.Transaction.id == transaction.id, models.Transaction.statut == transaction.statut)
+        .values(statut="annule")
+        .returning(models.Transaction.offre_id, models.Transaction.quantite)
+        .execution_options(synchronize_session=False)
+    )).first()
+    if annulee is None:
+        return None
+    if transaction.statut != "reserve":
+        return []
+    return await restituer_stock(db, rendus_par_offre([annulee]), now)
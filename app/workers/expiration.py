@@ -0,0 +1,130 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import select, update
+
+from app import models
+from app.core.config import settings
+from app.database import session_scope
+from app.utils.events import OFFRE_EXPIREE, OFFRE_LIBEREE, OFFRE_MODIFIEE, offre_events
+from app.utils.metrics import SWEEP_DURATION, SWEEP_ROWS, SWEEPER_LEADER
+from app.utils.notifications import NON_RECUPEREE, notify_donateurs
+from app.utils.response_cache import invalidate_offres
+from app.utils.stats import dashboard_stats
+from app.utils.stock import not_expired, rendus_par_offre, restituer_stock
+from app.workers.leader import LeaderLock
+
+logger = logging.getLogger(__name__)
+
+async def expire_offres(db, now: datetime, batch_size: int) -> int:
+    """Rend indisponibles les offres dont la date d'expiration est passée.
+
+    Lots de `batch_size` lignes choisies par l'index partiel
+    ix_offres_disponibles_date_expiration, un commit par lot : les verrous de
+    ligne restent courts et un gros rattrapage ne bloque pas les réservations.
+    """
+    total = 0
+    while True:
+        expired = (
+            select(models.Offre.id)
+            .where(models.Offre.is_disponible == True, models.Offre.date_expiration <= now)
+            .limit(batch_size)
+            .scalar_subquery()
+        )
+        result = await db.execute(
+            update(models.Offre)
+            .where(models.Offre.id.in_(expired), models.Offre.is_disponible == True)
+            .values(is_disponible=False)
+            .returning(models.Offre.id)
+            .execution_options(synchronize_session=False)
+        )
+        offre_ids = result.scalars().all()
+        await db.commit()
+        dashboard_stats.apply(offres_disponibles=-len(offre_ids))
+        await invalidate_offres(offre_ids)
+        await offre_events.publish(OFFRE_EXPIREE, offre_ids)
+        total += len(offre_ids)
+        if len(offre_ids) < batch_size:
+            return total
+
+async def cancel_stale_reservations(db, now: datetime, cutoff: datetime, batch_size: int) -> int:
+    """Annule les réservations non récupérées depuis `cutoff` et rend leurs portions aux offres.
+
+    Balayage et récupération ne changent le statut que s'il vaut encore « reserve » :
+    une récupération de dernière minute l'emporte ou échoue, jamais les deux.
+    """
+    total = 0
+    while True:
+        stale = (
+            select(models.Transaction.id)
+            .where(models.Transaction.statut == "reserve", models.Transaction.created_at < cutoff)
+            .limit(batch_size)
+            .scalar_subquery()
+        )
+        result = await db.execute(
+            update(models.Transaction)
+            .where(models.Transaction.id.in_(stale), models.Transaction.statut == "reserve")
+            .values(statut="annule")
+            .returning(models.Transaction.id, models.Transaction.offre_id, models.Transaction.quantite)
+            .execution_options(synchronize_session=False)
+        )
+        annulees = result.all()
+        offre_ids = [row.offre_id for row in annulees]
+        rendus = rendus_par_offre(annulees)
+        # Un seul UPDATE rend leurs portions à toutes les offres du lot
+        remises = await restituer_stock(db, rendus, now)
+        if annulees:
+            await notify_donateurs(db, [row.id for row in annulees], NON_RECUPEREE)
+        await db.commit()
+        dashboard_stats.apply(transactions_en_cours=-len(offre_ids), offres_disponibles=len(remises))
+        await invalidate_offres(list(rendus))
+        await offre_events.publish(OFFRE_LIBEREE, remises)
+        await offre_events.publish(OFFRE_MODIFIEE, [offre_id for offre_id in rendus if offre_id not in remises])
+        total += len(offre_ids)
+        if len(offre_ids) < batch_size:
+            return total
+
+async def sweep_once(now: Optional[datetime] = None) -> dict:
+    """Un passage complet ; renvoie le nombre de lignes modifiées par tâche"""
+    now = now or datetime.now(timezone.utc)
+    affected = {}
+    async with session_scope() as db:
+        started = time.perf_counter()
+        affected["offres_expirees"] = await expire_offres(db, now, settings.EXPIRATION_SWEEP_BATCH)
+        SWEEP_DURATION.labels("offres_expirees").observe(time.perf_counter() - started)
+
+        if settings.RESERVATION_PICKUP_WINDOW_HOURS > 0:
+            cutoff = now - timedelta(hours=settings.RESERVATION_PICKUP_WINDOW_HOURS)
+            started = time.perf_counter()
+            affected["reservations_perimees"] = await cancel_stale_reservations(
+                db, now, cutoff, settings.EXPIRATION_SWEEP_BATCH
+            )
+            SWEEP_DURATION.labels("reservations_perimees").observe(time.perf_counter() - started)
+    for job, rows in affected.items():
+        SWEEP_ROWS.labels(job).inc(rows)
+    return affected
+
+async def run_sweeper(stop: asyncio.Event, interval: float):
+    """Boucle du balayeur : seul le worker qui détient le verrou travaille"""
+    lock = LeaderLock("expiration-sweeper")
+    try:
+        while not stop.is_set():
+            try:
+                leader = await lock.acquire()
+                SWEEPER_LEADER.set(int(leader))
+                if leader:
+                    affected = await sweep_once()
+                    if any(affected.values()):
+                        logger.info("Balayage des expirations : %s", affected)
+            except Exception:
+                logger.exception("Échec du balayage des expirations")
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        SWEEPER_LEADER.set(0)
+        await lock.release()
@@ -0,0 +1,123 @@
+import os
+import tempfile
+import zlib
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import NullPool
+from starlette.concurrency import run_in_threadpool
+
+from app import database
+from app.core.config import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows : pas de verrou inter-processus, un seul worker en dev
+    fcntl = None
+
+class LeaderLock:
+    """Verrou non bloquant désignant le worker qui exécute une tâche de fond.
+
+    Sous PostgreSQL : verrou consultatif de session (pg_try_advisory_lock) tenu
+    par une connexion dédiée, ouverte hors du pool des requêtes (NullPool) : le
+    leader ne prive pas les requêtes d'une connexion prévue par pool_capacity().
+    Il est libéré automatiquement si le processus ou la connexion meurt, et un
+    autre worker le reprend au cycle suivant. Ailleurs (SQLite) : flock sur un
+    fichier, valable entre les workers d'une même machine.
+
+    Sans moteur explicite, celui retenu par DB_ASYNC.
+    """
+
+    def __init__(self, name: str, engine=None):
+        self.name = name
+        self.engine = engine
+        self.key = zlib.crc32(name.encode())  # clé 32 bits stable entre processus
+        self.connection = None
+        self._lock_engine = None
+        self._file = None
+
+    def _configured_engine(self):
+        if self.engine is None:
+            self.engine = database.async_engine if settings.DB_ASYNC else database.engine
+        return self.engine
+
+    async def _call(self, method, *args):
+        """Appelle une méthode de connexion ou de moteur, synchrone ou asynchrone"""
+        if isinstance(self._lock_engine, AsyncEngine):
+            return await method(*args)
+        return await run_in_threadpool(method, *args)
+
+    async def _connect(self):
+        if self._lock_engine is None:
+            engine = self._configured_engine()
+            factory = create_async_engine if isinstance(engine, AsyncEngine) else create_engine
+            self._lock_engine = factory(engine.url, poolclass=NullPool)
+        return await self._call(self._lock_engine.connect)
+
+    @property
+    def is_leader(self) -> bool:
+        return self.connection is not None or self._file is not None
+
+    async def acquire(self) -> bool:
+        """Prend le verrou s'il est libre ; vérifie qu'il est toujours tenu sinon"""
+        if self._configured_engine().dialect.name == "postgresql":
+            return await self._acquire_advisory()
+        return self._acquire_file()
+
+    async def _acquire_advisory(self) -> bool:
+        if self.connection is not None:
+            try:
+                await self._call(self.connection.execute, select(1))
+                return True
+            except Exception:
+                # Connexion perdue : le serveur a déjà relâché le verrou
+                await self._close_connection()
+        connection = await self._connect()
+        try:
+            acquired = await self._call(connection.scalar, select(func.pg_try_advisory_lock(self.key)))
+            await self._call(connection.commit)
+        except Exception:
+            await self._call(connection.close)
+            raise
+        if acquired:
+            self.connection = connection
+        else:
+            await self._call(connection.close)
+        return bool(acquired)
+
+    def _acquire_file(self) -> bool:
+        if self._file is not None:
+            return True
+        if fcntl is None:
+            self._file = True
+            return True
+        handle = open(os.path.join(tempfile.gettempdir(), f"denrees-{self.name}.lock"), "w")
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return False
+        self._file = handle
+        return True
+
+    async def _close_connection(self):
+        try:
+            await self._call(self.connection.close)
+        except Exception:
+            pass
+        self.connection = None
+
+    async def release(self):
+        if self.connection is not None:
+            try:
+                await self._call(self.connection.scalar, select(func.pg_advisory_unlock(self.key)))
+            except Exception:
+                pass
+            await self._close_connection()
+        if self._lock_engine is not None:
+            await self._call(self._lock_engine.dispose)
+            self._lock_engine = None
+        if self._file not in (None, True):
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+        self._file = None
@@ -0,0 +1,117 @@
+import asyncio
+import logging
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+from sqlalchemy import select, update
+
+from app import models
+from app.core.config import settings
+from app.database import session_scope
+from app.utils.email_utils import SMTPPool, build_message, is_permanent
+from app.utils.metrics import OUTBOX_BATCH_SECONDS, OUTBOX_MESSAGES
+from app.workers.leader import LeaderLock
+
+logger = logging.getLogger(__name__)
+
+def retry_delay(tentatives: int) -> timedelta:
+    """Attente exponentielle plafonnée, avec gigue pour étaler les reprises"""
+    delay = min(settings.OUTBOX_RETRY_MAX, settings.OUTBOX_RETRY_BASE * 2 ** (tentatives - 1))
+    return timedelta(seconds=delay * random.uniform(0.5, 1.0))
+
+async def send_batch(pool: SMTPPool, now: datetime, batch_size: int) -> Dict[str, int]:
+    """Envoie un lot de messages échus et enregistre le résultat de chacun.
+
+    Aucune transaction ne reste ouverte pendant les envois SMTP : le lot est lu
+    dans une première session, les statuts écrits dans une seconde, courte.
+    Livraison « au moins une fois » : un arrêt entre l'envoi et le commit fait
+    renvoyer le lot au passage suivant.
+    """
+    async with session_scope() as db:
+        rows = (await db.execute(
+            select(
+                models.EmailSortant.id, models.EmailSortant.destinataire, models.EmailSortant.sujet,
+                models.EmailSortant.corps, models.EmailSortant.tentatives,
+            )
+            .where(models.EmailSortant.statut == "en_attente", models.EmailSortant.prochain_essai <= now)
+            .order_by(models.EmailSortant.prochain_essai, models.EmailSortant.id)
+            .limit(batch_size)
+        )).all()
+    if not rows:
+        return {"envoye": 0, "reessai": 0, "echec": 0}
+    # Les connexions du pool se partagent le lot
+    errors = await asyncio.gather(
+        *(pool.send(build_message(row.destinataire, row.sujet, row.corps)) for row in rows),
+        return_exceptions=True,
+    )
+    async with session_scope() as db:
+        counts = await record_results(db, rows, errors, now)
+        await db.commit()
+    return counts
+
+async def record_results(db, rows, errors, now: datetime) -> Dict[str, int]:
+    """Passe les messages envoyés à « envoye », replanifie ou abandonne les autres"""
+    counts = {"envoye": 0, "reessai": 0, "echec": 0}
+    envoyes = [row.id for row, error in zip(rows, errors) if error is None]
+    if envoyes:
+        await db.execute(
+            update(models.EmailSortant)
+            .where(models.EmailSortant.id.in_(envoyes))
+            .values(statut="envoye", envoye_at=now, derniere_erreur=None)
+            .execution_options(synchronize_session=False)
+        )
+        counts["envoye"] = len(envoyes)
+    for row, error in zip(rows, errors):
+        if error is None:
+            continue
+        tentatives = row.tentatives + 1
+        values = {"tentatives": tentatives, "derniere_erreur": repr(error)[:1000]}
+        if is_permanent(error) or tentatives >= settings.OUTBOX_MAX_ATTEMPTS:
+            values["statut"] = "echec"
+            counts["echec"] += 1
+            logger.warning("Email %s abandonné après %s tentative(s) : %r", row.id, tentatives, error)
+        else:
+            values["prochain_essai"] = now + retry_delay(tentatives)
+            counts["reessai"] += 1
+        await db.execute(
+            update(models.EmailSortant).where(models.EmailSortant.id == row.id).values(**values)
+            .execution_options(synchronize_session=False)
+        )
+    return counts
+
+async def drain_outbox(pool: SMTPPool, now: Optional[datetime] = None) -> Dict[str, int]:
+    """Envoie tous les messages échus, lot par lot ; renvoie les totaux par résultat"""
+    now = now or datetime.now(timezone.utc)
+    totals = {"envoye": 0, "reessai": 0, "echec": 0}
+    while True:
+        started = time.perf_counter()
+        counts = await send_batch(pool, now, settings.OUTBOX_BATCH)
+        OUTBOX_BATCH_SECONDS.observe(time.perf_counter() - started)
+        for result, count in counts.items():
+            OUTBOX_MESSAGES.labels(result).inc(count)
+            totals[result] += count
+        if sum(counts.values()) < settings.OUTBOX_BATCH:
+            return totals
+
+async def run_outbox_worker(stop: asyncio.Event, interval: float):
+    """Boucle d'envoi : seul le worker qui détient le verrou vide la boîte d'envoi"""
+    lock = LeaderLock("email-outbox")
+    pool = SMTPPool.from_settings()
+    try:
+        while not stop.is_set():
+            try:
+                if await lock.acquire():
+                    totals = await drain_outbox(pool)
+                    if any(totals.values()):
+                        logger.info("Boîte d'envoi : %s", totals)
+            except Exception:
+                logger.exception("Échec du passage de la boîte d'envoi")
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        await pool.close()
+        await lock.release()
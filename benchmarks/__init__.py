@@ -0,0 +1,8 @@
+# Benchmarks et tests de charge (exécutés manuellement, hors pytest)
+import os
+
+# Un seul client envoie toute la charge : la limitation de débit et le contrôle
+# d'admission (hérités aussi par les serveurs lancés en sous-processus) fausseraient
+# la mesure. Les benchmarks qui les évaluent les construisent eux-mêmes.
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+os.environ.setdefault("MAX_CONCURRENT_REQUESTS", "0")
@@ -0,0 +1,57 @@
+"""Latence des requêtes authentifiées avec et sans cache des utilisateurs.
+
+Mesure en processus (transport ASGI, sans réseau) GET /transactions/mes-transactions
+dans trois configurations : sans cache, avec cache, rôle du token de confiance.
+
+    DATABASE_URL=sqlite:///./bench.db SECRET_KEY=bench python -m benchmarks.auth_cache --requests 2000
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+from app.core.config import settings
+from app.database import Base, engine, async_engine
+from app.main import app
+from app.routes.auth import user_cache
+
+async def measure(client: httpx.AsyncClient, headers: dict, requests: int) -> list:
+    latencies = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        response = await client.get("/transactions/mes-transactions", headers=headers)
+        latencies.append(time.perf_counter() - started)
+        assert response.status_code == 200, response.text
+    return latencies
+
+async def main(args):
+    Base.metadata.create_all(bind=engine)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        credentials = {"email": "bench-auth@example.com", "mot_de_passe": "secret123"}
+        await client.post("/auth/register", json={**credentials, "role": "beneficiaire"})
+        token = (await client.post("/auth/login", json=credentials)).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        configurations = [
+            ("sans cache", 0, False),
+            ("cache", settings.AUTH_USER_CACHE_SIZE or 10000, False),
+            ("rôle du token", 0, True),
+        ]
+        for label, cache_size, trust_role in configurations:
+            user_cache.clear()
+            user_cache.maxsize = cache_size
+            settings.AUTH_TRUST_TOKEN_ROLE = trust_role
+            await measure(client, headers, 50)  # échauffement
+            latencies = sorted(await measure(client, headers, args.requests))
+            p50 = statistics.median(latencies) * 1000
+            p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+            print(f"{label:>14}: p50 {p50:6.3f} ms  p99 {p99:6.3f} ms")
+    await async_engine.dispose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    asyncio.run(main(parser.parse_args()))
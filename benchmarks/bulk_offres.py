@@ -0,0 +1,81 @@
+"""Création d'offres (offres/s) : POST /offres/ élément par élément vs POST /offres/bulk.
+
+Mesure en processus (transport ASGI, sans réseau) ; --clients reproduit plusieurs
+imports par élément en parallèle pour le chemin unitaire.
+
+    DATABASE_URL=sqlite:///./bench.db SECRET_KEY=bench python -m benchmarks.bulk_offres --offres 2000
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+import orjson
+
+from app import models
+from app.database import Base, SessionLocal, engine, async_engine
+from app.main import app
+from app.security import create_access_token
+
+def offres(count: int, tag: str) -> list:
+    return [
+        {"titre": f"Panier {tag} {i}", "description": "Fruits et légumes du jour", "type_offre": "denrees",
+         "quantite": 1 + i % 5, "localisation": "Dakar"}
+        for i in range(count)
+    ]
+
+async def main(args):
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        partenaire = db.query(models.Utilisateur).filter_by(email="bench-bulk@example.com").first()
+        if partenaire is None:
+            partenaire = models.Utilisateur(email="bench-bulk@example.com", password_hash="x", role="partenaire")
+            db.add(partenaire)
+            db.commit()
+        headers = {"Authorization": f"Bearer {create_access_token({'sub': str(partenaire.id), 'role': 'partenaire'})}"}
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        lot = offres(args.offres, "unitaire")
+        queue = asyncio.Queue()
+        for item in lot:
+            queue.put_nowait(item)
+
+        async def worker():
+            while not queue.empty():
+                response = await client.post("/offres/", json=queue.get_nowait(), headers=headers)
+                assert response.status_code == 201, response.text
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.clients)))
+        unitaire = args.offres / (time.perf_counter() - started)
+
+        started = time.perf_counter()
+        response = await client.post("/offres/bulk", content=orjson.dumps(offres(args.offres, "json")), headers={
+            **headers, "Content-Type": "application/json",
+        })
+        assert response.json()["crees"] == args.offres, response.text
+        bulk_json = args.offres / (time.perf_counter() - started)
+
+        ndjson = b"\n".join(orjson.dumps(item) for item in offres(args.offres, "ndjson"))
+        started = time.perf_counter()
+        response = await client.post("/offres/bulk", content=ndjson, headers={
+            **headers, "Content-Type": "application/x-ndjson",
+        })
+        assert response.json()["crees"] == args.offres, response.text
+        bulk_ndjson = args.offres / (time.perf_counter() - started)
+    await async_engine.dispose()
+
+    print(f"{args.offres} offres")
+    for label, rate in (
+        (f"POST /offres/ ({args.clients} client(s))", unitaire),
+        ("POST /offres/bulk (JSON)", bulk_json),
+        ("POST /offres/bulk (NDJSON)", bulk_ndjson),
+    ):
+        print(f"  {label:<32} {rate:9.1f} offres/s  (x{rate / unitaire:.0f})")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--offres", type=int, default=2000)
+    parser.add_argument("--clients", type=int, default=1)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,132 @@
+"""Flux des offres : N abonnés WebSocket inactifs sur un worker, mémoire et latence de diffusion.
+
+Lance un serveur uvicorn (un worker), y ouvre --subscribers connexions /offres/ws
+qui ne font qu'attendre, mesure la mémoire résidente du serveur par abonné, puis
+publie --events créations d'offres et mesure le délai entre le POST et la
+réception par chaque abonné (p50, p99, dernier abonné servi).
+
+    DATABASE_URL=sqlite:///./bench.db SECRET_KEY=bench \\
+    python -m benchmarks.event_feed --subscribers 10000 --events 20
+"""
+import argparse
+import asyncio
+import os
+import resource
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+import httpx
+from websockets.asyncio.client import connect
+
+from benchmarks.load_db_modes import wait_ready
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+def rss_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/statm") as statm:
+        return int(statm.read().split()[1]) * PAGE_SIZE / 2 ** 20
+
+def seed() -> str:
+    from sqlalchemy import select
+
+    from app import models
+    from app.database import Base, SessionLocal, engine
+    from app.security import create_access_token
+
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        donateur = db.scalar(select(models.Utilisateur).where(models.Utilisateur.email == "bench-flux@example.com"))
+        if donateur is None:
+            donateur = models.Utilisateur(email="bench-flux@example.com", password_hash="x", role="donateur")
+            db.add(donateur)
+            db.commit()
+        return create_access_token({"sub": str(donateur.id), "role": "donateur"})
+
+def percentile(values, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+async def run(args, token: str, pid: int) -> int:
+    base_url = f"http://127.0.0.1:{args.port}"
+    await wait_ready(base_url)
+    baseline = rss_mb(pid)
+
+    received = defaultdict(list)
+    all_received = defaultdict(asyncio.Event)
+    connections = []
+    gate = asyncio.Semaphore(args.connect_concurrency)
+
+    async def subscriber():
+        async with gate:
+            ws = await connect(f"ws://127.0.0.1:{args.port}/offres/ws", open_timeout=60, ping_interval=None)
+        connections.append(ws)
+        async for message in ws:
+            offre_id = int(message.rsplit("[", 1)[1].rstrip("]}"))
+            received[offre_id].append(time.perf_counter())
+            if len(received[offre_id]) == args.subscribers:
+                all_received[offre_id].set()
+
+    started = time.perf_counter()
+    readers = [asyncio.create_task(subscriber()) for _ in range(args.subscribers)]
+    while len(connections) < args.subscribers:
+        await asyncio.sleep(0.1)
+        if any(reader.done() for reader in readers):
+            raise RuntimeError("Connexion refusée par le serveur")
+    connect_seconds = time.perf_counter() - started
+    await asyncio.sleep(1)
+    connected = rss_mb(pid)
+
+    latencies, fanout = [], []
+    async with httpx.AsyncClient(base_url=base_url, headers={"Authorization": f"Bearer {token}"}) as client:
+        for i in range(args.events):
+            posted = time.perf_counter()
+            response = await client.post("/offres/", json={"titre": f"Flux {i}", "type_offre": "denrees", "quantite": 1})
+            # L'événement peut arriver avant la réponse : réceptions horodatées par identifiant
+            offre_id = response.json()["id"]
+            await asyncio.wait_for(all_received[offre_id].wait(), timeout=60)
+            latencies.extend(at - posted for at in received[offre_id])
+            fanout.append(max(received[offre_id]) - posted)
+
+    for ws in connections:
+        await ws.close()
+    await asyncio.gather(*readers, return_exceptions=True)
+
+    per_subscriber_kb = (connected - baseline) * 1024 / args.subscribers
+    print(f"{args.subscribers} abonnés connectés en {connect_seconds:.1f} s")
+    print(f"RSS serveur : {baseline:.0f} Mo à vide, {connected:.0f} Mo connectés ({per_subscriber_kb:.1f} Ko/abonné)")
+    print(
+        f"diffusion ({args.events} événements) : p50 {percentile(latencies, 0.5) * 1000:.0f} ms, "
+        f"p99 {percentile(latencies, 0.99) * 1000:.0f} ms, dernier abonné {max(fanout) * 1000:.0f} ms"
+    )
+    return 0 if len(latencies) == args.events * args.subscribers else 1
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--subscribers", type=int, default=10_000)
+    parser.add_argument("--events", type=int, default=20)
+    parser.add_argument("--connect-concurrency", type=int, default=200)
+    parser.add_argument("--ws", choices=["websockets", "websockets-sansio"], default="websockets-sansio")
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+
+    # Chaque connexion consomme un descripteur de chaque côté
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (min(hard, max(soft, args.subscribers + 1024)), hard))
+
+    token = seed()
+    env = dict(os.environ, EVENTS_MAX_SUBSCRIBERS=str(args.subscribers), EXPIRATION_SWEEP_INTERVAL="0")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.port), "--log-level", "warning",
+         "--backlog", "4096", "--ws", args.ws],
+        env=env,
+    )
+    try:
+        sys.exit(asyncio.run(run(args, token, server.pid)))
+    finally:
+        server.terminate()
+        server.wait()
+
+if __name__ == "__main__":
+    main()
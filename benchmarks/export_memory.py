@@ -0,0 +1,119 @@
+"""Export en flux de toute la table des offres : débit et mémoire (RSS) du processus.
+
+L'application est appelée directement en ASGI et le corps consommé au fil de l'eau
+(httpx.ASGITransport garderait toute la réponse en mémoire). Code de sortie 1 si
+la mémoire résidente augmente de plus de --max-growth-mb pendant l'export.
+
+    DATABASE_URL=sqlite:///./export.db SECRET_KEY=bench \\
+    python -m benchmarks.export_memory --rows 5000000 --format ndjson
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+from sqlalchemy import func, insert, select
+
+from app import models
+from app.core.config import settings
+from app.database import Base, SessionLocal, engine, async_engine
+from app.main import app
+from app.security import create_access_token
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+def rss_mb() -> float:
+    """Mémoire résidente actuelle (Linux), 0 si indisponible"""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * PAGE_SIZE / 2 ** 20
+    except OSError:
+        return 0.0
+
+def seed(rows: int, chunk: int = 50000) -> str:
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        admin = db.scalar(select(models.Utilisateur).where(models.Utilisateur.email == "bench-export@example.com"))
+        if admin is None:
+            admin = models.Utilisateur(email="bench-export@example.com", password_hash="x", role="admin")
+            db.add(admin)
+            db.commit()
+        existing = db.scalar(select(func.count()).select_from(models.Offre))
+        for start in range(existing, rows, chunk):
+            db.execute(insert(models.Offre), [
+                {"titre": f"Panier {i}", "description": "Fruits et légumes", "type_offre": "denrees",
+                 "quantite": 1 + i % 5, "localisation": "Dakar", "is_disponible": True, "createur_id": admin.id}
+                for i in range(start, min(start + chunk, rows))
+            ])
+            db.commit()
+        return create_access_token({"sub": str(admin.id), "role": "admin"})
+
+async def export(token: str, query: str, on_chunk) -> int:
+    """Appelle GET /admin/export/offres ; renvoie le statut HTTP"""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": "/admin/export/offres", "raw_path": b"/admin/export/offres", "root_path": "",
+        "query_string": query.encode(), "headers": [(b"authorization", f"Bearer {token}".encode())],
+        "server": ("bench", 80), "client": ("127.0.0.1", 1),
+    }
+    done = asyncio.Event()
+    requested = False
+    status = {}
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status["code"] = message["status"]
+        elif message["type"] == "http.response.body":
+            on_chunk(message.get("body", b""))
+
+    try:
+        await app(scope, receive, send)
+    finally:
+        done.set()
+    return status["code"]
+
+async def main(args) -> int:
+    settings.EXPORT_BATCH_SIZE = args.batch
+    token = seed(args.rows)
+    # Préchauffage (imports, pool, caches) sur un export vide
+    assert await export(token, "is_disponible=false", lambda body: None) == 200
+
+    baseline = peak = rss_mb()
+    received = {"bytes": 0, "lines": 0, "chunks": 0}
+
+    def on_chunk(body: bytes):
+        nonlocal peak
+        received["bytes"] += len(body)
+        received["lines"] += body.count(b"\n")
+        received["chunks"] += 1
+        if received["chunks"] % 50 == 0:
+            peak = max(peak, rss_mb())
+
+    started = time.perf_counter()
+    status = await export(token, f"format={args.format}", on_chunk)
+    elapsed = time.perf_counter() - started
+    peak = max(peak, rss_mb())
+    await async_engine.dispose()
+
+    rows = received["lines"] - (args.format == "csv")
+    growth = peak - baseline
+    print(f"statut {status}, {rows} lignes, {received['bytes'] / 2 ** 20:.0f} Mo en {elapsed:.1f} s ({rows / elapsed:,.0f} lignes/s)")
+    print(f"RSS : {baseline:.0f} Mo avant, pic {peak:.0f} Mo (+{growth:.1f} Mo, plafond +{args.max_growth_mb} Mo)")
+    return 0 if status == 200 and rows == args.rows and growth <= args.max_growth_mb else 1
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=5_000_000)
+    parser.add_argument("--format", choices=["ndjson", "csv"], default="ndjson")
+    parser.add_argument("--batch", type=int, default=1000)
+    parser.add_argument("--max-growth-mb", type=float, default=64.0)
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,49 @@
+"""Débit de /auth/login (logins/s et logins/s par cœur) au coût bcrypt configuré.
+
+    DATABASE_URL=sqlite:///./bench.db SECRET_KEY=bench BCRYPT_ROUNDS=12 \\
+    python -m benchmarks.login_throughput --logins 200 --concurrency 32
+"""
+import argparse
+import asyncio
+import os
+import time
+
+import httpx
+
+from app.core.config import settings
+from app.database import Base, engine, async_engine
+from app.main import app
+from app.security import password_hasher
+
+async def main(args):
+    Base.metadata.create_all(bind=engine)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        credentials = {"email": "bench-login@example.com", "mot_de_passe": "secret123"}
+        await client.post("/auth/register", json={**credentials, "role": "beneficiaire"})
+
+        statuses = []
+        queue = asyncio.Queue()
+        for _ in range(args.logins):
+            queue.put_nowait(None)
+
+        async def worker():
+            while not queue.empty():
+                queue.get_nowait()
+                statuses.append((await client.post("/auth/login", json=credentials)).status_code)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+    await async_engine.dispose()
+
+    ok = statuses.count(200)
+    cores = min(password_hasher.workers, os.cpu_count() or 1)
+    print(f"bcrypt rounds={settings.BCRYPT_ROUNDS}, {password_hasher.workers} threads, {cores} cœur(s)")
+    print(f"{ok / elapsed:8.1f} logins/s  ({ok / elapsed / cores:.1f} par cœur, {statuses.count(503)} refus 503)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    asyncio.run(main(parser.parse_args()))
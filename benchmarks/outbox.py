@@ -0,0 +1,92 @@
+"""Débit d'envoi des emails (messages/s) : boîte d'envoi + pool SMTP vs une connexion par message.
+
+Serveur SMTP local (aiosmtpd) ; --setup-ms simule le coût d'ouverture d'une
+session réelle (TCP distant, STARTTLS, AUTH), payé à chaque EHLO.
+
+    DATABASE_URL=sqlite:///./bench.db SECRET_KEY=bench \\
+    python -m benchmarks.outbox --messages 2000 --pool-size 4 --setup-ms 50
+"""
+import argparse
+import asyncio
+import socket
+import time
+
+from aiosmtpd.controller import Controller
+from sqlalchemy import delete, insert
+
+from app import models
+from app.core.config import settings
+from app.database import Base, SessionLocal, engine, async_engine
+from app.utils.email_utils import SMTPPool, send_email
+from app.workers.outbox import drain_outbox
+
+class Sink:
+    def __init__(self, setup_seconds: float):
+        self.setup_seconds = setup_seconds
+        self.received = 0
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        await asyncio.sleep(self.setup_seconds)
+        session.host_name = hostname
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received += 1
+        return "250 OK"
+
+def seed(count: int):
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        db.execute(delete(models.EmailSortant))
+        db.execute(insert(models.EmailSortant), [
+            {"destinataire": f"donateur{i}@example.com", "sujet": "Votre offre a été réservée",
+             "corps": f"Votre offre « Panier {i} » a été réservée par b{i}@example.com."}
+            for i in range(count)
+        ])
+        db.commit()
+
+async def per_message(count: int, concurrency: int):
+    # Comportement de send_email : connexion, EHLO et QUIT pour chaque message
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with semaphore:
+            await asyncio.to_thread(send_email, f"donateur{i}@example.com", "Votre offre a été réservée", "...")
+    await asyncio.gather(*(one(i) for i in range(count)))
+
+async def main(args):
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    sink = Sink(args.setup_ms / 1000)
+    controller = Controller(sink, hostname="127.0.0.1", port=port)
+    controller.start()
+    settings.SMTP_HOST, settings.SMTP_PORT, settings.SMTP_STARTTLS = "127.0.0.1", port, False
+    settings.SMTP_FROM, settings.SMTP_POOL_SIZE = "noreply@denrees.test", args.pool_size
+    try:
+        started = time.perf_counter()
+        await per_message(args.baseline_messages, args.pool_size)
+        baseline = args.baseline_messages / (time.perf_counter() - started)
+
+        seed(args.messages)
+        pool = SMTPPool.from_settings()
+        started = time.perf_counter()
+        totals = await drain_outbox(pool)
+        elapsed = time.perf_counter() - started
+        await pool.close()
+    finally:
+        controller.stop()
+        await async_engine.dispose()
+
+    print(f"{args.pool_size} connexion(s), ouverture de session {args.setup_ms:.0f} ms")
+    print(f"  une connexion par message : {baseline:8.1f} messages/s")
+    print(f"  boîte d'envoi + pool      : {totals['envoye'] / elapsed:8.1f} messages/s  "
+          f"({totals['envoye']} envoyés, {pool.opened} session(s) ouvertes)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--baseline-messages", type=int, default=200)
+    parser.add_argument("--pool-size", type=int, default=4)
+    parser.add_argument("--setup-ms", type=float, default=0.0)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,71 @@
+"""Surcoût par requête de la limitation de débit et du contrôle d'admission (µs).
+
+Appelle AdmissionMiddleware autour d'une application ASGI vide, directement
+(sans serveur ni client HTTP), et le compare à l'application seule. Code de
+sortie 1 si un scénario dépasse --max-us.
+
+    DATABASE_URL=sqlite:///./bench.db SECRET_KEY=bench \\
+    python -m benchmarks.rate_limit_overhead --requests 200000
+"""
+import argparse
+import asyncio
+import sys
+import time
+
+from app.security import create_access_token
+from app.utils.rate_limit import AdmissionMiddleware, Budget, ConcurrencyLimiter, MemoryStore, RateLimiter
+
+async def empty_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+async def send(message):
+    pass
+
+def scope_for(path: str, client_ip: str, token: str = None) -> dict:
+    headers = [(b"host", b"bench"), (b"accept", b"application/json")]
+    if token:
+        headers.append((b"authorization", f"Bearer {token}".encode()))
+    return {"type": "http", "method": "GET", "path": path, "headers": headers, "client": (client_ip, 1)}
+
+async def per_request_us(app, scopes, requests: int) -> float:
+    started = time.perf_counter()
+    for i in range(requests):
+        await app(scopes[i % len(scopes)], receive, send)
+    return (time.perf_counter() - started) / requests * 1e6
+
+async def main(args) -> int:
+    def limiter():
+        # Budgets assez larges pour que toutes les requêtes passent : on mesure le chemin nominal
+        routes = {"POST /auth/login": Budget.parse("login", "10/60"), "GET /admin/export/*": Budget.parse("export", "5/60")}
+        return RateLimiter(MemoryStore(), Budget.parse("*", f"{args.requests}/1"), routes)
+
+    tokens = [create_access_token({"sub": str(i), "role": "beneficiaire"}) for i in range(args.clients)]
+    ips = [f"10.0.{i // 256}.{i % 256}" for i in range(args.clients)]
+    scenarios = {
+        "adresse IP": ([scope_for("/offres/", ip) for ip in ips], ConcurrencyLimiter(0, 0)),
+        "token (utilisateur)": ([scope_for("/offres/", ip, token) for ip, token in zip(ips, tokens)], ConcurrencyLimiter(0, 0)),
+        "token + admission": ([scope_for("/offres/", ip, token) for ip, token in zip(ips, tokens)], ConcurrencyLimiter(64, 0.5)),
+    }
+
+    baseline = await per_request_us(empty_app, scenarios["adresse IP"][0], args.requests)
+    print(f"{'application seule':>20} : {baseline:6.2f} µs/requête")
+    worst = 0.0
+    for name, (scopes, concurrency) in scenarios.items():
+        app = AdmissionMiddleware(empty_app, limiter=limiter(), concurrency=concurrency)
+        await per_request_us(app, scopes, len(scopes))  # préchauffage : seaux et tokens en cache
+        overhead = await per_request_us(app, scopes, args.requests) - baseline
+        worst = max(worst, overhead)
+        print(f"{name:>20} : +{overhead:5.2f} µs/requête")
+    print(f"surcoût maximal {worst:.2f} µs (plafond {args.max_us} µs)")
+    return 0 if worst <= args.max_us else 1
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200_000)
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--max-us", type=float, default=50.0)
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,73 @@
+"""Surcoût du profilage SQL par requête : désactivé, échantillonné (1 %) et systématique.
+
+Requêtes séquentielles par httpx.ASGITransport sur quelques routes qui touchent
+la base (cache de réponses coupé) ; compare le temps moyen par requête de
+chaque mode à celui du profilage désactivé.
+
+    DATABASE_URL=sqlite:///./bench.db SECRET_KEY=bench \\
+    python -m benchmarks.sql_profiling --requests 3000
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+from sqlalchemy import select
+
+from app import models
+from app.database import Base, SessionLocal, engine, async_engine
+from app.main import app
+from app.security import create_access_token
+from app.utils.profiling import sql_profiler
+from app.utils.response_cache import response_cache
+
+MODES = {"désactivé": (False, 1.0), "échantillonné 1 %": (True, 0.01), "systématique": (True, 1.0)}
+
+def seed(count: int = 200):
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        user = db.scalar(select(models.Utilisateur).where(models.Utilisateur.email == "bench-profil@example.com"))
+        if user is None:
+            user = models.Utilisateur(email="bench-profil@example.com", password_hash="x", role="donateur")
+            db.add(user)
+            db.flush()
+            db.add_all(models.Offre(titre=f"Offre {i}", type_offre="denrees", quantite=1, createur_id=user.id) for i in range(count))
+            db.commit()
+        offre_id = db.scalar(select(models.Offre.id).limit(1))
+        return {"Authorization": f"Bearer {create_access_token({'sub': str(user.id), 'role': 'donateur'})}"}, offre_id
+
+async def per_request_us(client, urls, headers, requests: int) -> float:
+    started = time.perf_counter()
+    for i in range(requests):
+        response = await client.get(urls[i % len(urls)], headers=headers)
+        assert response.status_code == 200, response.text
+    return (time.perf_counter() - started) / requests * 1e6
+
+async def main(args):
+    headers, offre_id = seed()
+    response_cache.enabled = False
+    sql_profiler.slow_seconds = float("inf")  # on mesure la collecte, pas l'écriture des journaux
+    urls = ["/offres/?limit=20", f"/offres/{offre_id}", "/transactions/mes-transactions"]
+    await async_engine.dispose()
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            await per_request_us(client, urls, headers, 200)  # échauffement
+            results = {}
+            # Modes alternés sur plusieurs tours : le bruit se répartit sur tous
+            for _ in range(args.rounds):
+                for mode, (enabled, rate) in MODES.items():
+                    sql_profiler.enabled, sql_profiler.sample_rate = enabled, rate
+                    results.setdefault(mode, []).append(await per_request_us(client, urls, headers, args.requests // args.rounds))
+    finally:
+        await async_engine.dispose()
+
+    baseline = min(results["désactivé"])
+    for mode, timings in results.items():
+        best = min(timings)
+        print(f"{mode:>18} : {best:7.1f} µs/requête ({(best - baseline) / baseline:+.1%})")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--rounds", type=int, default=5)
+    asyncio.run(main(parser.parse_args()))
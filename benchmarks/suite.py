@@ -0,0 +1,325 @@
+"""Suite de charge reproductible : charge mixte, latences par route et comparaison à une référence.
+
+Remplit une base vide (ou vidée avec --reset) d'un volume réaliste
+d'utilisateurs, d'offres et de transactions, puis envoie --requests scénarios
+tirés au hasard (graine fixe) depuis --concurrency clients simultanés, en ASGI
+dans le processus (httpx.ASGITransport) :
+
+- consultation (anonyme) : liste des offres, détail, recherche ;
+- réservation (bénéficiaire) : réserver une offre, puis annuler une fois sur deux ;
+- compte : utilisateur courant, mes transactions ;
+- administration : tableau de bord, listes des offres et des transactions.
+
+Écrit p50/p95/p99 et débit par route dans --output (JSON). Avec --baseline,
+code de sortie 1 si une route régresse au-delà de --threshold par rapport à la
+référence, ou si une requête échoue (5xx). --save-baseline enregistre le résultat
+comme nouvelle référence. --repeat relance la charge sur une base remplie à neuf
+et garde la médiane des passages, moins sensible au bruit. Les comparaisons
+n'ont de sens que sur la même machine et la même base.
+
+    DATABASE_URL=sqlite:///./suite.db SECRET_KEY=bench \\
+    python -m benchmarks.suite --reset --repeat 3 --save-baseline benchmarks/baseline.json
+    python -m benchmarks.suite --reset --repeat 3 --baseline benchmarks/baseline.json --output resultats.json
+"""
+import argparse
+import asyncio
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import httpx
+from sqlalchemy import func, insert, select, update
+
+from app import models
+from app.database import Base, SessionLocal, async_engine, engine
+from app.main import app
+from app.routes.auth import user_cache
+from app.security import create_access_token
+from app.utils.pagination import count_cache
+from app.utils.response_cache import response_cache
+from app.utils.search import terms_of
+from app.utils.stats import dashboard_stats
+
+MOTS = ["riz", "pain", "lait", "tomates", "oignons", "mangues", "poisson", "mil", "haricots", "bananes",
+        "couscous", "yaourt", "huile", "sucre", "farine", "oeufs", "carottes", "pommes", "manioc", "arachides"]
+VILLES = ["Dakar", "Thiès", "Saint-Louis", "Ziguinchor", "Kaolack", "Touba"]
+
+class Data:
+    """Identifiants et tokens de la base remplie"""
+
+    def __init__(self, beneficiaires: List[str], admins: List[str], offres: List[int]):
+        self.beneficiaires = beneficiaires
+        self.admins = admins
+        self.offres = offres
+
+def seed(args) -> Data:
+    """Remplit la base de façon déterministe (graine --seed) ; refuse une base non vide sans --reset"""
+    rng = random.Random(args.seed)
+    if args.reset:
+        Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        if db.scalar(select(func.count()).select_from(models.Utilisateur)):
+            sys.exit("Base non vide : relancer avec --reset (toutes les tables sont vidées)")
+        nb_admins = max(1, args.users // 100)
+        nb_donateurs = max(1, args.users // 10)
+        roles = ["admin"] * nb_admins + ["donateur"] * nb_donateurs + ["beneficiaire"] * (args.users - nb_admins - nb_donateurs)
+        user_ids = db.scalars(insert(models.Utilisateur).returning(models.Utilisateur.id, sort_by_parameter_order=True), [
+            {"nom": f"Utilisateur {i}", "email": f"suite-{i}@example.com", "password_hash": "x", "role": role}
+            for i, role in enumerate(roles)
+        ]).all()
+        by_role = defaultdict(list)
+        for user_id, role in zip(user_ids, roles):
+            by_role[role].append(user_id)
+
+        offres = []
+        for i in range(args.offres):
+            titre = f"{rng.choice(MOTS).capitalize()} et {rng.choice(MOTS)}"
+            offres.append({
+                "titre": titre, "description": f"{rng.choice(MOTS)} frais, {rng.choice(MOTS)}", "type_offre": rng.choice(["denrees", "plats"]),
+                "quantite": rng.randint(1, 20), "localisation": rng.choice(VILLES), "is_disponible": True,
+                "createur_id": rng.choice(by_role["donateur"]),
+            })
+        offre_ids = []
+        for start in range(0, len(offres), 5000):
+            chunk = offres[start:start + 5000]
+            ids = db.scalars(insert(models.Offre).returning(models.Offre.id, sort_by_parameter_order=True), chunk).all()
+            db.execute(insert(models.OffreTerme), [
+                {"terme": terme, "offre_id": offre_id}
+                for offre_id, offre in zip(ids, chunk) for terme in terms_of(offre["titre"], offre["description"])
+            ])
+            offre_ids.extend(ids)
+
+        # Historique : offres entières déjà récupérées (épuisées, hors de la liste publique) ou annulées
+        historique = rng.sample(offre_ids, min(args.transactions, len(offre_ids) // 2))
+        quantites = {offre_id: offre["quantite"] for offre_id, offre in zip(offre_ids, offres)}
+        transactions = [
+            {"offre_id": offre_id, "beneficiaire_id": rng.choice(by_role["beneficiaire"]), "statut": rng.choice(["recupere", "annule"]),
+             "quantite": quantites[offre_id]}
+            for offre_id in historique
+        ]
+        for start in range(0, len(transactions), 5000):
+            db.execute(insert(models.Transaction), transactions[start:start + 5000])
+        recuperees = [t["offre_id"] for t in transactions if t["statut"] == "recupere"]
+        for start in range(0, len(recuperees), 5000):
+            db.execute(update(models.Offre).where(models.Offre.id.in_(recuperees[start:start + 5000])).values(is_disponible=False, quantite_restante=0))
+        db.commit()
+
+    for cache in (user_cache, count_cache, response_cache):
+        cache.clear()
+    dashboard_stats.invalidate()
+    token = lambda role, user_id: create_access_token({"sub": str(user_id), "role": role})
+    disponibles = sorted(set(offre_ids) - set(recuperees))
+    return Data(
+        [token("beneficiaire", i) for i in by_role["beneficiaire"]], [token("admin", i) for i in by_role["admin"]], disponibles,
+    )
+
+class Recorder:
+    """Latences (s), statuts et première erreur par route"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+        self.failures: Dict[str, str] = {}
+        self.elapsed = 0.0  # durée de la charge, échauffement exclu
+
+    async def request(self, client: httpx.AsyncClient, route: str, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+            status = response.status_code
+        except Exception as error:
+            # Exception de l'application (remontée par ASGITransport) ou du transport : comptée en erreur
+            response, status = None, 0
+            self.failures.setdefault(route, f"{type(error).__name__}: {error}".splitlines()[0])
+        self.latencies[route].append(time.perf_counter() - started)
+        self.statuses[route][status] += 1
+        return response
+
+def bearer(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+async def browse(client, rec: Recorder, rng: random.Random, data: Data):
+    await rec.request(client, "GET /offres/", "GET", "/offres/", params={"limit": 20, "skip": 20 * rng.randrange(10)})
+    await rec.request(client, "GET /offres/{offre_id}", "GET", f"/offres/{rng.choice(data.offres)}")
+    if rng.random() < 0.5:
+        await rec.request(client, "GET /offres/recherche", "GET", "/offres/recherche", params={"q": rng.choice(MOTS)})
+
+async def reserve(client, rec: Recorder, rng: random.Random, data: Data):
+    headers = bearer(rng.choice(data.beneficiaires))
+    response = await rec.request(client, "POST /transactions/reserver", "POST", "/transactions/reserver",
+                                 json={"id_offre": rng.choice(data.offres)}, headers=headers)
+    if response is not None and response.status_code == 201 and rng.random() < 0.5:
+        await rec.request(client, "PUT /transactions/{transaction_id}/annuler", "PUT",
+                          f"/transactions/{response.json()['id']}/annuler", headers=headers)
+
+async def account(client, rec: Recorder, rng: random.Random, data: Data):
+    headers = bearer(rng.choice(data.beneficiaires))
+    await rec.request(client, "GET /auth/me", "GET", "/auth/me", headers=headers)
+    await rec.request(client, "GET /transactions/mes-transactions", "GET", "/transactions/mes-transactions", headers=headers)
+
+async def administer(client, rec: Recorder, rng: random.Random, data: Data):
+    headers = bearer(rng.choice(data.admins))
+    await rec.request(client, "GET /admin/dashboard", "GET", "/admin/dashboard", headers=headers)
+    if rng.random() < 0.5:
+        await rec.request(client, "GET /admin/offres", "GET", "/admin/offres", params={"limit": 50}, headers=headers)
+    else:
+        await rec.request(client, "GET /admin/transactions", "GET", "/admin/transactions", params={"limit": 50}, headers=headers)
+
+# Poids des scénarios dans la charge mixte
+SCENARIOS = [(browse, 60), (reserve, 20), (account, 12), (administer, 8)]
+
+async def drive(args, data: Data) -> Recorder:
+    rec = Recorder()
+    remaining = args.requests
+    scenarios, weights = zip(*SCENARIOS)
+
+    async def worker(client, rng):
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            scenario = rng.choices(scenarios, weights)[0]
+            await scenario(client, rec, rng, data)
+
+    await async_engine.dispose()
+    limits = httpx.Limits(max_connections=args.concurrency)
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://suite", limits=limits, timeout=60) as client:
+            warmup = Recorder()
+            for scenario, _ in SCENARIOS:
+                await scenario(client, warmup, random.Random(args.seed), data)
+            started = time.perf_counter()
+            await asyncio.gather(*(worker(client, random.Random(args.seed * 1000 + i)) for i in range(args.concurrency)))
+            rec.elapsed = time.perf_counter() - started
+    finally:
+        await async_engine.dispose()
+    return rec
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+def summarize(rec: Recorder, args) -> dict:
+    endpoints = {}
+    for route in sorted(rec.latencies):
+        latencies = sorted(rec.latencies[route])
+        statuses = rec.statuses[route]
+        endpoints[route] = {
+            "count": len(latencies),
+            "errors": sum(n for status, n in statuses.items() if status == 0 or status >= 500),
+            **({"first_error": rec.failures[route]} if route in rec.failures else {}),
+            "rejected": sum(n for status, n in statuses.items() if 400 <= status < 500),
+            "rps": round(len(latencies) / rec.elapsed, 2),
+            "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+            "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        }
+    total = sum(e["count"] for e in endpoints.values())
+    return {
+        "meta": {
+            "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "database": engine.dialect.name,
+            "python": platform.python_version(),
+            "seed": args.seed, "concurrency": args.concurrency, "requests": args.requests, "repeat": args.repeat,
+            "users": args.users, "offres": args.offres, "transactions": args.transactions,
+        },
+        "total": {"count": total, "seconds": round(rec.elapsed, 3), "rps": round(total / rec.elapsed, 2)},
+        "endpoints": endpoints,
+    }
+
+def median_of(results: List[dict]) -> dict:
+    """Fusionne plusieurs passages : médiane des latences et débits, somme des comptes"""
+    if len(results) == 1:
+        return results[0]
+    endpoints = {}
+    for route in sorted({route for result in results for route in result["endpoints"]}):
+        runs = [result["endpoints"][route] for result in results if route in result["endpoints"]]
+        endpoints[route] = {
+            key: sum(run[key] for run in runs) if key in ("count", "errors", "rejected") else round(statistics.median(run[key] for run in runs), 3)
+            for key in ("count", "errors", "rejected", "rps", "p50_ms", "p95_ms", "p99_ms")
+        }
+        failures = [run["first_error"] for run in runs if "first_error" in run]
+        if failures:
+            endpoints[route]["first_error"] = failures[0]
+    total = {key: round(statistics.median(result["total"][key] for result in results), 3) for key in ("seconds", "rps")}
+    total["count"] = sum(result["total"]["count"] for result in results)
+    return {"meta": results[0]["meta"], "total": total, "endpoints": endpoints}
+
+def errors(result: dict) -> List[str]:
+    return [
+        f"{route} : {e['errors']} erreur(s) {e.get('first_error', '')}".rstrip()
+        for route, e in result["endpoints"].items() if e["errors"]
+    ]
+
+def compare(result: dict, baseline: dict, threshold: float, min_ms: float = 5.0, min_count: int = 20) -> List[str]:
+    """Régressions de `result` par rapport à `baseline` (liste vide si aucune).
+
+    Une latence régresse si elle dépasse la référence de plus de `threshold`
+    (0.2 = +20 %) et d'au moins `min_ms` (bruit des routes très rapides) ; le
+    débit total, s'il baisse de plus de `threshold`. Routes trop peu appelées ignorées.
+    """
+    regressions = errors(result)
+    for route, current in result["endpoints"].items():
+        reference = baseline["endpoints"].get(route)
+        if reference is None or min(current["count"], reference["count"]) < min_count:
+            continue
+        for key in ("p50_ms", "p95_ms"):
+            limit = max(reference[key] * (1 + threshold), reference[key] + min_ms)
+            if current[key] > limit:
+                regressions.append(f"{route} : {key} {current[key]:.2f} ms > {reference[key]:.2f} ms (+{threshold:.0%})")
+    if result["total"]["rps"] < baseline["total"]["rps"] * (1 - threshold):
+        regressions.append(f"débit total {result['total']['rps']:.0f} req/s < {baseline['total']['rps']:.0f} req/s (-{threshold:.0%})")
+    return regressions
+
+def print_table(result: dict):
+    print(f"{'route':<46} {'n':>6} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8}  4xx  5xx")
+    for route, e in result["endpoints"].items():
+        print(f"{route:<46} {e['count']:>6} {e['rps']:>8.1f} {e['p50_ms']:>8.2f} {e['p95_ms']:>8.2f} {e['p99_ms']:>8.2f} "
+              f"{e['rejected']:>4} {e['errors']:>4}")
+    total = result["total"]
+    print(f"total : {total['count']} requêtes en {total['seconds']:.1f} s ({total['rps']:.0f} req/s)")
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--offres", type=int, default=20000)
+    parser.add_argument("--transactions", type=int, default=5000)
+    parser.add_argument("--requests", type=int, default=3000, help="scénarios exécutés (1 à 3 requêtes chacun)")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--reset", action="store_true", help="vide la base avant de la remplir")
+    parser.add_argument("--output", help="fichier JSON du résultat")
+    parser.add_argument("--baseline", help="référence JSON à comparer")
+    parser.add_argument("--save-baseline", help="enregistre le résultat comme référence")
+    parser.add_argument("--repeat", type=int, default=1, help="passages (base remplie à neuf) dont on garde la médiane")
+    parser.add_argument("--threshold", type=float, default=0.25)
+    parser.add_argument("--min-ms", type=float, default=5.0, help="écart de latence toujours toléré")
+    args = parser.parse_args(argv)
+
+    results = []
+    for _ in range(args.repeat):
+        data = seed(args)
+        results.append(summarize(asyncio.run(drive(args, data)), args))
+        args.reset = True  # passage suivant : même point de départ
+    result = median_of(results)
+    print_table(result)
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, "w") as output:
+            json.dump(result, output, indent=2, ensure_ascii=False)
+
+    if args.baseline:
+        with open(args.baseline) as reference:
+            regressions = compare(result, json.load(reference), args.threshold, args.min_ms)
+    else:
+        regressions = errors(result)
+    for regression in regressions:
+        print("RÉGRESSION", regression)
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,67 @@
+"""Schéma initial (tel que créé par Base.metadata.create_all)
+
+Une base créée avant les migrations se marque avec `alembic stamp 0001`.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+role_enum = sa.Enum("beneficiaire", "donateur", "partenaire", "admin", name="roleenum")
+type_offre_enum = sa.Enum("denrees", "plats", "credits", name="typeoffreenum")
+statut_enum = sa.Enum("reserve", "recupere", "annule", name="statuttransactionenum")
+
+def upgrade():
+    op.create_table(
+        "utilisateurs",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("nom", sa.String(100), nullable=True),
+        sa.Column("email", sa.String(120), nullable=False),
+        sa.Column("password_hash", sa.String(255), nullable=False),
+        sa.Column("role", role_enum, nullable=False),
+        sa.Column("is_active", sa.Boolean(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    )
+    op.create_index("ix_utilisateurs_id", "utilisateurs", ["id"])
+    op.create_index("ix_utilisateurs_email", "utilisateurs", ["email"], unique=True)
+
+    op.create_table(
+        "offres",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("titre", sa.String(200), nullable=False),
+        sa.Column("description", sa.Text(), nullable=True),
+        sa.Column("type_offre", type_offre_enum, nullable=False),
+        sa.Column("quantite", sa.Integer(), nullable=False),
+        sa.Column("localisation", sa.String(255), nullable=True),
+        sa.Column("date_expiration", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("is_disponible", sa.Boolean(), nullable=True),
+        sa.Column("createur_id", sa.Integer(), sa.ForeignKey("utilisateurs.id"), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    )
+    op.create_index("ix_offres_id", "offres", ["id"])
+
+    op.create_table(
+        "transactions",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("offre_id", sa.Integer(), sa.ForeignKey("offres.id"), nullable=False),
+        sa.Column("beneficiaire_id", sa.Integer(), sa.ForeignKey("utilisateurs.id"), nullable=False),
+        sa.Column("statut", statut_enum, nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    )
+    op.create_index("ix_transactions_id", "transactions", ["id"])
+
+def downgrade():
+    op.drop_table("transactions")
+    op.drop_table("offres")
+    op.drop_table("utilisateurs")
+    bind = op.get_bind()
+    for enum in (statut_enum, type_offre_enum, role_enum):
+        enum.drop(bind, checkfirst=True)
@@ -0,0 +1,51 @@
+"""Index des listes et filtres chauds (pagination par curseur, filtres admin)
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+def create_index(name, table, columns, **kwargs):
+    # CONCURRENTLY sous PostgreSQL : pas de verrou d'écriture sur les grosses tables
+    op.create_index(name, table, columns, postgresql_concurrently=True, **kwargs)
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        create_index("ix_utilisateurs_created_at_id", "utilisateurs", ["created_at", "id"])
+        create_index("ix_utilisateurs_role_is_active", "utilisateurs", ["role", "is_active"])
+
+        create_index("ix_offres_created_at_id", "offres", ["created_at", "id"])
+        create_index(
+            "ix_offres_disponibles_created_at_id", "offres", ["created_at", "id"],
+            postgresql_where=sa.text("is_disponible"),
+            sqlite_where=sa.text("is_disponible = 1"),
+        )
+        create_index("ix_offres_is_disponible_created_at_id", "offres", ["is_disponible", "created_at", "id"])
+        create_index("ix_offres_type_offre_created_at_id", "offres", ["type_offre", "created_at", "id"])
+        create_index("ix_offres_createur_id", "offres", ["createur_id"])
+
+        create_index("ix_transactions_created_at_id", "transactions", ["created_at", "id"])
+        create_index("ix_transactions_offre_id_statut", "transactions", ["offre_id", "statut"])
+        create_index("ix_transactions_beneficiaire_id_created_at", "transactions", ["beneficiaire_id", "created_at"])
+
+def downgrade():
+    for table, name in (
+        ("transactions", "ix_transactions_beneficiaire_id_created_at"),
+        ("transactions", "ix_transactions_offre_id_statut"),
+        ("transactions", "ix_transactions_created_at_id"),
+        ("offres", "ix_offres_createur_id"),
+        ("offres", "ix_offres_type_offre_created_at_id"),
+        ("offres", "ix_offres_is_disponible_created_at_id"),
+        ("offres", "ix_offres_disponibles_created_at_id"),
+        ("offres", "ix_offres_created_at_id"),
+        ("utilisateurs", "ix_utilisateurs_role_is_active"),
+        ("utilisateurs", "ix_utilisateurs_created_at_id"),
+    ):
+        op.drop_index(name, table_name=table)
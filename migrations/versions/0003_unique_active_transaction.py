@@ -0,0 +1,26 @@
+"""Index unique partiel : une seule transaction active par offre
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+ACTIVE = sa.text("statut IN ('reserve', 'recupere')")
+
+def upgrade():
+    # Échoue si des doublons actifs existent déjà : ils doivent être annulés avant migration
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "uq_transactions_offre_active", "transactions", ["offre_id"], unique=True,
+            postgresql_where=ACTIVE, sqlite_where=ACTIVE, postgresql_concurrently=True,
+        )
+
+def downgrade():
+    op.drop_index("uq_transactions_offre_active", table_name="transactions")
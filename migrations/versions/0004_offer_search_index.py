@@ -0,0 +1,77 @@
+"""Recherche d'offres : coordonnées, géohash et index inversé des termes
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+import re
+import unicodedata
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+BATCH = 10000
+
+# Copie figée du découpage de app.utils.search à cette révision : la migration
+# doit produire les mêmes termes quelle que soit la version de l'application
+MAX_TERM_LENGTH = 64
+STOP_WORDS = {"au", "aux", "de", "des", "du", "en", "et", "la", "le", "les", "un", "une", "pour", "avec", "sur"}
+
+def normalize(text):
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+def terms_of(*texts):
+    terms = set()
+    for text in texts:
+        for word in re.findall(r"[a-z0-9]+", normalize(text or "")):
+            if len(word) >= 2 and word not in STOP_WORDS:
+                terms.add(word[:MAX_TERM_LENGTH])
+    return sorted(terms)
+
+def ascii_key(length):
+    return sa.String(length).with_variant(sa.String(length, collation="C"), "postgresql")
+
+def upgrade():
+    op.add_column("offres", sa.Column("latitude", sa.Float(), nullable=True))
+    op.add_column("offres", sa.Column("longitude", sa.Float(), nullable=True))
+    op.add_column("offres", sa.Column("geohash", ascii_key(12), nullable=True))
+    op.create_table(
+        "offre_termes",
+        sa.Column("terme", ascii_key(64), primary_key=True),
+        sa.Column("offre_id", sa.Integer(), sa.ForeignKey("offres.id", ondelete="CASCADE"), primary_key=True),
+    )
+    op.create_index("ix_offre_termes_offre_id", "offre_termes", ["offre_id"])
+
+    # Indexation des offres existantes, par lots
+    bind = op.get_bind()
+    offres = sa.table("offres", sa.column("id"), sa.column("titre"), sa.column("description"))
+    termes = sa.table("offre_termes", sa.column("terme"), sa.column("offre_id"))
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(offres.c.id, offres.c.titre, offres.c.description)
+            .where(offres.c.id > last_id).order_by(offres.c.id).limit(BATCH)
+        ).all()
+        if not rows:
+            break
+        values = [{"terme": t, "offre_id": row.id} for row in rows for t in terms_of(row.titre, row.description)]
+        if values:
+            bind.execute(termes.insert(), values)
+        last_id = rows[-1].id
+
+    with op.get_context().autocommit_block():
+        op.create_index("ix_offres_geohash", "offres", ["geohash"], postgresql_concurrently=True)
+
+def downgrade():
+    op.drop_index("ix_offres_geohash", table_name="offres")
+    op.drop_index("ix_offre_termes_offre_id", table_name="offre_termes")
+    op.drop_table("offre_termes")
+    op.drop_column("offres", "geohash")
+    op.drop_column("offres", "longitude")
+    op.drop_column("offres", "latitude")
@@ -0,0 +1,32 @@
+"""Index partiels du balayeur d'expirations
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_offres_disponibles_date_expiration", "offres", ["date_expiration"],
+            postgresql_where=sa.text("is_disponible"),
+            sqlite_where=sa.text("is_disponible = 1"),
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_transactions_reserve_created_at", "transactions", ["created_at"],
+            postgresql_where=sa.text("statut = 'reserve'"),
+            sqlite_where=sa.text("statut = 'reserve'"),
+            postgresql_concurrently=True,
+        )
+
+def downgrade():
+    op.drop_index("ix_transactions_reserve_created_at", table_name="transactions")
+    op.drop_index("ix_offres_disponibles_date_expiration", table_name="offres")
@@ -0,0 +1,40 @@
+"""Boîte d'envoi des emails transactionnels
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+statut_email_enum = sa.Enum("en_attente", "envoye", "echec", name="statutemailenum")
+
+def upgrade():
+    op.create_table(
+        "emails_sortants",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("destinataire", sa.String(120), nullable=False),
+        sa.Column("sujet", sa.String(255), nullable=False),
+        sa.Column("corps", sa.Text(), nullable=False),
+        sa.Column("statut", statut_email_enum, nullable=False),
+        sa.Column("tentatives", sa.Integer(), nullable=False),
+        sa.Column("prochain_essai", sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+        sa.Column("derniere_erreur", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("envoye_at", sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index(
+        "ix_emails_sortants_en_attente", "emails_sortants", ["prochain_essai", "id"],
+        postgresql_where=sa.text("statut = 'en_attente'"),
+        sqlite_where=sa.text("statut = 'en_attente'"),
+    )
+
+def downgrade():
+    op.drop_index("ix_emails_sortants_en_attente", table_name="emails_sortants")
+    op.drop_table("emails_sortants")
+    statut_email_enum.drop(op.get_bind(), checkfirst=True)
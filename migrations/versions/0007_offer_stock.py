@@ -0,0 +1,56 @@
+"""Stock des offres et réservations partielles
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+ACTIVE = sa.text("statut IN ('reserve', 'recupere')")
+
+def upgrade():
+    op.add_column("offres", sa.Column("quantite_restante", sa.Integer(), nullable=False, server_default="0"))
+    op.add_column("transactions", sa.Column("quantite", sa.Integer(), nullable=False, server_default="1"))
+    # Jusqu'ici une réservation prenait l'offre entière
+    op.execute("""
+        UPDATE transactions SET quantite = (SELECT offres.quantite FROM offres WHERE offres.id = transactions.offre_id)
+    """)
+    op.execute("""
+        UPDATE offres SET quantite_restante = CASE
+            WHEN EXISTS (
+                SELECT 1 FROM transactions
+                WHERE transactions.offre_id = offres.id AND transactions.statut IN ('reserve', 'recupere')
+            ) THEN 0
+            ELSE quantite
+        END
+    """)
+    # Défauts serveur utiles au remplissage seulement : le modèle n'en déclare pas
+    with op.batch_alter_table("offres") as batch:
+        batch.alter_column("quantite_restante", server_default=None)
+    with op.batch_alter_table("transactions") as batch:
+        batch.alter_column("quantite", server_default=None)
+
+    # Plusieurs transactions actives par offre ; une seule par bénéficiaire (déjà garanti par l'API)
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "uq_transactions_offre_beneficiaire", "transactions", ["offre_id", "beneficiaire_id"], unique=True,
+            postgresql_concurrently=True,
+        )
+        op.drop_index("uq_transactions_offre_active", table_name="transactions", postgresql_concurrently=True)
+
+def downgrade():
+    # Échoue si une offre a plusieurs transactions actives : les annuler avant de revenir en arrière
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "uq_transactions_offre_active", "transactions", ["offre_id"], unique=True,
+            postgresql_where=ACTIVE, sqlite_where=ACTIVE, postgresql_concurrently=True,
+        )
+        op.drop_index("uq_transactions_offre_beneficiaire", table_name="transactions", postgresql_concurrently=True)
+    op.drop_column("transactions", "quantite")
+    op.drop_column("offres", "quantite_restante")
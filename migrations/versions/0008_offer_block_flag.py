@@ -0,0 +1,30 @@
+"""Blocage explicite des offres
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column("offres", sa.Column("is_bloquee", sa.Boolean(), nullable=False, server_default=sa.false()))
+    # Hors ligne avec du stock : bloquée par le créateur ou un admin (ou expirée, sans effet).
+    # Une offre épuisée puis bloquée ne se distingue pas d'une offre épuisée : non bloquée.
+    offres = sa.table("offres", sa.column("is_disponible", sa.Boolean()), sa.column("quantite_restante"), sa.column("is_bloquee", sa.Boolean()))
+    op.execute(
+        offres.update()
+        .where(offres.c.is_disponible == sa.false(), offres.c.quantite_restante > 0)
+        .values(is_bloquee=sa.true())
+    )
+    # Défaut serveur utile au remplissage seulement : le modèle n'en déclare pas
+    with op.batch_alter_table("offres") as batch:
+        batch.alter_column("is_bloquee", server_default=None)
+
+def downgrade():
+    op.drop_column("offres", "is_bloquee")
@@ -0,0 +1,62 @@
+import os
+import tempfile
+from contextlib import contextmanager
+
+import pytest
+
+# Base SQLite jetable pour les tests (avant tout import de l'application)
+_tmpdir = tempfile.mkdtemp(prefix="denrees-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmpdir}/test.db")
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+os.environ.setdefault("EXPIRATION_SWEEP_INTERVAL", "0")  # balayeur appelé explicitement par les tests
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")  # limites activées par les tests qui les vérifient
+os.environ.setdefault("MAX_CONCURRENT_REQUESTS", "0")
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from app.database import Base, engine, async_engine
+from app.main import app
+from app.routes.auth import user_cache
+from app.utils.pagination import count_cache
+from app.utils.response_cache import response_cache
+from app.utils.stats import dashboard_stats
+
+@pytest.fixture
+def client():
+    """Client HTTP sur une base vide"""
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    user_cache.clear()
+    count_cache.clear()
+    response_cache.clear()
+    dashboard_stats.invalidate()
+    with TestClient(app) as c:
+        yield c
+
+@pytest.fixture
+def login(client):
+    """Crée un compte et renvoie les en-têtes d'authentification"""
+    def register_and_login(email, role="beneficiaire"):
+        client.post("/auth/register", json={"email": email, "mot_de_passe": "secret123", "role": role})
+        response = client.post("/auth/login", json={"email": email, "mot_de_passe": "secret123"})
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+    return register_and_login
+
+@contextmanager
+def count_queries():
+    """Compte les requêtes SQL émises par les deux moteurs"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    targets = (engine, async_engine.sync_engine)
+    for target in targets:
+        event.listen(target, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        for target in targets:
+            event.remove(target, "before_cursor_execute", before_cursor_execute)
@@ -0,0 +1,68 @@
+import time
+
+from sqlalchemy import delete
+
+from app import models
+from app.core.config import settings
+from app.database import SessionLocal
+from app.utils.cache import TTLCache
+from tests.conftest import count_queries
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set(1, "a")
+    cache.set(2, "b")
+    cache.get(1)
+    cache.set(3, "c")
+    assert cache.get(2) is None
+    assert cache.get(1) == "a" and cache.get(3) == "c"
+
+def test_ttl_cache_expires_entries():
+    cache = TTLCache(maxsize=10, ttl=0.01)
+    cache.set(1, "a")
+    time.sleep(0.02)
+    assert cache.get(1) is None
+
+def test_cached_user_skips_select(client, login):
+    headers = login("beneficiaire@example.com")
+    assert client.get("/auth/me", headers=headers).status_code == 200
+    with count_queries() as statements:
+        response = client.get("/auth/me", headers=headers)
+    assert response.json()["email"] == "beneficiaire@example.com"
+    assert statements == []
+
+def test_admin_changes_invalidate_cache(client, login):
+    admin = login("admin@example.com", "admin")
+    headers = login("beneficiaire@example.com")
+    user_id = client.get("/auth/me", headers=headers).json()["id"]
+
+    client.put(f"/admin/users/{user_id}", json={"role": "donateur"}, headers=admin)
+    assert client.get("/auth/me", headers=headers).json()["role"] == "donateur"
+
+    client.put(f"/admin/users/{user_id}", json={"is_active": False}, headers=admin)
+    assert client.get("/auth/me", headers=headers).status_code == 401
+
+def test_trusted_token_role_skips_user_lookup(client, login, monkeypatch):
+    monkeypatch.setattr(settings, "AUTH_TRUST_TOKEN_ROLE", True)
+    headers = login("beneficiaire@example.com")
+    with count_queries() as statements:
+        response = client.get("/transactions/mes-transactions", headers=headers)
+    assert response.status_code == 200
+    assert len(statements) == 1
+    assert "FROM transactions" in statements[0]
+
+def test_trusted_token_of_deleted_user_gets_401(client, login, monkeypatch):
+    monkeypatch.setattr(settings, "AUTH_TRUST_TOKEN_ROLE", True)
+    admin = login("admin@example.com", "admin")
+    headers = login("beneficiaire@example.com")
+    user_id = client.get("/auth/me", headers=headers).json()["id"]
+
+    # Anonymisé par un admin, puis ligne effacée en base
+    assert client.delete(f"/admin/users/{user_id}", headers=admin).status_code == 200
+    response = client.get("/auth/me", headers=headers)
+    assert response.status_code == 401
+    assert response.json()["detail"] == "Utilisateur non trouvé ou inactif."
+    with SessionLocal() as db:
+        db.execute(delete(models.Utilisateur).where(models.Utilisateur.id == user_id))
+        db.commit()
+    assert client.get("/auth/me", headers=headers).status_code == 401
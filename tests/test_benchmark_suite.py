@@ -0,0 +1,41 @@
+import json
+import os
+import subprocess
+import sys
+
+from benchmarks.suite import compare
+
+def result(p50, p95, rps=100.0, errors=0, count=100):
+    endpoint = {"count": count, "errors": errors, "rejected": 0, "rps": rps, "p50_ms": p50, "p95_ms": p95, "p99_ms": p95}
+    return {"total": {"count": count, "seconds": 1.0, "rps": rps}, "endpoints": {"GET /offres/": endpoint}}
+
+def test_compare_flags_regressions_beyond_threshold():
+    baseline = result(p50=20.0, p95=40.0)
+    assert compare(result(p50=24.0, p95=49.0), baseline, threshold=0.25) == []
+    assert compare(result(p50=26.0, p95=40.0), baseline, threshold=0.25) == ["GET /offres/ : p50_ms 26.00 ms > 20.00 ms (+25%)"]
+    assert compare(result(p50=20.0, p95=40.0, rps=70.0), baseline, threshold=0.25) == ["débit total 70 req/s < 100 req/s (-25%)"]
+    assert compare(result(p50=20.0, p95=40.0, errors=2), baseline, threshold=0.25) == ["GET /offres/ : 2 erreur(s)"]
+
+def test_compare_tolerates_noise_on_fast_or_rare_routes():
+    # +100 % mais sous l'écart minimal ; route trop peu appelée
+    assert compare(result(p50=2.0, p95=4.0), result(p50=1.0, p95=2.0), threshold=0.25, min_ms=5.0) == []
+    assert compare(result(p50=90.0, p95=90.0, count=5), result(p50=10.0, p95=10.0, count=5), threshold=0.25) == []
+
+def test_suite_writes_baseline(tmp_path):
+    env = {**os.environ, "DATABASE_URL": f"sqlite:///{tmp_path}/suite.db", "EXPIRATION_SWEEP_INTERVAL": "0"}
+    baseline = tmp_path / "baseline.json"
+    args = ["--users", "50", "--offres", "300", "--transactions", "50", "--requests", "150", "--concurrency", "4"]
+    run = subprocess.run(
+        [sys.executable, "-m", "benchmarks.suite", *args, "--save-baseline", str(baseline)],
+        env=env, capture_output=True, text=True, timeout=600,
+    )
+    assert run.returncode == 0, run.stdout + run.stderr
+
+    data = json.loads(baseline.read_text())
+    assert data["meta"]["offres"] == 300 and data["total"]["count"] > 150
+    assert {"GET /offres/", "POST /transactions/reserver", "GET /admin/dashboard"} <= set(data["endpoints"])
+    assert all(e["p50_ms"] <= e["p95_ms"] <= e["p99_ms"] for e in data["endpoints"].values())
+
+    # Base non vide sans --reset : refus plutôt que d'écraser des données
+    rerun = subprocess.run([sys.executable, "-m", "benchmarks.suite", *args], env=env, capture_output=True, text=True, timeout=600)
+    assert rerun.returncode == 1 and "--reset" in rerun.stderr
@@ -0,0 +1,107 @@
+import orjson
+
+from app.core.config import settings
+from tests.conftest import count_queries
+
+def offre(i, **champs):
+    return {"titre": f"Panier {i}", "type_offre": "denrees", "quantite": 1, **champs}
+
+def test_bulk_json_array_reports_invalid_items(client, login):
+    partenaire = login("magasin@example.com", role="partenaire")
+    lot = [offre(0), offre(1, quantite=0), offre(2, latitude=14.69, longitude=-17.44), {"titre": "Sans type"}]
+
+    response = client.post("/offres/bulk", json=lot, headers=partenaire)
+
+    assert response.status_code == 201
+    body = response.json()
+    assert body["crees"] == 2 and len(body["ids"]) == 2
+    assert [e["index"] for e in body["erreurs"]] == [1, 3]
+    assert body["erreurs"][0]["detail"][0]["loc"] == ["quantite"]
+    titres = {o["titre"] for o in client.get("/offres/").json()}
+    assert titres == {"Panier 0", "Panier 2"}
+    # Index de recherche et géohash renseignés comme pour POST /offres/
+    assert [o["id"] for o in client.get("/offres/recherche", params={"q": "panier"}).json()] == body["ids"][::-1]
+    assert len(client.get("/offres/recherche", params={"lat": 14.69, "lon": -17.44}).json()) == 1
+
+def test_bulk_ndjson_stream_in_one_transaction(client, login):
+    partenaire = login("magasin@example.com", role="partenaire")
+    lignes = b"\n".join(orjson.dumps(offre(i)) for i in range(300)) + b"\n{pas du json\n\n"
+
+    with count_queries() as statements:
+        response = client.post(
+            "/offres/bulk", content=lignes,
+            headers={**partenaire, "Content-Type": "application/x-ndjson"},
+        )
+
+    body = response.json()
+    assert body["crees"] == 300
+    assert body["ids"] == sorted(body["ids"])
+    assert [e["index"] for e in body["erreurs"]] == [300]
+    # Ni une requête par offre, ni une transaction par offre
+    assert len(statements) < 20
+    stats = client.get("/admin/dashboard", headers=login("admin@example.com", role="admin")).json()
+    assert stats["total_offres"] == 300
+
+def test_bulk_limits_and_permissions(client, login, monkeypatch):
+    monkeypatch.setattr(settings, "OFFRES_BULK_MAX_ITEMS", 2)
+    partenaire = login("magasin@example.com", role="partenaire")
+
+    assert client.post("/offres/bulk", json=[offre(i) for i in range(3)], headers=partenaire).status_code == 413
+    assert client.post("/offres/bulk", json={"titre": "x"}, headers=partenaire).status_code == 400
+    assert client.post("/offres/bulk", json=[], headers=partenaire).status_code == 400
+    beneficiaire = login("b@example.com")
+    assert client.post("/offres/bulk", json=[offre(0)], headers=beneficiaire).status_code == 403
+
+def test_bulk_body_size_is_checked_before_parsing(client, login, monkeypatch):
+    monkeypatch.setattr(settings, "OFFRES_BULK_MAX_BYTES", 200)
+    partenaire = login("magasin@example.com", role="partenaire")
+    ndjson = {**partenaire, "Content-Type": "application/x-ndjson"}
+    lot = [offre(i) for i in range(5)]
+
+    response = client.post("/offres/bulk", json=lot, headers=partenaire)
+    assert response.status_code == 413 and "octets" in response.json()["detail"]
+    # Flux sans Content-Length : arrêté à la réception
+    chunks = (orjson.dumps(item) + b"\n" for item in lot)
+    assert client.post("/offres/bulk", content=chunks, headers=ndjson).status_code == 413
+    assert client.post("/offres/bulk", json=lot[:1], headers=partenaire).status_code == 201
+
+def test_bulk_ndjson_lines_split_across_chunks(client, login):
+    partenaire = login("magasin@example.com", role="partenaire")
+    body = b"\n".join(orjson.dumps(offre(i)) for i in range(3)) + b"\n"
+    # Morceaux de 7 octets : chaque ligne est coupée plusieurs fois
+    chunks = (body[i:i + 7] for i in range(0, len(body), 7))
+    response = client.post("/offres/bulk", content=chunks, headers={**partenaire, "Content-Type": "application/x-ndjson"})
+    assert response.status_code == 201
+    assert response.json()["crees"] == 3 and response.json()["erreurs"] == []
+
+def test_admin_bulk_availability(client, login):
+    partenaire = login("magasin@example.com", role="partenaire")
+    admin = login("admin@example.com", role="admin")
+    ids = client.post("/offres/bulk", json=[offre(i) for i in range(4)], headers=partenaire).json()["ids"]
+    assert len(client.get("/offres/").json()) == 4
+
+    response = client.put("/admin/offres/bulk/disponibilite", json={"ids": ids[:3] + [999999], "is_disponible": False}, headers=admin)
+
+    assert response.json() == {"modifies": 3, "ids": ids[:3], "erreurs": [{"index": 3, "detail": "Offre non trouvée."}]}
+    assert [o["id"] for o in client.get("/offres/").json()] == [ids[3]]
+    assert client.get("/admin/dashboard", headers=admin).json()["offres_disponibles"] == 1
+    # Déjà dans l'état demandé : rien à modifier
+    response = client.put("/admin/offres/bulk/disponibilite", json={"ids": ids, "is_disponible": True}, headers=admin)
+    assert response.json()["modifies"] == 3
+
+def test_admin_bulk_deactivate_users(client, login):
+    admin = login("admin@example.com", role="admin")
+    comptes = [login(f"u{i}@example.com") for i in range(3)]
+    users = {u["email"]: u["id"] for u in client.get("/admin/users", headers=admin).json()}
+    ids = [users[f"u{i}@example.com"] for i in range(2)]
+
+    response = client.put("/admin/users/bulk/desactivation", json={"ids": ids + [users["admin@example.com"]]}, headers=admin)
+
+    assert response.json() == {
+        "modifies": 2, "ids": ids,
+        "erreurs": [{"index": 2, "detail": "Vous ne pouvez pas désactiver votre propre compte."}],
+    }
+    # Les comptes désactivés sont refusés immédiatement (cache d'authentification invalidé)
+    assert client.get("/transactions/mes-transactions", headers=comptes[0]).status_code in (401, 403)
+    assert client.get("/transactions/mes-transactions", headers=comptes[2]).status_code == 200
+    assert client.put("/admin/users/bulk/desactivation", json={"ids": []}, headers=admin).status_code == 422
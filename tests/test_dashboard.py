@@ -0,0 +1,56 @@
+from app.utils.stats import dashboard_stats
+from tests.conftest import count_queries
+
+def test_dashboard_is_one_query_then_served_from_memory(client, login):
+    admin = login("admin@example.com", "admin")
+    client.get("/auth/me", headers=admin)
+
+    with count_queries() as statements:
+        cold = client.get("/admin/dashboard", headers=admin).json()
+    assert len(statements) == 1
+    assert cold["total_utilisateurs"] == cold["utilisateurs_actifs"] == 1
+
+    with count_queries() as statements:
+        assert client.get("/admin/dashboard", headers=admin).json() == cold
+    assert statements == []
+
+def test_writes_update_counters_incrementally(client, login):
+    admin = login("admin@example.com", "admin")
+    client.get("/admin/dashboard", headers=admin)
+
+    donateur = login("donateur@example.com", "donateur")
+    beneficiaire = login("beneficiaire@example.com")
+    offre_ids = [
+        client.post("/offres/", json={"titre": f"Offre {i}", "type_offre": "plats", "quantite": 1}, headers=donateur).json()["id"]
+        for i in range(3)
+    ]
+    transaction = client.post("/transactions/reserver", json={"id_offre": offre_ids[0]}, headers=beneficiaire).json()
+    client.post("/transactions/reserver", json={"id_offre": offre_ids[1]}, headers=beneficiaire)
+    client.put(f"/transactions/{transaction['id']}/annuler", headers=beneficiaire)
+    client.put(f"/admin/offres/{offre_ids[2]}/toggle-disponibilite", headers=admin)
+
+    incremental = client.get("/admin/dashboard", headers=admin).json()
+    dashboard_stats.invalidate()
+    recomputed = client.get("/admin/dashboard", headers=admin).json()
+    assert incremental == recomputed
+    assert recomputed == {
+        "total_utilisateurs": 3, "utilisateurs_actifs": 3,
+        "total_offres": 3, "offres_disponibles": 1,
+        "total_transactions": 2, "transactions_en_cours": 1,
+    }
+
+def test_max_age_bounds_staleness(client, login, monkeypatch):
+    admin = login("admin@example.com", "admin")
+    client.get("/admin/dashboard", headers=admin)
+    monkeypatch.setattr(dashboard_stats, "max_age", 0)
+    with count_queries() as statements:
+        client.get("/admin/dashboard", headers=admin)
+    assert len(statements) == 1
+
+def test_user_details_single_query(client, login):
+    admin = login("admin@example.com", "admin")
+    user_id = client.get("/auth/me", headers=admin).json()["id"]
+    with count_queries() as statements:
+        response = client.get(f"/admin/users/{user_id}", headers=admin)
+    assert response.json()["stats"] == {"total_offres": 0, "total_transactions": 0, "transactions_actives": 0}
+    assert len(statements) == 1
@@ -0,0 +1,39 @@
+import pytest
+
+from app.core.config import settings
+from app.database import get_async_database_url
+
+@pytest.fixture(params=[True, False], ids=["async", "sync"], autouse=True)
+def db_mode(request, monkeypatch):
+    monkeypatch.setattr(settings, "DB_ASYNC", request.param)
+
+def test_async_database_url():
+    assert get_async_database_url("postgresql://u:p@db:5432/x") == "postgresql+asyncpg://u:p@db:5432/x"
+    assert get_async_database_url("sqlite:///./app.db") == "sqlite+aiosqlite:///./app.db"
+    assert get_async_database_url("postgresql+asyncpg://db/x") == "postgresql+asyncpg://db/x"
+
+def test_reservation_flow(client, login):
+    donateur = login("donateur@example.com", "donateur")
+    beneficiaire = login("beneficiaire@example.com")
+
+    response = client.post("/offres/", json={"titre": "Pain", "type_offre": "denrees", "quantite": 3}, headers=donateur)
+    assert response.status_code == 201
+    offre_id = response.json()["id"]
+    assert [o["id"] for o in client.get("/offres/").json()] == [offre_id]
+
+    response = client.post("/transactions/reserver", json={"id_offre": offre_id, "quantite": 2}, headers=beneficiaire)
+    assert response.status_code == 201
+    assert [o["quantite_restante"] for o in client.get("/offres/").json()] == [1]
+    response = client.post("/transactions/reserver", json={"id_offre": offre_id}, headers=login("autre@example.com"))
+    assert response.status_code == 201
+    assert client.get("/offres/").json() == []
+
+    response = client.get("/transactions/mes-transactions", headers=beneficiaire)
+    assert response.status_code == 200
+    assert response.json()[0]["offre"]["titre"] == "Pain"
+
+    transaction_id = response.json()[0]["id"]
+    response = client.put(f"/transactions/{transaction_id}/annuler", headers=beneficiaire)
+    assert response.json()["statut"] == "annule"
+    offre = client.get(f"/offres/{offre_id}").json()
+    assert offre["is_disponible"] is True and offre["quantite_restante"] == 2
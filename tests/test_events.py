@@ -0,0 +1,112 @@
+import asyncio
+
+import orjson
+import pytest
+from starlette.websockets import WebSocketDisconnect
+
+from app.utils import events
+from app.utils.events import BroadcastHub, LocalBackend, sse_stream
+
+def test_websocket_receives_offer_lifecycle(client, login):
+    donateur = login("donateur@example.com", role="donateur")
+    beneficiaire = login("b@example.com")
+
+    with client.websocket_connect("/offres/ws") as ws:
+        offre_id = client.post("/offres/", json={"titre": "Pain", "type_offre": "denrees", "quantite": 1}, headers=donateur).json()["id"]
+        assert ws.receive_json() == {"type": "offre_creee", "offre_ids": [offre_id]}
+
+        transaction_id = client.post("/transactions/reserver", json={"id_offre": offre_id}, headers=beneficiaire).json()["id"]
+        assert ws.receive_json() == {"type": "offre_reservee", "offre_ids": [offre_id]}
+
+        client.put(f"/transactions/{transaction_id}/annuler", headers=beneficiaire)
+        assert ws.receive_json() == {"type": "offre_liberee", "offre_ids": [offre_id]}
+
+        client.put(f"/offres/{offre_id}", json={"titre": "Pain frais"}, headers=donateur)
+        assert ws.receive_json() == {"type": "offre_modifiee", "offre_ids": [offre_id]}
+
+        autre_id = client.post("/offres/", json={"titre": "Riz", "type_offre": "denrees", "quantite": 1}, headers=donateur).json()["id"]
+        assert ws.receive_json()["type"] == "offre_creee"
+        client.delete(f"/offres/{autre_id}", headers=donateur)
+        assert ws.receive_json() == {"type": "offre_supprimee", "offre_ids": [autre_id]}
+    assert events.offre_events.subscribers == set()
+
+def test_full_hub_refuses_new_subscribers(client, monkeypatch):
+    monkeypatch.setattr(events.offre_events, "max_subscribers", 0)
+
+    with pytest.raises(WebSocketDisconnect) as refused:
+        with client.websocket_connect("/offres/ws") as ws:
+            ws.receive_text()
+    assert refused.value.code == 1013
+    assert client.get("/offres/flux").status_code == 503
+
+def test_slow_subscriber_is_dropped_without_blocking_others():
+    async def scenario():
+        hub = BroadcastHub(LocalBackend(), queue_size=2, max_subscribers=10)
+        await hub.start()
+        lent, rapide = hub.subscribe(), hub.subscribe()
+        received = []
+        for i in range(3):
+            await hub.publish("offre_creee", [i])
+            received.append(await rapide.get())
+        # File pleine au 3e message : le lent est retiré et sa file vidée
+        assert lent.dropped and lent not in hub.subscribers
+        assert await lent.get() is None
+        assert len(received) == 3 and hub.subscribers == {rapide}
+        await hub.stop()
+        assert await rapide.get() is None
+    asyncio.run(scenario())
+
+def test_sse_stream_format(monkeypatch):
+    async def scenario():
+        hub = BroadcastHub(LocalBackend(), queue_size=1, max_subscribers=10)
+        monkeypatch.setattr(events, "offre_events", hub)
+        await hub.start()
+        subscriber = hub.subscribe()
+        stream = sse_stream(subscriber, keepalive=0.01)
+        chunks = [await stream.__anext__(), await stream.__anext__()]
+        await hub.publish("offre_reservee", [7])
+        chunks.append(await stream.__anext__())
+        # Deux messages pour une file d'une place : abonné déconnecté
+        await hub.publish("offre_liberee", [7])
+        await hub.publish("offre_reservee", [7])
+        chunks.extend([chunk async for chunk in stream])
+        return chunks, hub
+    chunks, hub = asyncio.run(scenario())
+    assert chunks == [
+        b"retry: 3000\n\n",
+        b": ping\n\n",
+        b'data: {"type":"offre_reservee","offre_ids":[7]}\n\n',
+        b"event: dropped\ndata: {}\n\n",
+    ]
+    assert hub.subscribers == set()
+
+def test_bulk_events_are_split(monkeypatch):
+    async def scenario():
+        hub = BroadcastHub(LocalBackend(), queue_size=10, max_subscribers=10)
+        await hub.start()
+        subscriber = hub.subscribe()
+        await hub.publish("offre_creee", list(range(events.MAX_IDS_PER_EVENT + 1)))
+        return [await subscriber.get(), await subscriber.get()]
+    first, second = asyncio.run(scenario())
+    assert len(orjson.loads(first)["offre_ids"]) == events.MAX_IDS_PER_EVENT
+    assert second == b'{"type":"offre_creee","offre_ids":[500]}'
+
+def test_postgres_publish_does_not_wait_for_the_notify(monkeypatch):
+    async def scenario():
+        backend = events.PostgresBackend("postgresql+asyncpg://denrees@localhost/denrees")
+        sent, release = [], asyncio.Event()
+
+        async def send(batch):
+            await release.wait()
+            sent.append(batch)
+
+        monkeypatch.setattr(backend, "_send", send)
+        for i in range(3):
+            await asyncio.wait_for(backend.publish(b"%d" % i), timeout=0.1)
+        await asyncio.sleep(0)  # le premier message part, les suivants attendent
+        release.set()
+        for _ in range(5):
+            await asyncio.sleep(0)
+        await backend.stop()
+        return sent
+    assert asyncio.run(scenario()) == [[b"0"], [b"1", b"2"]]
@@ -0,0 +1,132 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import models
+from app.core.config import settings
+from app.database import SessionLocal, async_engine
+from app.workers import expiration
+from app.workers.leader import LeaderLock
+
+NOW = datetime.now(timezone.utc)
+
+def run(coroutine):
+    async def wrapper():
+        # Les connexions du pool sont liées à la boucle qui les a ouvertes
+        await async_engine.dispose()
+        try:
+            return await coroutine
+        finally:
+            await async_engine.dispose()
+    return asyncio.run(wrapper())
+
+def seed_offres(expirations):
+    with SessionLocal() as db:
+        donateur = models.Utilisateur(email="donateur@example.com", password_hash="x", role="donateur")
+        db.add(donateur)
+        db.flush()
+        offres = [
+            models.Offre(titre=f"Offre {i}", type_offre="denrees", quantite=1, createur_id=donateur.id, date_expiration=date)
+            for i, date in enumerate(expirations)
+        ]
+        db.add_all(offres)
+        db.commit()
+        return [o.id for o in offres]
+
+def disponibles():
+    with SessionLocal() as db:
+        return set(db.scalars(select(models.Offre.id).where(models.Offre.is_disponible == True)))
+
+def test_sweep_expires_offers_in_batches(client, monkeypatch):
+    monkeypatch.setattr(settings, "EXPIRATION_SWEEP_BATCH", 3)
+    passees = [NOW - timedelta(hours=1)] * 7
+    ids = seed_offres(passees + [NOW + timedelta(days=1), None])
+
+    affected = run(expiration.sweep_once(NOW))
+
+    assert affected["offres_expirees"] == 7
+    assert disponibles() == set(ids[7:])
+    assert len(client.get("/offres/").json()) == 2
+    # Deuxième passage : plus rien à faire
+    assert run(expiration.sweep_once(NOW))["offres_expirees"] == 0
+
+def test_expired_offer_cannot_be_reserved_before_sweep(client, login):
+    [offre_id] = seed_offres([NOW - timedelta(minutes=1)])
+    headers = login("b@example.com")
+
+    response = client.post("/transactions/reserver", json={"id_offre": offre_id}, headers=headers)
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Cette offre n'est plus disponible."
+
+def test_stale_reservations_are_cancelled_and_offers_restored(client, login, monkeypatch):
+    monkeypatch.setattr(settings, "RESERVATION_PICKUP_WINDOW_HOURS", 48)
+    ids = seed_offres([None, None, NOW + timedelta(hours=1)])
+    headers = login("b@example.com")
+    for offre_id in ids:
+        assert client.post("/transactions/reserver", json={"id_offre": offre_id}, headers=headers).status_code == 201
+    with SessionLocal() as db:
+        # Deux réservations anciennes, dont une sur une offre qui aura expiré entre-temps
+        db.execute(
+            update(models.Transaction)
+            .where(models.Transaction.offre_id.in_([ids[0], ids[2]]))
+            .values(created_at=NOW - timedelta(hours=72))
+        )
+        db.commit()
+
+    affected = run(expiration.sweep_once(NOW + timedelta(hours=2)))
+
+    assert affected == {"offres_expirees": 0, "reservations_perimees": 2}
+    assert disponibles() == {ids[0]}
+    # L'offre expirée récupère sa portion sans repasser disponible
+    with SessionLocal() as db:
+        assert [db.get(models.Offre, offre_id).quantite_restante for offre_id in ids] == [1, 0, 1]
+    statuts = {t["offre_id"]: t["statut"] for t in client.get("/transactions/mes-transactions", headers=headers).json()}
+    assert statuts == {ids[0]: "annule", ids[1]: "reserve", ids[2]: "annule"}
+
+def test_pickup_window_zero_keeps_reservations(client, monkeypatch):
+    monkeypatch.setattr(settings, "RESERVATION_PICKUP_WINDOW_HOURS", 0)
+    assert "reservations_perimees" not in run(expiration.sweep_once(NOW))
+
+def test_sweep_between_pickup_read_and_write_wins(client, login, monkeypatch):
+    monkeypatch.setattr(settings, "RESERVATION_PICKUP_WINDOW_HOURS", 48)
+    [offre_id] = seed_offres([None])
+    headers = login("b@example.com")
+    transaction_id = client.post("/transactions/reserver", json={"id_offre": offre_id}, headers=headers).json()["id"]
+    with SessionLocal() as db:
+        db.execute(update(models.Transaction).values(created_at=NOW - timedelta(hours=47, minutes=59)))
+        db.commit()
+
+    # Le balayage passe juste après la lecture de la transaction par la route de récupération
+    get = AsyncSession.get
+    swept = []
+
+    async def get_then_sweep(self, entity, ident, **kwargs):
+        found = await get(self, entity, ident, **kwargs)
+        if entity is models.Transaction:
+            monkeypatch.setattr(AsyncSession, "get", get)
+            swept.append(await expiration.sweep_once(NOW + timedelta(minutes=2)))
+        return found
+
+    monkeypatch.setattr(AsyncSession, "get", get_then_sweep)
+    response = client.put(f"/transactions/{transaction_id}/recuperer", headers=headers)
+
+    assert swept == [{"offres_expirees": 0, "reservations_perimees": 1}]
+    assert response.status_code == 400
+    with SessionLocal() as db:
+        assert db.get(models.Transaction, transaction_id).statut == "annule"
+        assert db.get(models.Offre, offre_id).quantite_restante == 1
+    assert disponibles() == {offre_id}
+
+def test_only_one_leader_at_a_time():
+    async def scenario():
+        first, second = LeaderLock("test-leader", async_engine), LeaderLock("test-leader", async_engine)
+        assert await first.acquire()
+        assert await first.acquire()  # toujours tenu au cycle suivant
+        assert not await second.acquire()
+        await first.release()
+        assert await second.acquire()
+        await second.release()
+    run(scenario())
@@ -0,0 +1,75 @@
+import csv
+import io
+import os
+import subprocess
+import sys
+
+import orjson
+import pytest
+
+from app.core.config import settings
+
+# Taille de l'export du test mémoire ; EXPORT_TEST_ROWS=5000000 pour le test complet
+EXPORT_TEST_ROWS = int(os.environ.get("EXPORT_TEST_ROWS", "100000"))
+
+def seed(client, login, count):
+    donateur = login("donateur@example.com", role="donateur")
+    for i in range(count):
+        client.post("/offres/", json={"titre": f"Panier {i}", "type_offre": "denrees" if i % 2 else "plats", "quantite": 1}, headers=donateur)
+    return login("admin@example.com", role="admin")
+
+@pytest.mark.parametrize("db_async", [True, False])
+def test_ndjson_export_matches_admin_listing(client, login, monkeypatch, db_async):
+    monkeypatch.setattr(settings, "DB_ASYNC", db_async)
+    monkeypatch.setattr(settings, "EXPORT_BATCH_SIZE", 3)
+    admin = seed(client, login, 10)
+
+    response = client.get("/admin/export/offres", headers=admin)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert response.headers["content-disposition"] == 'attachment; filename="offres.ndjson"'
+    lignes = [orjson.loads(line) for line in response.content.splitlines()]
+    liste = client.get("/admin/offres", headers=admin).json()
+    assert lignes == sorted(liste, key=lambda offre: offre["id"])
+
+def test_csv_export_with_filters(client, login):
+    admin = seed(client, login, 4)
+
+    response = client.get("/admin/export/offres", params={"format": "csv", "type_offre": "plats"}, headers=admin)
+
+    assert response.headers["content-type"] == "text/csv; charset=utf-8"
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [row["titre"] for row in rows] == ["Panier 0", "Panier 2"]
+    assert rows[0]["type_offre"] == "plats"
+    assert rows[0]["is_disponible"] == "true"
+    assert rows[0]["createur__email"] == "donateur@example.com"
+
+def test_user_and_transaction_exports(client, login):
+    admin = seed(client, login, 1)
+    beneficiaire = login("b@example.com")
+    offre_id = client.get("/offres/").json()[0]["id"]
+    client.post("/transactions/reserver", json={"id_offre": offre_id}, headers=beneficiaire)
+
+    users = [orjson.loads(line) for line in client.get("/admin/export/utilisateurs", params={"role": "beneficiaire"}, headers=admin).content.splitlines()]
+    assert [u["email"] for u in users] == ["b@example.com"]
+    [transaction] = list(csv.DictReader(io.StringIO(client.get("/admin/export/transactions", params={"format": "csv"}, headers=admin).text)))
+    assert transaction["statut"] == "reserve"
+    assert transaction["offre__id"] == str(offre_id)
+    assert transaction["beneficiaire__email"] == "b@example.com"
+
+def test_empty_csv_export_has_header(client, login):
+    admin = login("admin@example.com", role="admin")
+    assert client.get("/admin/export/transactions", params={"format": "csv"}, headers=admin).text.startswith("id,offre_id,")
+
+def test_export_is_admin_only(client, login):
+    assert client.get("/admin/export/utilisateurs", headers=login("b@example.com")).status_code == 403
+
+def test_export_memory_stays_flat(tmp_path):
+    # Processus séparé : sa mémoire résidente ne reflète que l'export
+    env = {**os.environ, "DATABASE_URL": f"sqlite:///{tmp_path}/export.db", "EXPIRATION_SWEEP_INTERVAL": "0"}
+    result = subprocess.run(
+        [sys.executable, "-m", "benchmarks.export_memory", "--rows", str(EXPORT_TEST_ROWS), "--max-growth-mb", "64"],
+        env=env, capture_output=True, text=True, timeout=3600,
+    )
+    assert result.returncode == 0, result.stdout + result.stderr
@@ -0,0 +1,81 @@
+from datetime import datetime, timezone
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app import models
+from app.core.config import settings
+from app.schemas import OffreOut
+from app.utils.fast_json import RowSerializer
+from app.utils.response_cache import response_cache
+
+ENDPOINTS = [
+    "/offres/?limit=2",
+    "/offres/?limit=50",
+    "/admin/offres?limit=2",
+    "/admin/offres?is_disponible=false",
+    "/admin/transactions?limit=1",
+    "/admin/transactions?statut=annule",
+    "/transactions/mes-transactions",
+]
+
+@pytest.fixture
+def seeded(client, login):
+    donateur = login("donateur@example.com", "donateur")
+    beneficiaire = login("beneficiaire@example.com")
+    admin = login("admin@example.com", "admin")
+    client.put("/admin/users/1", json={"nom": "Boulangerie Hélène"}, headers=admin)
+    offres = [
+        {"titre": "Pain complet", "type_offre": "denrees", "quantite": 3},
+        {"titre": "Thiéboudienne « maison »", "description": "Plat chaud 🍲", "type_offre": "plats", "quantite": 1,
+         "localisation": "Dakar", "date_expiration": "2026-12-31T18:30:00+02:00"},
+        {"titre": "Bon d'achat", "type_offre": "credits", "quantite": 10, "date_expiration": "2026-11-01T08:00:00.250000Z"},
+    ]
+    ids = [client.post("/offres/", json=o, headers=donateur).json()["id"] for o in offres]
+    client.post("/transactions/reserver", json={"id_offre": ids[0], "quantite": 3}, headers=beneficiaire)
+    reservation = client.post("/transactions/reserver", json={"id_offre": ids[1]}, headers=beneficiaire).json()
+    client.put(f"/transactions/{reservation['id']}/annuler", headers=beneficiaire)
+    return {"/admin": admin, "/transactions": beneficiaire}
+
+def fetch(client, headers, url, fast, monkeypatch):
+    monkeypatch.setattr(settings, "FAST_SERIALIZATION", fast)
+    response_cache.clear()
+    auth = next((h for prefix, h in headers.items() if url.startswith(prefix)), {})
+    response = client.get(url, headers=auth)
+    assert response.status_code == 200
+    return response
+
+@pytest.mark.parametrize("url", ENDPOINTS)
+def test_fast_path_is_byte_identical(client, seeded, url, monkeypatch):
+    slow = fetch(client, seeded, url, False, monkeypatch)
+    fast = fetch(client, seeded, url, True, monkeypatch)
+    assert slow.json()
+    assert fast.content == slow.content
+    assert fast.headers.get("X-Next-Cursor") == slow.headers.get("X-Next-Cursor")
+    assert fast.headers["content-type"] == slow.headers["content-type"]
+
+EDGE_FLOATS = [1e-05, -1.5e-07, 9.999999999999999e-05, 0.0001, 0.1, 14.6937, -0.0, 1e15, 1e16, -1.2345e17, 1e300]
+
+def test_edge_coordinates_are_byte_identical(client, login, monkeypatch):
+    donateur = login("donateur@example.com", "donateur")
+    for i, latitude in enumerate(f for f in EDGE_FLOATS if abs(f) <= 90):
+        client.post("/offres/", json={"titre": f"Panier {i}", "type_offre": "denrees", "quantite": 1,
+                                      "latitude": latitude, "longitude": -latitude}, headers=donateur)
+    slow = fetch(client, {}, "/offres/?limit=50", False, monkeypatch)
+    fast = fetch(client, {}, "/offres/?limit=50", True, monkeypatch)
+    assert b"1e-05" in slow.content
+    assert fast.content == slow.content
+
+@pytest.mark.parametrize("value", EDGE_FLOATS)
+def test_row_serializer_formats_floats_like_json_response(value):
+    serializer = RowSerializer(OffreOut, models.Offre)
+    values = {
+        "titre": "Pain", "description": None, "type_offre": "denrees", "quantite": 1, "localisation": None,
+        "date_expiration": None, "latitude": value, "longitude": 1.0, "id": 1, "quantite_restante": 1,
+        "is_disponible": True, "createur_id": 1, "created_at": datetime(2026, 10, 18, tzinfo=timezone.utc),
+    }
+    row = tuple(values[key] for key in serializer.keys)
+    expected = JSONResponse(jsonable_encoder([OffreOut.model_construct(**values).model_dump(mode="json")])).body
+    assert serializer.dumps([row]) == expected
+    assert b"[" + serializer.dumps_item(row) + b"]" == expected
@@ -0,0 +1,55 @@
+from pathlib import Path
+
+import pytest
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.config import Config
+from alembic.migration import MigrationContext
+from sqlalchemy import create_engine, event
+
+from app.core.config import settings
+from app.database import Base, engine
+
+LISTINGS = [
+    "/offres/",
+    "/admin/offres?type_offre=plats",
+    "/admin/offres?is_disponible=false",
+    "/admin/users?role=beneficiaire&is_active=true",
+    "/admin/transactions?statut=reserve",
+    "/transactions/mes-transactions",
+    "/offres/recherche?q=pain riz",
+    "/offres/recherche?lat=14.69&lon=-17.44&rayon_km=2",
+]
+
+def test_migrations_match_models(tmp_path):
+    url = f"sqlite:///{tmp_path}/migrations.db"
+    config = Config(Path(__file__).parents[1] / "alembic.ini")
+    config.attributes["url"] = url
+    command.upgrade(config, "head")
+
+    with create_engine(url).connect() as conn:
+        context = MigrationContext.configure(conn, opts={"compare_server_default": True})
+        assert compare_metadata(context, Base.metadata) == []
+
+@pytest.mark.parametrize("url", LISTINGS)
+def test_listing_queries_use_an_index(client, login, monkeypatch, url):
+    monkeypatch.setattr(settings, "DB_ASYNC", False)
+    headers = login("admin@example.com", "admin")
+    client.get("/auth/me", headers=headers)
+
+    captured = []
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        captured.append((statement, parameters))
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        assert client.get(url, headers=headers).status_code == 200
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+    statement, parameters = captured[0]
+    with engine.connect() as conn:
+        plan = [row[3] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)]
+    # "SCAN t" seul = parcours complet de table ; "SCAN t USING INDEX" = parcours d'index
+    full_scans = [step for step in plan if step.startswith("SCAN") and "USING" not in step]
+    assert full_scans == [], plan
+    assert any("INDEX" in step for step in plan), plan
@@ -0,0 +1,55 @@
+import subprocess
+import sys
+
+from prometheus_client import REGISTRY
+
+from app.utils.metrics import render_metrics
+from app.utils.response_cache import response_cache
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+def test_metrics_per_route_template(client, login, monkeypatch):
+    monkeypatch.setattr(response_cache, "enabled", False)
+    donateur = login("donateur@example.com", "donateur")
+    offre_id = client.post("/offres/", json={"titre": "Pain", "type_offre": "denrees", "quantite": 1}, headers=donateur).json()["id"]
+    route = {"method": "GET", "route": "/offres/{offre_id}"}
+    before = sample("http_requests_total", status="200", **route)
+    queries_before = sample("http_request_db_queries_sum", **route)
+
+    for _ in range(3):
+        assert client.get(f"/offres/{offre_id}").status_code == 200
+    client.get("/offres/999999")
+
+    assert sample("http_requests_total", status="200", **route) == before + 3
+    assert sample("http_requests_total", status="404", **route) >= 1
+    # Une requête SQL par lecture (db.get), comptée sur la requête HTTP qui l'a émise
+    assert sample("http_request_db_queries_sum", **route) == queries_before + 4
+
+    body = client.get("/metrics").text
+    assert 'http_request_duration_seconds_bucket{le="0.005",method="GET",route="/offres/{offre_id}"}' in body
+    assert "http_requests_in_progress" in body
+    assert 'db_pool_checkout_wait_seconds_count{pool="async"}' in body
+    assert 'password_hash_seconds_count{operation="hash"}' in body
+    assert f"/offres/{offre_id}\"" not in body
+
+def test_unmatched_paths_share_one_label(client):
+    client.get("/nexiste/pas/1")
+    client.get("/nexiste/pas/2")
+    assert sample("http_requests_total", method="GET", route="<unmatched>", status="404") >= 2
+
+WORKER = """
+from app.utils.metrics import HTTP_REQUESTS, HTTP_IN_PROGRESS
+HTTP_REQUESTS.labels("GET", "/offres/", "200").inc(5)
+HTTP_IN_PROGRESS.inc()
+"""
+
+def test_multiprocess_aggregation(tmp_path, monkeypatch):
+    # Deux « workers » écrivent dans le même répertoire ; /metrics additionne leurs valeurs
+    env = {"PROMETHEUS_MULTIPROC_DIR": str(tmp_path), "PATH": ""}
+    for _ in range(2):
+        subprocess.run([sys.executable, "-c", WORKER], env=env, check=True)
+
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+    body = render_metrics().decode()
+    assert 'http_requests_total{method="GET",route="/offres/",status="200"} 10.0' in body
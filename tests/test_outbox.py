@@ -0,0 +1,159 @@
+import asyncio
+import email
+import email.policy
+import socket
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from aiosmtpd.controller import Controller
+from sqlalchemy import select
+
+from app import models
+from app.core.config import settings
+from app.database import SessionLocal, async_engine
+from app.utils.email_utils import SMTPPool, build_message
+from app.workers.outbox import drain_outbox
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+class Recorder:
+    """Serveur SMTP de test : enregistre les messages et compte les sessions"""
+
+    def __init__(self):
+        self.messages = []
+        self.sessions = 0
+        self.refuse = {}  # adresse -> réponse SMTP
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        self.sessions += 1
+        session.host_name = hostname
+        return responses
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address in self.refuse:
+            return self.refuse[address]
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope)
+        return "250 Message accepted for delivery"
+
+@pytest.fixture
+def smtp(monkeypatch):
+    recorder = Recorder()
+    controller = Controller(recorder, hostname="127.0.0.1", port=free_port())
+    controller.start()
+    monkeypatch.setattr(settings, "SMTP_HOST", "127.0.0.1")
+    monkeypatch.setattr(settings, "SMTP_PORT", controller.port)
+    monkeypatch.setattr(settings, "SMTP_STARTTLS", False)
+    monkeypatch.setattr(settings, "SMTP_FROM", "noreply@denrees.test")
+    monkeypatch.setattr(settings, "SMTP_POOL_SIZE", 1)
+    recorder.controller = controller
+    yield recorder
+    recorder.controller.stop()
+
+def drain(now=None):
+    async def scenario():
+        # Les connexions du pool sont liées à la boucle qui les a ouvertes
+        await async_engine.dispose()
+        pool = SMTPPool.from_settings()
+        try:
+            return await drain_outbox(pool, now)
+        finally:
+            await pool.close()
+            await async_engine.dispose()
+    return asyncio.run(scenario())
+
+def outbox():
+    with SessionLocal() as db:
+        return db.scalars(select(models.EmailSortant).order_by(models.EmailSortant.id)).all()
+
+def reserve(client, login, count=1):
+    donateur = login("donateur@example.com", role="donateur")
+    beneficiaire = login("b@example.com")
+    ids = []
+    for i in range(count):
+        offre = client.post("/offres/", json={"titre": f"Panier {i}", "type_offre": "denrees", "quantite": 1}, headers=donateur)
+        reponse = client.post("/transactions/reserver", json={"id_offre": offre.json()["id"]}, headers=beneficiaire)
+        ids.append(reponse.json()["id"])
+    return beneficiaire, ids
+
+def test_reservation_and_cancellation_are_sent_over_one_connection(client, login, smtp):
+    beneficiaire, [transaction_id] = reserve(client, login)
+    client.put(f"/transactions/{transaction_id}/annuler", headers=beneficiaire)
+    assert [m.statut for m in outbox()] == ["en_attente", "en_attente"]
+    assert smtp.messages == []  # rien n'est envoyé pendant la requête
+
+    assert drain() == {"envoye": 2, "reessai": 0, "echec": 0}
+
+    assert smtp.sessions == 1
+    assert [m.rcpt_tos for m in smtp.messages] == [["donateur@example.com"]] * 2
+    sujets = [email.message_from_bytes(m.content, policy=email.policy.default)["Subject"] for m in smtp.messages]
+    assert sujets == ["Votre offre a été réservée", "Réservation annulée"]
+    assert [m.statut for m in outbox()] == ["envoye", "envoye"]
+
+def test_nothing_is_queued_without_smtp(client, login):
+    reserve(client, login)
+    assert outbox() == []
+
+def test_temporary_failure_is_retried_with_backoff(client, login, smtp):
+    reserve(client, login)
+    smtp.refuse["donateur@example.com"] = "451 Réessayez plus tard"
+    now = datetime.now(timezone.utc)
+
+    assert drain(now) == {"envoye": 0, "reessai": 1, "echec": 0}
+    [message] = outbox()
+    assert message.statut == "en_attente" and message.tentatives == 1
+    assert "451" in message.derniere_erreur
+    # Pas encore échu : rien à faire
+    assert drain(now + timedelta(seconds=1)) == {"envoye": 0, "reessai": 0, "echec": 0}
+
+    del smtp.refuse["donateur@example.com"]
+    assert drain(now + timedelta(seconds=settings.OUTBOX_RETRY_BASE)) == {"envoye": 1, "reessai": 0, "echec": 0}
+    assert outbox()[0].statut == "envoye"
+
+def test_permanent_failure_is_not_retried(client, login, smtp):
+    reserve(client, login)
+    smtp.refuse["donateur@example.com"] = "550 Boîte inconnue"
+
+    assert drain() == {"envoye": 0, "reessai": 0, "echec": 1}
+    assert outbox()[0].statut == "echec"
+
+def test_pool_reconnects_after_server_restart(client, login, smtp, monkeypatch):
+    monkeypatch.setattr(settings, "OUTBOX_BATCH", 1)
+    reserve(client, login, count=3)
+
+    async def scenario():
+        await async_engine.dispose()
+        pool = SMTPPool.from_settings()
+        try:
+            # Connexion ouverte, puis le serveur redémarre et coupe la session
+            await pool.send(build_message("x@example.com", "Test", "Test"))
+            smtp.controller.stop()
+            smtp.controller = Controller(smtp, hostname="127.0.0.1", port=settings.SMTP_PORT)
+            smtp.controller.start()
+            return await drain_outbox(pool), pool.opened
+        finally:
+            await pool.close()
+            await async_engine.dispose()
+
+    totals, opened = asyncio.run(scenario())
+    assert totals == {"envoye": 3, "reessai": 0, "echec": 0}
+    assert opened == 2
+
+def test_no_database_connection_is_held_while_sending(client, login, smtp, monkeypatch):
+    reserve(client, login)
+    checked_out = []
+    send = SMTPPool.send
+
+    async def recording_send(self, message):
+        checked_out.append(async_engine.pool.checkedout())
+        return await send(self, message)
+
+    monkeypatch.setattr(SMTPPool, "send", recording_send)
+    assert drain() == {"envoye": 1, "reessai": 0, "echec": 0}
+    assert checked_out == [0]
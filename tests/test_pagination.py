@@ -0,0 +1,60 @@
+from datetime import datetime
+
+from app import models
+from app.database import SessionLocal
+from app.utils.pagination import encode_cursor, decode_cursor
+
+def seed_offres(count, created_at=datetime(2025, 1, 1, 12, 0, 0)):
+    with SessionLocal() as db:
+        createur = models.Utilisateur(email="donateur@example.com", password_hash="x", role="donateur")
+        db.add(createur)
+        db.flush()
+        # Même created_at pour tout le lot : l'id départage
+        db.add_all(
+            models.Offre(titre=f"Offre {i}", type_offre="denrees", quantite=1, createur_id=createur.id, created_at=created_at)
+            for i in range(count)
+        )
+        db.commit()
+
+def walk(client, url, limit, headers=None):
+    ids, cursor = [], None
+    while True:
+        params = {"limit": limit, **({"cursor": cursor} if cursor else {})}
+        response = client.get(url, params=params, headers=headers)
+        ids += [item["id"] for item in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            return ids
+
+def test_cursor_round_trip():
+    created_at = datetime(2025, 1, 1, 12, 0, 0)
+    assert decode_cursor(encode_cursor(created_at, 42)) == (created_at, 42)
+
+def test_invalid_cursor_is_rejected(client):
+    assert client.get("/offres/", params={"cursor": "pas-un-curseur"}).status_code == 400
+
+def test_cursor_pages_match_offset_pages(client):
+    seed_offres(25)
+    by_offset = [o["id"] for skip in (0, 10, 20) for o in client.get("/offres/", params={"skip": skip, "limit": 10}).json()]
+    assert walk(client, "/offres/", 10) == by_offset
+    assert len(set(by_offset)) == 25
+
+def test_total_is_optional_and_cached(client):
+    seed_offres(3)
+    assert "X-Total-Count" not in client.get("/offres/").headers
+    assert client.get("/offres/", params={"include_total": True}).headers["X-Total-Count"] == "3"
+
+def test_admin_transactions_cursor_is_descending(client, login):
+    admin = login("admin@example.com", "admin")
+    seed_offres(5)
+    with SessionLocal() as db:
+        beneficiaire = models.Utilisateur(email="b@example.com", password_hash="x", role="beneficiaire")
+        db.add(beneficiaire)
+        db.flush()
+        db.add_all(
+            models.Transaction(offre_id=offre.id, beneficiaire_id=beneficiaire.id, statut="reserve")
+            for offre in db.query(models.Offre)
+        )
+        db.commit()
+    ids = walk(client, "/admin/transactions", 2, headers=admin)
+    assert ids == sorted(ids, reverse=True) and len(ids) == 5
@@ -0,0 +1,52 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import QueuePool
+
+from app.main import app
+from app.utils.pool_metrics import PoolMetrics, instrumented_pool_class, install_pre_ping
+
+def make_engine(tmp_path, strategy, idle_seconds=0, **kwargs):
+    metrics = PoolMetrics("test")
+    engine = create_engine(
+        f"sqlite:///{tmp_path}/pool.db",
+        poolclass=instrumented_pool_class(QueuePool, metrics),
+        **kwargs
+    )
+    install_pre_ping(engine, metrics, strategy, idle_seconds)
+    return engine, metrics
+
+def test_wait_histogram_is_cumulative():
+    metrics = PoolMetrics("test")
+    for seconds in (0.0005, 0.003, 0.003, 20):
+        metrics.observe_wait(seconds)
+    histogram = metrics.snapshot()["wait_seconds"]
+    assert histogram["buckets"]["0.001"] == 1
+    assert histogram["buckets"]["0.005"] == 3
+    assert histogram["buckets"]["+Inf"] == histogram["count"] == 4
+
+@pytest.mark.parametrize("strategy, idle_seconds, pings", [
+    ("always", 0, 2), ("idle", 0, 2), ("idle", 60, 0), ("never", 0, 0)
+])
+def test_pre_ping_strategies(tmp_path, strategy, idle_seconds, pings):
+    engine, metrics = make_engine(tmp_path, strategy, idle_seconds)
+    for _ in range(3):
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+    # 1er checkout : connexion neuve, jamais pingée
+    assert metrics.snapshot()["pings"] == pings
+
+def test_checkout_failures_and_occupancy(tmp_path):
+    engine, metrics = make_engine(tmp_path, "never", pool_size=1, max_overflow=0, pool_timeout=0.01)
+    with engine.connect():
+        assert metrics.snapshot()["checked_out"] == 1
+        with pytest.raises(Exception):
+            engine.connect()
+    stats = metrics.snapshot()
+    assert stats["checkout_failures"] == 1
+    assert stats["checked_out"] == 0 and stats["checkouts"] == 1
+
+def test_pool_status_endpoint():
+    response = TestClient(app).get("/status/pool")
+    assert response.status_code == 200
+    assert set(response.json()["pools"]) == {"sync", "async"}
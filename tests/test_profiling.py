@@ -0,0 +1,61 @@
+import logging
+
+import orjson
+
+from app.utils import profiling
+from app.utils.profiling import RequestProfile, normalize_sql, sql_profiler
+from app.utils.response_cache import response_cache
+
+def test_normalize_sql_groups_statement_shapes():
+    assert normalize_sql("SELECT * FROM offres WHERE id IN (?, ?, ?) AND titre = 'x''y'") == \
+        normalize_sql("SELECT *\n  FROM offres WHERE id IN ($1, $2) AND titre = 'z'") == \
+        "SELECT * FROM offres WHERE id IN (...) AND titre = ?"
+    assert normalize_sql("SELECT id FROM t WHERE a = %(a_1)s LIMIT 10 OFFSET :param_1") == "SELECT id FROM t WHERE a = ? LIMIT ? OFFSET ?"
+    assert normalize_sql("SELECT created_at::date FROM t") == "SELECT created_at::date FROM t"
+
+def test_report_flags_repeated_statements(monkeypatch):
+    monkeypatch.setattr(sql_profiler, "n_plus_one", 3)
+    profile = RequestProfile()
+    for i in range(4):
+        profile.record("SELECT * FROM offres WHERE id = ?", 0.001)
+    profile.record("SELECT * FROM users WHERE id IN (?, ?)", 0.004)
+    profile.record("SELECT * FROM users WHERE id IN (?, ?, ?)", 0.002)
+    scope = {"method": "GET", "path": "/offres/", "route": None}
+
+    report = sql_profiler.report(scope, 200, 0.01, profile)
+
+    assert report["queries"] == 6 and not report["slow"]
+    assert report["slowest"] == {"sql": "SELECT * FROM users WHERE id IN (...)", "ms": 4.0}
+    assert report["n_plus_one"] == [{"sql": "SELECT * FROM offres WHERE id = ?", "count": 4, "ms": 4.0}]
+    # Rien à signaler : ni lente, ni répétition
+    monkeypatch.setattr(sql_profiler, "n_plus_one", 5)
+    assert sql_profiler.report(scope, 200, 0.01, profile) is None
+
+def test_server_timing_and_slow_request_log(client, login, monkeypatch, caplog):
+    monkeypatch.setattr(response_cache, "enabled", False)
+    donateur = login("donateur@example.com", role="donateur")
+    offre_id = client.post("/offres/", json={"titre": "Pain", "type_offre": "denrees", "quantite": 1}, headers=donateur).json()["id"]
+    assert "server-timing" not in client.get(f"/offres/{offre_id}").headers
+
+    monkeypatch.setattr(sql_profiler, "enabled", True)
+    monkeypatch.setattr(sql_profiler, "slow_seconds", 0.0)
+    # fileConfig d'alembic (test des migrations) désactive les loggers existants
+    monkeypatch.setattr(profiling.logger, "disabled", False)
+    with caplog.at_level(logging.WARNING, logger=profiling.__name__):
+        response = client.get(f"/offres/{offre_id}")
+
+    db, app = response.headers["server-timing"].split(", ")
+    assert db.startswith("db;dur=") and db.endswith(';desc="1 sql"')
+    assert app.startswith("app;dur=")
+    [record] = [record for record in caplog.records if record.name == profiling.__name__]
+    assert record.sql_profile["route"] == "/offres/{offre_id}"
+    assert record.sql_profile["queries"] == 1 and record.sql_profile["slow"]
+    assert record.sql_profile["slowest"]["sql"].endswith("FROM offres WHERE offres.id = ?")
+    assert orjson.loads(record.getMessage().split(" : ", 1)[1]) == record.sql_profile
+
+def test_sampling(client, monkeypatch):
+    monkeypatch.setattr(sql_profiler, "enabled", True)
+    monkeypatch.setattr(sql_profiler, "sample_rate", 0.0)
+    assert "server-timing" not in client.get("/offres/").headers
+    monkeypatch.setattr(sql_profiler, "sample_rate", 1.0)
+    assert client.get("/offres/").headers["server-timing"].startswith("db;dur=")
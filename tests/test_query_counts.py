@@ -0,0 +1,46 @@
+import pytest
+
+from app import models
+from app.core.config import settings
+from app.database import SessionLocal
+from tests.conftest import count_queries
+
+# Nombre maximal de requêtes SQL par appel de liste, quelle que soit la taille de page
+MAX_STATEMENTS = 2
+
+LISTINGS = [
+    "/offres/",
+    "/admin/users",
+    "/admin/offres",
+    "/admin/transactions",
+    "/transactions/mes-transactions",
+    "/transactions/historique/{beneficiaire_id}",
+]
+
+def seed(rows):
+    with SessionLocal() as db:
+        beneficiaire = db.query(models.Utilisateur).filter_by(email="beneficiaire@example.com").one()
+        for i in range(rows):
+            # Un créateur distinct par offre : un chargement paresseux coûterait une requête par ligne
+            createur = models.Utilisateur(email=f"donateur{i}@example.com", password_hash="x", role="donateur")
+            offre = models.Offre(titre=f"Offre {i}", type_offre="plats", quantite=1, createur=createur)
+            db.add(models.Transaction(offre=offre, beneficiaire=beneficiaire, statut="recupere"))
+        db.commit()
+        return beneficiaire.id
+
+@pytest.mark.parametrize("db_async", [True, False], ids=["async", "sync"])
+@pytest.mark.parametrize("rows", [3, 40])
+@pytest.mark.parametrize("url", LISTINGS)
+def test_listing_statement_count_is_constant(client, login, monkeypatch, db_async, rows, url):
+    monkeypatch.setattr(settings, "DB_ASYNC", db_async)
+    headers = login("beneficiaire@example.com", "admin")
+    beneficiaire_id = seed(rows)
+    url = url.format(beneficiaire_id=beneficiaire_id)
+    client.get(url, headers=headers)  # l'utilisateur courant passe en cache
+
+    with count_queries() as statements:
+        response = client.get(url, headers=headers)
+
+    assert response.status_code == 200
+    assert len(response.json()) >= rows
+    assert len(statements) <= MAX_STATEMENTS, statements
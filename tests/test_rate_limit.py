@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+
+from app.utils import rate_limit
+from app.utils.rate_limit import Budget, ConcurrencyLimiter, MemoryStore, RateLimiter
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def limiter(monkeypatch):
+    clock = FakeClock()
+    limiter = RateLimiter(
+        MemoryStore(), Budget.parse("*", "100/10"),
+        {"POST /auth/login": Budget.parse("POST /auth/login", "2/60"), "GET /admin/export/*": Budget.parse("export", "1/60")},
+        clock=clock,
+    )
+    monkeypatch.setattr(rate_limit, "rate_limiter", limiter)
+    return limiter
+
+def test_login_budget_returns_429_then_refills(client, limiter):
+    credentials = {"email": "x@example.com", "mot_de_passe": "mauvais"}
+    assert [client.post("/auth/login", json=credentials).status_code for _ in range(3)] == [401, 401, 429]
+
+    refused = client.post("/auth/login", json=credentials)
+    assert refused.json()["detail"] == "Trop de requêtes, réessayez plus tard."
+    assert refused.headers["retry-after"] == "30"
+    # Les autres routes ont leur propre seau
+    assert client.get("/offres/").status_code == 200
+
+    limiter.clock.now += 30
+    assert client.post("/auth/login", json=credentials).status_code == 401
+
+def test_budgets_are_per_user_not_per_address(client, login, limiter):
+    first, second = login("a@example.com"), login("b@example.com")
+    limiter.default = Budget("*", 2, 60)
+
+    assert [client.get("/auth/me", headers=first).status_code for _ in range(3)] == [200, 200, 429]
+    assert client.get("/auth/me", headers=second).status_code == 200
+    # Token invalide : compté avec l'adresse IP
+    faux = {"Authorization": "Bearer faux"}
+    assert [client.get("/auth/me", headers=faux).status_code for _ in range(3)] == [401, 401, 429]
+    assert client.get("/offres/").status_code == 429
+
+def test_prefix_budget_and_exempt_paths(client, login, limiter):
+    admin = login("admin@example.com", role="admin")
+    assert client.get("/admin/export/offres", headers=admin).status_code == 200
+    assert client.get("/admin/export/transactions", headers=admin).status_code == 429
+
+    limiter.default = Budget("*", 1, 60)
+    assert all(client.get("/status").status_code == 200 for _ in range(5))
+
+def test_memory_store_refill_and_wait():
+    async def scenario():
+        store, budget = MemoryStore(), Budget("b", 2, 10)  # un jeton toutes les 5 s
+        waits = [await store.take("k", budget, now) for now in (0, 0, 0, 2, 5, 5)]
+        return waits
+    assert asyncio.run(scenario()) == [0.0, 0.0, 5.0, pytest.approx(3.0), 0.0, pytest.approx(5.0)]
+
+def test_memory_store_flood_keeps_active_budgets():
+    async def scenario():
+        store, budget = MemoryStore(max_keys=10), Budget("login", 2, 3600)
+        assert [await store.take("attaquant", budget, 0) for _ in range(2)] == [0.0, 0.0]
+        # Clés forgées (X-Forwarded-For) : chacune chasse le seau le moins récent, pas tous
+        for i in range(100):
+            await store.take(f"forge-{i}", budget, 1)
+            await store.take("attaquant", budget, 1)
+        return await store.take("attaquant", budget, 2), await store.take("forge-0", budget, 2)
+    attente, oubliee = asyncio.run(scenario())
+    assert attente > 0
+    assert oubliee == 0.0  # chassée par les suivantes : seau neuf
+
+def test_concurrency_limit_sheds_with_503(client, monkeypatch):
+    monkeypatch.setattr(rate_limit, "concurrency_limiter", ConcurrencyLimiter(1, timeout=0))
+
+    async def saturate():
+        limiter = rate_limit.concurrency_limiter
+        assert await limiter.acquire()
+        assert not await limiter.acquire()
+        limiter.release()
+    asyncio.run(saturate())
+
+    # Place occupée par une autre requête : refus immédiat
+    rate_limit.concurrency_limiter.semaphore = asyncio.Semaphore(0)
+    response = client.get("/offres/")
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+    assert client.get("/status").status_code == 200
@@ -0,0 +1,86 @@
+import pytest
+from sqlalchemy import event
+
+from app import database
+from app.database import Base
+from app.utils.replica import replica_router
+from app.utils.response_cache import response_cache
+
+@pytest.fixture
+def replica(client, tmp_path, monkeypatch):
+    """Deuxième base SQLite servant de réplique ; rien n'y est répliqué, elle reste vide"""
+    def use_replica(url):
+        engine, async_engine = database.create_engines(url, database.get_async_database_url(url), name="replica_")
+        monkeypatch.setattr(database, "replica_engine", engine)
+        monkeypatch.setattr(database, "async_replica_engine", async_engine)
+        monkeypatch.setattr(database, "ReplicaSessionLocal", database.sessionmaker(bind=engine))
+        monkeypatch.setattr(database, "AsyncReplicaSessionLocal", database.async_sessionmaker(async_engine, expire_on_commit=False))
+        engines.append((engine, async_engine))
+        return engine
+
+    engines = []
+    monkeypatch.setattr(database, "pool_metrics", dict(database.pool_metrics))
+    monkeypatch.setattr(replica_router, "enabled", True)
+    monkeypatch.setattr(replica_router, "lag", 0.0)
+    monkeypatch.setattr(replica_router, "down_until", 0.0)
+    monkeypatch.setattr(response_cache, "enabled", False)
+    replica_router.writers.clear()
+    Base.metadata.create_all(bind=use_replica(f"sqlite:///{tmp_path}/replica.db"))
+    yield use_replica
+    replica_router.writers.clear()
+    for engine, async_engine in engines:
+        client.portal.call(async_engine.dispose)
+        engine.dispose()
+
+def titres(client, url="/offres/"):
+    return [offre["titre"] for offre in client.get(url).json()]
+
+def test_reads_go_to_replica_and_users_read_their_own_writes(client, login, replica):
+    donateur = login("donateur@example.com", "donateur")
+    beneficiaire = login("beneficiaire@example.com")
+    offre_id = client.post("/offres/", json={"titre": "Pain", "type_offre": "denrees", "quantite": 1}, headers=donateur).json()["id"]
+
+    # Pages publiques lues sur la réplique, qui n'a pas reçu l'offre
+    assert titres(client) == []
+    assert client.get(f"/offres/{offre_id}").status_code == 404
+
+    assert client.post("/transactions/reserver", json={"id_offre": offre_id}, headers=beneficiaire).status_code == 201
+    # L'auteur de la réservation la voit aussitôt ; les autres lectures restent sur la réplique
+    assert len(client.get("/transactions/mes-transactions", headers=beneficiaire).json()) == 1
+    assert client.get("/transactions/mes-transactions", headers=login("autre@example.com")).json() == []
+    replica_router.writers.clear()
+    assert client.get("/transactions/mes-transactions", headers=beneficiaire).json() == []
+
+def test_lagging_or_unreachable_replica_falls_back_to_primary(client, login, replica, tmp_path):
+    donateur = login("donateur@example.com", "donateur")
+    client.post("/offres/", json={"titre": "Pain", "type_offre": "denrees", "quantite": 1}, headers=donateur)
+    replica_router.writers.clear()
+    assert titres(client) == []
+
+    replica_router.lag = replica_router.max_lag + 1
+    assert titres(client) == ["Pain"]
+    replica_router.lag = 0.0
+
+    replica(f"sqlite:///{tmp_path}/absent/replica.db")
+    assert titres(client) == ["Pain"]
+    assert replica_router.state() == "injoignable"
+    # Réplique écartée : la requête suivante ne la tente même pas
+    assert titres(client) == ["Pain"]
+    ready = client.get("/status/ready")
+    assert ready.status_code == 200 and ready.json()["replica"] == "injoignable"
+
+def test_cache_hits_take_no_replica_connection(client, replica, monkeypatch):
+    monkeypatch.setattr(response_cache, "enabled", True)
+    response_cache.clear()
+    checkouts = []
+    pools = [database.replica_engine.pool, database.async_replica_engine.sync_engine.pool]
+    for pool in pools:
+        event.listen(pool, "checkout", lambda *args: checkouts.append(1))
+
+    etag = client.get("/offres/").headers["etag"]
+    assert len(checkouts) == 1
+    for _ in range(5):
+        assert client.get("/offres/").status_code == 200
+    assert client.get("/offres/", headers={"If-None-Match": etag}).status_code == 304
+    assert len(checkouts) == 1
+    response_cache.clear()
@@ -0,0 +1,201 @@
+import asyncio
+import os
+import re
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import database, models
+from app.database import Base, SessionLocal, async_engine, engine
+from app.main import app
+from app.routes.auth import user_cache
+from app.security import create_access_token
+from app.utils.stats import dashboard_stats
+from app.utils.stock import annuler_et_restituer
+
+CLIENTS = 500
+OFFRES = 10
+
+@pytest.fixture
+def seeded():
+    """Un donateur, OFFRES offres et CLIENTS bénéficiaires insérés directement en base"""
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    user_cache.clear()
+    dashboard_stats.invalidate()
+    with SessionLocal() as db:
+        donateur = models.Utilisateur(email="donateur@example.com", password_hash="x", role="donateur")
+        beneficiaires = [
+            models.Utilisateur(email=f"b{i}@example.com", password_hash="x", role="beneficiaire")
+            for i in range(CLIENTS)
+        ]
+        db.add(donateur)
+        db.add_all(beneficiaires)
+        db.flush()
+        offres = [models.Offre(titre=f"Offre {i}", type_offre="denrees", quantite=1, createur_id=donateur.id) for i in range(OFFRES)]
+        db.add_all(offres)
+        db.commit()
+        tokens = [create_access_token({"sub": str(b.id), "role": "beneficiaire"}) for b in beneficiaires]
+        return tokens, [o.id for o in offres]
+
+async def race(tokens, offre_ids, quantites=None):
+    # Les connexions du pool sont liées à la boucle qui les a ouvertes
+    await async_engine.dispose()
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            async def reserver(i, token):
+                return await client.post(
+                    "/transactions/reserver",
+                    json={"id_offre": offre_ids[i % len(offre_ids)], "quantite": quantites[i] if quantites else 1},
+                    headers={"Authorization": f"Bearer {token}"},
+                )
+            return await asyncio.gather(*(reserver(i, token) for i, token in enumerate(tokens)))
+    finally:
+        await async_engine.dispose()
+
+def test_concurrent_reservations_have_one_winner_per_offer(seeded):
+    tokens, offre_ids = seeded
+
+    started = time.perf_counter()
+    responses = asyncio.run(race(tokens, offre_ids))
+    elapsed = time.perf_counter() - started
+    print(f"\n{CLIENTS} réservations concurrentes en {elapsed:.2f}s ({CLIENTS / elapsed:.0f} req/s)")
+
+    winners = [r for r in responses if r.status_code == 201]
+    assert len(winners) == OFFRES
+    assert sorted(r.json()["offre_id"] for r in winners) == sorted(offre_ids)
+    # Les perdants trouvent l'offre épuisée, jamais une erreur serveur
+    assert {r.status_code for r in responses} == {201, 400}
+    assert {r.json()["detail"] for r in responses if r.status_code == 400} == {"Cette offre n'est plus disponible."}
+
+    with SessionLocal() as db:
+        actives = db.query(models.Transaction).filter(models.Transaction.statut == "reserve").count()
+        disponibles = db.query(models.Offre).filter(models.Offre.is_disponible == True).count()
+    assert actives == OFFRES
+    assert disponibles == 0
+
+def test_hot_offer_is_never_oversold(seeded):
+    tokens, offre_ids = seeded
+    stock = 300
+    with SessionLocal() as db:
+        db.get(models.Offre, offre_ids[0]).quantite = stock
+        db.get(models.Offre, offre_ids[0]).quantite_restante = stock
+        db.commit()
+
+    # Tous les clients sur la même offre, 1 à 3 portions chacun (demande totale : ~1000)
+    responses = asyncio.run(race(tokens, offre_ids[:1], quantites=[1 + i % 3 for i in range(CLIENTS)]))
+    reservees = sum(r.json()["quantite"] for r in responses if r.status_code == 201)
+    assert {r.status_code for r in responses} == {201, 400}
+    refus = {r.json()["detail"] for r in responses if r.status_code == 400}
+    assert all(re.fullmatch(r"Stock insuffisant : il reste [12] portion\(s\)\.|Cette offre n'est plus disponible\.", d) for d in refus)
+
+    with SessionLocal() as db:
+        offre = db.get(models.Offre, offre_ids[0])
+        en_base = sum(t.quantite for t in offre.transactions)
+        assert offre.quantite_restante >= 0
+        assert reservees == en_base == stock - offre.quantite_restante
+        assert offre.is_disponible == (offre.quantite_restante > 0)
+
+def test_stock_backs_up_availability_flag(client, login):
+    donateur = login("donateur@example.com", "donateur")
+    admin = login("admin@example.com", "admin")
+    a, b = login("a@example.com"), login("b@example.com")
+    offre_id = client.post("/offres/", json={"titre": "Repas", "type_offre": "plats", "quantite": 2}, headers=donateur).json()["id"]
+
+    transaction_id = client.post("/transactions/reserver", json={"id_offre": offre_id}, headers=a).json()["id"]
+    response = client.post("/transactions/reserver", json={"id_offre": offre_id, "quantite": 2}, headers=b)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Stock insuffisant : il reste 1 portion(s)."
+    assert client.post("/transactions/reserver", json={"id_offre": offre_id}, headers=b).status_code == 201
+
+    # Épuisée : ni l'admin ni le donateur ne la remettent en ligne, et sa quantité ne descend pas sous les réservations
+    assert client.put(f"/admin/offres/{offre_id}/toggle-disponibilite", headers=admin).status_code == 400
+    assert client.put(f"/offres/{offre_id}", json={"is_disponible": True}, headers=donateur).status_code == 400
+    assert client.put(f"/offres/{offre_id}", json={"quantite": 1}, headers=donateur).status_code == 400
+
+    # Annulation : la portion revient et l'offre repasse disponible
+    client.put(f"/transactions/{transaction_id}/annuler", headers=a)
+    offre = client.get(f"/offres/{offre_id}").json()
+    assert (offre["quantite_restante"], offre["is_disponible"]) == (1, True)
+    # Réapprovisionnée par le donateur
+    offre = client.put(f"/offres/{offre_id}", json={"quantite": 5}, headers=donateur).json()
+    assert (offre["quantite"], offre["quantite_restante"]) == (5, 4)
+
+def test_blocked_sold_out_offer_stays_offline_after_cancellation(client, login):
+    donateur = login("donateur@example.com", "donateur")
+    admin = login("admin@example.com", "admin")
+    a, b = login("a@example.com"), login("b@example.com")
+    offres = [
+        client.post("/offres/", json={"titre": f"Repas {i}", "type_offre": "plats", "quantite": 1}, headers=donateur).json()["id"]
+        for i in range(2)
+    ]
+    transactions = [
+        client.post("/transactions/reserver", json={"id_offre": offre_id}, headers=beneficiaire).json()["id"]
+        for offre_id, beneficiaire in zip(offres, (a, b))
+    ]
+
+    # Épuisées, puis bloquées : par le donateur, et par l'admin en lot
+    assert client.put(f"/offres/{offres[0]}", json={"is_disponible": False}, headers=donateur).status_code == 200
+    assert client.put("/admin/offres/bulk/disponibilite", json={"ids": offres[1:], "is_disponible": False}, headers=admin).status_code == 200
+    client.put(f"/transactions/{transactions[0]}/annuler", headers=a)
+    client.put(f"/transactions/{transactions[1]}/annuler", headers=b)
+
+    for offre_id in offres:
+        offre = client.get(f"/offres/{offre_id}").json()
+        assert (offre["quantite_restante"], offre["is_disponible"]) == (1, False)
+    # Débloquée explicitement, elle revient
+    offre = client.put(f"/offres/{offres[0]}", json={"is_disponible": True}, headers=donateur).json()
+    assert offre["is_disponible"] is True
+
+def cancel_after_read(monkeypatch, transaction_id):
+    """Valide une annulation juste après la lecture de `transaction_id` par la route en cours"""
+    get = AsyncSession.get
+
+    async def get_then_cancel(self, entity, ident, **kwargs):
+        found = await get(self, entity, ident, **kwargs)
+        if entity is models.Transaction and ident == transaction_id:
+            monkeypatch.setattr(AsyncSession, "get", get)
+            async with database.AsyncSessionLocal() as other:
+                transaction = await get(other, models.Transaction, transaction_id)
+                assert await annuler_et_restituer(other, transaction, datetime.now(timezone.utc)) is not None
+                await other.commit()
+        return found
+
+    monkeypatch.setattr(AsyncSession, "get", get_then_cancel)
+
+def test_cancel_during_pickup_wins(client, login, monkeypatch):
+    donateur = login("donateur@example.com", "donateur")
+    beneficiaire = login("b@example.com")
+    offre_id = client.post("/offres/", json={"titre": "Repas", "type_offre": "plats", "quantite": 2}, headers=donateur).json()["id"]
+    transaction_id = client.post("/transactions/reserver", json={"id_offre": offre_id, "quantite": 2}, headers=beneficiaire).json()["id"]
+
+    cancel_after_read(monkeypatch, transaction_id)
+    response = client.put(f"/transactions/{transaction_id}/recuperer", headers=beneficiaire)
+
+    # Les portions rendues par l'annulation ne sont pas aussi comptées comme récupérées
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Cette transaction a été modifiée entre-temps."
+    with SessionLocal() as db:
+        assert db.get(models.Transaction, transaction_id).statut == "annule"
+        offre = db.get(models.Offre, offre_id)
+        assert (offre.quantite_restante, offre.is_disponible) == (2, True)
+
+# SQLite sérialise les écritures : seul PostgreSQL exerce vraiment les verrous de ligne
+# de l'UPDATE conditionnel. TEST_POSTGRES_URL=postgresql://... pour l'activer.
+@pytest.mark.skipif(not os.environ.get("TEST_POSTGRES_URL"), reason="TEST_POSTGRES_URL non défini")
+def test_hot_offer_is_never_oversold_on_postgres():
+    env = dict(os.environ, DATABASE_URL=os.environ["TEST_POSTGRES_URL"])
+    env.pop("ASYNC_DATABASE_URL", None)
+    result = subprocess.run(
+        [sys.executable, "-m", "benchmarks.hot_offer", "--clients", "500", "--stock", "600", "--portions", "3"],
+        env=env, cwd=Path(__file__).parents[1], capture_output=True, text=True, timeout=300,
+    )
+    assert result.returncode == 0, result.stdout + result.stderr
+    assert "autres : 0" in result.stdout
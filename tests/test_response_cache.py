@@ -0,0 +1,108 @@
+import asyncio
+
+from app.utils.response_cache import CachedResponse, RedisBackend, ResponseCache, build_response
+from tests.conftest import count_queries
+
+def create_offre(client, headers, titre="Pain"):
+    response = client.post("/offres/", json={"titre": titre, "type_offre": "denrees", "quantite": 1}, headers=headers)
+    return response.json()["id"]
+
+def test_cached_listing_skips_database(client, login):
+    donateur = login("donateur@example.com", "donateur")
+    for titre in ("Pain", "Riz", "Lait"):
+        create_offre(client, donateur, titre)
+
+    first = client.get("/offres/?limit=2")
+    with count_queries() as statements:
+        second = client.get("/offres/?limit=2")
+    assert statements == []
+    assert second.content == first.content
+    assert second.headers["ETag"] == first.headers["ETag"]
+    assert second.headers["X-Next-Cursor"] == first.headers["X-Next-Cursor"]
+    assert [o["titre"] for o in second.json()] == ["Pain", "Riz"]
+
+def test_if_none_match_returns_304(client, login):
+    offre_id = create_offre(client, login("donateur@example.com", "donateur"))
+    etag = client.get(f"/offres/{offre_id}").headers["ETag"]
+
+    response = client.get(f"/offres/{offre_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["ETag"] == etag
+
+    assert client.get(f"/offres/{offre_id}", headers={"If-None-Match": '"autre"'}).status_code == 200
+    assert client.get("/offres/999").status_code == 404
+
+def test_writes_invalidate_cached_responses(client, login):
+    donateur = login("donateur@example.com", "donateur")
+    beneficiaire = login("beneficiaire@example.com")
+    admin = login("admin@example.com", "admin")
+    offre_id = create_offre(client, donateur)
+
+    def listed():
+        return [o["id"] for o in client.get("/offres/").json()]
+
+    def detail():
+        return client.get(f"/offres/{offre_id}").json()
+
+    assert listed() == [offre_id]
+    client.put(f"/offres/{offre_id}", json={"titre": "Pain frais"}, headers=donateur)
+    assert detail()["titre"] == "Pain frais"
+    assert client.get("/offres/").json()[0]["titre"] == "Pain frais"
+
+    response = client.post("/transactions/reserver", json={"id_offre": offre_id}, headers=beneficiaire)
+    assert listed() == [] and detail()["is_disponible"] is False
+
+    client.put(f"/transactions/{response.json()['id']}/annuler", headers=beneficiaire)
+    assert listed() == [offre_id] and detail()["is_disponible"] is True
+
+    client.put(f"/admin/offres/{offre_id}/toggle-disponibilite", headers=admin)
+    assert listed() == [] and detail()["is_disponible"] is False
+
+    client.put(f"/admin/offres/{offre_id}/toggle-disponibilite", headers=admin)
+    autre_id = create_offre(client, donateur, "Riz")
+    assert listed() == [offre_id, autre_id]
+
+    assert client.get(f"/offres/{autre_id}").status_code == 200
+    client.delete(f"/offres/{autre_id}", headers=donateur)
+    assert listed() == [offre_id]
+    assert client.get(f"/offres/{autre_id}").status_code == 404
+
+class LocalRedis:
+    """Remplaçant local d'un serveur Redis (sous-ensemble utilisé par RedisBackend)"""
+
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    async def mget(self, keys):
+        return [self.data.get(key) for key in keys]
+
+    async def incr(self, key):
+        self.data[key] = int(self.data.get(key, 0)) + 1
+        return self.data[key]
+
+def test_shared_backend_across_workers():
+    shared = LocalRedis()
+    worker_a = ResponseCache(RedisBackend(shared), maxsize=16, ttl=30)
+    worker_b = ResponseCache(RedisBackend(shared), maxsize=16, ttl=30)
+
+    async def scenario():
+        versions = await worker_a.versions(["offre:1"])
+        await worker_a.store("/offres/1?", versions, build_response({"id": 1}, {"X-Test": "1"}))
+
+        # B n'a rien calculé : il relit le corps depuis le backend partagé
+        entry = await worker_b.lookup("/offres/1?", await worker_b.versions(["offre:1"]))
+        assert isinstance(entry, CachedResponse)
+        assert entry.body == b'{"id":1}' and entry.headers == {"X-Test": "1"}
+
+        # Une écriture traitée par B périme l'entrée locale de A
+        await worker_b.invalidate("offre:1")
+        assert await worker_a.lookup("/offres/1?", await worker_a.versions(["offre:1"])) is None
+
+    asyncio.run(scenario())
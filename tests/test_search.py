@@ -0,0 +1,76 @@
+import pytest
+
+from app.utils.geo import covering_cells, distance_km, encode_geohash
+from app.utils.search import terms_of
+
+# Dakar : Plateau, Médina (~2 km), Yoff (~10 km) ; Saint-Louis (~200 km)
+PLATEAU = (14.6708, -17.4381)
+MEDINA = (14.6850, -17.4560)
+YOFF = (14.7580, -17.4900)
+SAINT_LOUIS = (16.0326, -16.4818)
+
+def test_geohash_and_terms():
+    assert encode_geohash(57.64911, 10.40744, 11) == "u4pruydqqvj"
+    assert terms_of("Thiéboudienne « maison » et PAIN de mie") == ["maison", "mie", "pain", "thieboudienne"]
+    assert 1.5 < distance_km(*PLATEAU, *MEDINA) < 3
+    # Le bloc de cellules couvre le cercle, même à cheval sur une frontière de cellule
+    cells = covering_cells(*PLATEAU, 3)
+    assert encode_geohash(*MEDINA).startswith(tuple(cells))
+
+@pytest.fixture
+def offres(client, login):
+    donateur = login("donateur@example.com", "donateur")
+    def create(titre, position=None, description=None):
+        payload = {"titre": titre, "description": description, "type_offre": "denrees", "quantite": 1}
+        if position:
+            payload.update(latitude=position[0], longitude=position[1])
+        return client.post("/offres/", json=payload, headers=donateur).json()["id"]
+    return {
+        "pain_plateau": create("Pain complet", PLATEAU),
+        "riz_medina": create("Riz brisé", MEDINA, description="Sac de 5 kg, pain offert"),
+        "pain_yoff": create("Pains au lait", YOFF),
+        "pain_saint_louis": create("Pain de mie", SAINT_LOUIS),
+        "sans_position": create("Thiéboudienne"),
+    }, donateur
+
+def ids(response):
+    assert response.status_code == 200, response.text
+    return [o["id"] for o in response.json()]
+
+def test_text_search(client, offres):
+    offres, _ = offres
+    # Préfixe, accents et casse ignorés ; plus récentes d'abord
+    assert ids(client.get("/offres/recherche?q=PAIN")) == [
+        offres["pain_saint_louis"], offres["pain_yoff"], offres["riz_medina"], offres["pain_plateau"]
+    ]
+    assert ids(client.get("/offres/recherche?q=pain mie")) == [offres["pain_saint_louis"]]
+    assert ids(client.get("/offres/recherche?q=thieboudienne")) == [offres["sans_position"]]
+    assert ids(client.get("/offres/recherche?q=couscous")) == []
+
+def test_nearby_search(client, offres):
+    offres, _ = offres
+    lat, lon = PLATEAU
+    assert ids(client.get(f"/offres/recherche?lat={lat}&lon={lon}&rayon_km=3")) == [
+        offres["pain_plateau"], offres["riz_medina"]
+    ]
+    assert ids(client.get(f"/offres/recherche?lat={lat}&lon={lon}&rayon_km=15&q=pain")) == [
+        offres["pain_plateau"], offres["riz_medina"], offres["pain_yoff"]
+    ]
+    assert ids(client.get(f"/offres/recherche?lat={lat}&lon={lon}&rayon_km=15&limit=1")) == [offres["pain_plateau"]]
+
+def test_search_follows_updates_and_availability(client, offres, login):
+    offres, donateur = offres
+    offre_id = offres["pain_plateau"]
+    client.put(f"/offres/{offre_id}", json={"titre": "Couscous", "latitude": YOFF[0], "longitude": YOFF[1]}, headers=donateur)
+    assert ids(client.get("/offres/recherche?q=couscous")) == [offre_id]
+    assert offre_id not in ids(client.get("/offres/recherche?q=complet"))
+    assert offre_id in ids(client.get(f"/offres/recherche?lat={YOFF[0]}&lon={YOFF[1]}&rayon_km=1"))
+
+    client.post("/transactions/reserver", json={"id_offre": offre_id}, headers=login("b@example.com"))
+    assert ids(client.get("/offres/recherche?q=couscous")) == []
+
+def test_search_requires_criteria(client):
+    assert client.get("/offres/recherche").status_code == 400
+    assert client.get("/offres/recherche?q=de").status_code == 400
+    assert client.get("/offres/recherche?lat=14.7").status_code == 400
+    assert client.get("/offres/recherche?lat=100&lon=0").status_code == 422
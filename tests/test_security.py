@@ -0,0 +1,26 @@
+from app import models, security
+from app.core.config import settings
+from app.database import SessionLocal
+
+def test_login_rehashes_when_cost_changes(client, login):
+    login("beneficiaire@example.com")
+    old_rounds = settings.BCRYPT_ROUNDS
+    security.pwd_context.update(bcrypt__rounds=5, bcrypt__min_rounds=5, bcrypt__max_rounds=5)
+    try:
+        response = client.post("/auth/login", json={"email": "beneficiaire@example.com", "mot_de_passe": "secret123"})
+        assert response.status_code == 200
+        with SessionLocal() as db:
+            password_hash = db.query(models.Utilisateur).one().password_hash
+        assert password_hash.startswith("$2b$05$")
+    finally:
+        security.pwd_context.update(
+            bcrypt__rounds=old_rounds, bcrypt__min_rounds=old_rounds, bcrypt__max_rounds=old_rounds
+        )
+
+def test_full_hash_queue_returns_503(client, monkeypatch):
+    monkeypatch.setattr(security.password_hasher, "max_pending", 0)
+    response = client.post(
+        "/auth/register", json={"email": "a@example.com", "mot_de_passe": "secret123", "role": "beneficiaire"}
+    )
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
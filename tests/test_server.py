@@ -0,0 +1,66 @@
+import pytest
+
+from app.core import startup
+from app.core.config import settings
+from app.database import pool_capacity
+from app.server import available_cpus, worker_count
+
+def test_connection_budget_is_split_between_workers(monkeypatch):
+    monkeypatch.setattr(settings, "DB_POOL_SIZE", 5)
+    monkeypatch.setattr(settings, "DB_MAX_OVERFLOW", 10)
+    monkeypatch.setattr(settings, "WEB_WORKERS", 4)
+    monkeypatch.setattr(settings, "DB_MAX_CONNECTIONS", None)
+    assert pool_capacity() == (5, 10)
+    monkeypatch.setattr(settings, "DB_MAX_CONNECTIONS", 40)
+    assert pool_capacity() == (5, 5)
+    monkeypatch.setattr(settings, "DB_MAX_CONNECTIONS", 12)
+    assert pool_capacity() == (3, 0)
+    assert available_cpus() >= 1
+
+def test_multiple_workers_require_shared_backends(monkeypatch):
+    monkeypatch.setattr(settings, "RESPONSE_CACHE_BACKEND", "memory")
+    monkeypatch.setattr(settings, "RESPONSE_CACHE_SIZE", 1024)
+    monkeypatch.setattr(settings, "EVENTS_BACKEND", "postgres")
+    monkeypatch.setattr(settings, "DATABASE_REPLICA_URL", None)
+    monkeypatch.setattr(settings, "AUTH_USER_CACHE_SIZE", 0)
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(settings, "RATE_LIMIT_BACKEND", "redis")
+    monkeypatch.setattr(settings, "DASHBOARD_STATS_MAX_AGE", 0)
+    monkeypatch.setattr(settings, "WEB_WORKERS", None)
+    assert worker_count() == 1
+    monkeypatch.setattr(settings, "WEB_WORKERS", 4)
+    with pytest.raises(SystemExit, match="RESPONSE_CACHE_BACKEND"):
+        worker_count()
+
+    monkeypatch.setattr(settings, "RESPONSE_CACHE_BACKEND", "redis")
+    assert worker_count() == 4
+    # Cache des utilisateurs, budgets de débit et compteurs restent propres au worker
+    for name, local, shared in [
+        ("AUTH_USER_CACHE_SIZE", 10000, 0), ("RATE_LIMIT_BACKEND", "memory", "redis"), ("DASHBOARD_STATS_MAX_AGE", 10.0, 0),
+    ]:
+        monkeypatch.setattr(settings, name, local)
+        with pytest.raises(SystemExit, match=name):
+            worker_count()
+        monkeypatch.setattr(settings, name, shared)
+    monkeypatch.setattr(settings, "WEB_WORKERS", None)
+    assert worker_count() == available_cpus()
+
+def test_readiness_reflects_database_and_draining(client, monkeypatch):
+    response = client.get("/status/ready")
+    assert response.status_code == 200
+    assert response.json()["database"] == "ok"
+    assert client.get("/status/health").json()["status"] == "ok"
+
+    async def unreachable():
+        raise ConnectionRefusedError("base arrêtée")
+
+    monkeypatch.setattr(startup, "ping_database", unreachable)
+    response = client.get("/status/ready")
+    assert response.status_code == 503
+    assert response.json()["database"].startswith("injoignable")
+
+    # SIGTERM : plus prêt, mais toujours vivant
+    monkeypatch.setattr(startup.startup_report, "draining", True)
+    assert client.get("/status/ready").status_code == 503
+    health = client.get("/status/health")
+    assert health.status_code == 200 and health.json()["status"] == "draining"